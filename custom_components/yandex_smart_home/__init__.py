@@ -13,7 +13,8 @@ from homeassistant.helpers.reload import async_integration_yaml_config
 import voluptuous as vol
 
 from . import config_validation as ycv, const
-from .cloud import delete_cloud_instance
+from .capability_video import WarmStreams
+from .cloud import CloudConnectionPool, delete_cloud_instance
 from .const import DOMAIN, ConnectionType
 from .entry_data import ConfigEntryData
 from .http import async_register_http
@@ -118,6 +119,7 @@ ENTITY_SCHEMA = vol.All(
             vol.Optional(const.CONF_ENTITY_PROPERTIES): [ENTITY_PROPERTY_SCHEMA],
             vol.Optional(const.CONF_SUPPORT_SET_CHANNEL): cv.boolean,
             vol.Optional(const.CONF_STATE_UNKNOWN): cv.boolean,
+            vol.Optional(const.CONF_STREAM_PREWARM): cv.boolean,
             vol.Optional(const.CONF_COLOR_PROFILE): cv.string,
             vol.Optional(const.CONF_ERROR_CODE_TEMPLATE): cv.template,
             vol.Optional(const.CONF_ENTITY_RANGE): ENTITY_RANGE_SCHEMA,
@@ -144,6 +146,21 @@ SETTINGS_SCHEMA = vol.All(
         vol.Optional(const.CONF_PRESSURE_UNIT): cv.string,
         vol.Optional(const.CONF_BETA): cv.boolean,
         vol.Optional(const.CONF_CLOUD_STREAM): cv.boolean,
+        vol.Optional(const.CONF_CLOUD_STREAM_MAX_LAG): vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False)),
+        vol.Optional(const.CONF_CLOUD_STREAM_MAX_BUFFER_SIZE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(const.CONF_CLOUD_STANDBY): cv.boolean,
+        vol.Optional(const.CONF_CLOUD_REQUEST_STATS): cv.boolean,
+        vol.Optional(const.CONF_CLOUD_COMPRESSION_MIN_SIZE): cv.positive_int,
+        vol.Optional(const.CONF_CLOUD_CONCURRENT_REQUESTS): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(const.CONF_REQUEST_TRACING): cv.boolean,
+        vol.Optional(const.CONF_LOG_SAMPLE_RATE): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+        vol.Optional(const.CONF_REQUEST_LIMITS): {
+            cv.string: {
+                vol.Optional(const.CONF_REQUEST_LIMIT): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(const.CONF_REQUEST_QUEUE_SIZE): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                vol.Optional(const.CONF_REQUEST_QUEUE_TIMEOUT): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            }
+        },
     },
 )
 
@@ -171,6 +188,8 @@ class YandexSmartHome:
     def __init__(self, hass: HomeAssistant, yaml_config: ConfigType):
         """Initialize the Yandex Smart Home from yaml configuration."""
         self.cloud_streams: dict[str, CloudStreamManager] = {}
+        self.cloud_connections = CloudConnectionPool()
+        self.warm_streams = WarmStreams(hass)
 
         self._hass = hass
         self._yaml_config = yaml_config
@@ -233,14 +252,17 @@ class YandexSmartHome:
         """Unload a config entry."""
         data = self.get_entry_data(entry)
         await data.async_unload()
+        self.warm_streams.remove_entry(entry.entry_id)
         return True
 
     async def async_remove_entry(self, entry: ConfigEntry) -> None:
         """Remove a config entry."""
-        try:
-            del self._entry_datas[entry.entry_id]
-        except KeyError:
-            pass
+        data = self._entry_datas.pop(entry.entry_id, None)
+        if data is None and entry.data.get(const.CONF_CONNECTION_TYPE) in list(ConnectionType):
+            data = ConfigEntryData(self._hass, entry, yaml_config=self._yaml_config)
+
+        if data:
+            await data.async_remove()
 
         return None
 
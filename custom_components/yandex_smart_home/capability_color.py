@@ -159,16 +159,14 @@ class RGBColorCapability(StateCapability[RGBInstanceActionState]):
     @cached_property
     def _converter(self) -> ColorConverter:
         """Return the color converter."""
-        if color_profile_name := self._entity_config.get(CONF_COLOR_PROFILE):
-            try:
-                return ColorConverter(self._entry_data.color_profiles[color_profile_name])
-            except KeyError:
-                raise APIError(
-                    ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
-                    f"Color profile '{color_profile_name}' not found for {self}",
-                )
-
-        return ColorConverter()
+        color_profile_name = self._entity_config.get(CONF_COLOR_PROFILE)
+        try:
+            return self._entry_data.color_profiles.get_color_converter(color_profile_name)
+        except KeyError:
+            raise APIError(
+                ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
+                f"Color profile '{color_profile_name}' not found for {self}",
+            )
 
 
 @STATE_CAPABILITIES_REGISTRY.register
@@ -291,17 +289,14 @@ class ColorTemperatureCapability(StateCapability[TemperatureKInstanceActionState
     @cached_property
     def _converter(self) -> ColorTemperatureConverter:
         """Return the color temperature converter."""
-        if color_profile_name := self._entity_config.get(CONF_COLOR_PROFILE):
-            try:
-                return ColorTemperatureConverter(self._entry_data.color_profiles[color_profile_name], self.state)
-
-            except KeyError:
-                raise APIError(
-                    ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
-                    f"Color profile '{color_profile_name}' not found for {self}",
-                )
-
-        return ColorTemperatureConverter(None, self.state)
+        color_profile_name = self._entity_config.get(CONF_COLOR_PROFILE)
+        try:
+            return self._entry_data.color_profiles.get_temperature_converter(color_profile_name, self.state)
+        except KeyError:
+            raise APIError(
+                ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
+                f"Color profile '{color_profile_name}' not found for {self}",
+            )
 
 
 @STATE_CAPABILITIES_REGISTRY.register
@@ -1,9 +1,10 @@
 """Implement the Yandex Smart Home user specific capabilities."""
 from __future__ import annotations
 
+from functools import partial
 import itertools
 import logging
-from typing import TYPE_CHECKING, Any, Protocol, Self, cast
+from typing import TYPE_CHECKING, Any, Callable, Protocol, Self, cast
 
 from homeassistant.const import STATE_OFF, STATE_UNKNOWN
 from homeassistant.core import callback
@@ -299,6 +300,10 @@ class CustomRangeCapability(CustomCapability, RangeCapability):
         return self._config.get(CONF_ENTITY_CUSTOM_RANGE_DECREASE_VALUE)
 
 
+CustomCapabilityFactory = Callable[["HomeAssistant", "ConfigEntryData"], CustomCapability]
+"""Create custom capability with already resolved class, instance and value template."""
+
+
 def get_custom_capability(
     hass: HomeAssistant,
     entry_data: ConfigEntryData,
@@ -308,23 +313,48 @@ def get_custom_capability(
     device_id: str,
 ) -> CustomCapability:
     """Return initialized custom capability based on parameters."""
+    return get_custom_capability_factory(capability_config, capability_type, instance, device_id)(hass, entry_data)
+
+
+def get_custom_capability_factory(
+    capability_config: ConfigType,
+    capability_type: CapabilityType,
+    instance: str,
+    device_id: str,
+) -> CustomCapabilityFactory:
+    """Return factory of custom capability based on parameters."""
     value_template = get_value_template(device_id, capability_config)
+    factory: CustomCapabilityFactory
 
     match capability_type:
         case CapabilityType.MODE:
-            return CustomModeCapability(
-                hass, entry_data, capability_config, ModeCapabilityInstance(instance), device_id, value_template
+            factory = partial(
+                CustomModeCapability,
+                config=capability_config,
+                instance=ModeCapabilityInstance(instance),
+                device_id=device_id,
+                value_template=value_template,
             )
         case CapabilityType.TOGGLE:
-            return CustomToggleCapability(
-                hass, entry_data, capability_config, ToggleCapabilityInstance(instance), device_id, value_template
+            factory = partial(
+                CustomToggleCapability,
+                config=capability_config,
+                instance=ToggleCapabilityInstance(instance),
+                device_id=device_id,
+                value_template=value_template,
             )
         case CapabilityType.RANGE:
-            return CustomRangeCapability(
-                hass, entry_data, capability_config, RangeCapabilityInstance(instance), device_id, value_template
+            factory = partial(
+                CustomRangeCapability,
+                config=capability_config,
+                instance=RangeCapabilityInstance(instance),
+                device_id=device_id,
+                value_template=value_template,
             )
+        case _:
+            raise APIError(ResponseCode.INTERNAL_ERROR, f"Unsupported capability type: {capability_type}")
 
-    raise APIError(ResponseCode.INTERNAL_ERROR, f"Unsupported capability type: {capability_type}")
+    return factory
 
 
 def get_value_template(device_id: str, capability_config: ConfigType) -> Template | None:
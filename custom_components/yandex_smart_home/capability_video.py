@@ -1,17 +1,26 @@
 """Implement the Yandex Smart Home video_stream capabilities."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import asyncio
+from collections import OrderedDict
+from datetime import timedelta
+from functools import partial
+import logging
+import time
+from typing import TYPE_CHECKING, Any
 
 from homeassistant.components import camera
 from homeassistant.components.camera import StreamType, _get_camera_from_entity_id
 from homeassistant.components.stream import Stream
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import network
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
 
 from .capability import STATE_CAPABILITIES_REGISTRY, ActionOnlyCapabilityMixin, StateCapability
 from .cloud_stream import CloudStreamManager
-from .const import DOMAIN
+from .const import CONF_STREAM_PREWARM, DOMAIN
 from .helpers import APIError
 from .schema import (
     CapabilityType,
@@ -27,6 +36,105 @@ if TYPE_CHECKING:
 
     from . import YandexSmartHome
 
+_LOGGER = logging.getLogger(__name__)
+
+WARM_STREAM_IDLE_TIMEOUT = timedelta(minutes=30)
+WARM_STREAM_REFRESH_INTERVAL = timedelta(minutes=1)
+MAX_WARM_STREAMS = 4
+
+
+class WarmStreams:
+    """Keep streams of the pre-warmed cameras running between requests.
+
+    The streams are shared by config entries, a stream is kept warm while any entry that requested it is loaded.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        """Initialize the warm streams."""
+        self._hass = hass
+        self._streams: OrderedDict[str, tuple[Stream, float]] = OrderedDict()
+        self._entry_ids: dict[str, set[str]] = {}
+        self._unsub_refresh: CALLBACK_TYPE | None = None
+
+    def __contains__(self, entity_id: str) -> bool:
+        """Test if the stream of the camera is kept warm."""
+        return entity_id in self._streams
+
+    def __len__(self) -> int:
+        """Return number of the warm streams."""
+        return len(self._streams)
+
+    def touch(self, entity_id: str, stream: Stream, entry_id: str) -> None:
+        """Mark the camera stream as recently used by the config entry and keep it warm."""
+        self._streams[entity_id] = (stream, time.monotonic())
+        self._streams.move_to_end(entity_id)
+        self._entry_ids.setdefault(entity_id, set()).add(entry_id)
+
+        while len(self._streams) > MAX_WARM_STREAMS:
+            evicted_entity_id, _ = self._streams.popitem(last=False)
+            self._entry_ids.pop(evicted_entity_id, None)
+            _LOGGER.debug(f"Too many warm streams, {evicted_entity_id} is no longer kept warm")
+
+        self._keep_warm(stream)
+
+        if not self._unsub_refresh:
+            self._unsub_refresh = async_track_time_interval(
+                self._hass, self._refresh, WARM_STREAM_REFRESH_INTERVAL, cancel_on_shutdown=True
+            )
+
+        return None
+
+    def remove_entry(self, entry_id: str) -> None:
+        """Stop keeping warm the streams that are used only by the config entry."""
+        for entity_id, entry_ids in list(self._entry_ids.items()):
+            entry_ids.discard(entry_id)
+            if not entry_ids:
+                self._entry_ids.pop(entity_id)
+                self._streams.pop(entity_id, None)
+
+        if not self._streams:
+            self.clear()
+
+        return None
+
+    def clear(self) -> None:
+        """Stop keeping the streams warm."""
+        self._streams.clear()
+        self._entry_ids.clear()
+
+        if self._unsub_refresh:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+
+        return None
+
+    @callback
+    def _refresh(self, *_: Any) -> None:
+        """Keep the streams warm and forget about idle ones."""
+        idle_since = time.monotonic() - WARM_STREAM_IDLE_TIMEOUT.total_seconds()
+
+        for entity_id, (stream, last_used) in list(self._streams.items()):
+            if last_used < idle_since or not stream.access_token:
+                _LOGGER.debug(f"Stream of {entity_id} is no longer kept warm")
+                self._streams.pop(entity_id)
+                self._entry_ids.pop(entity_id, None)
+                continue
+
+            self._keep_warm(stream)
+
+        if not self._streams:
+            self.clear()
+
+        return None
+
+    @staticmethod
+    def _keep_warm(stream: Stream) -> None:
+        """Prevent the stream output from stopping due to inactivity."""
+        if provider := stream.outputs().get(StreamType.HLS):
+            provider.idle_timer.awake()
+
+        return None
+
 
 @STATE_CAPABILITIES_REGISTRY.register
 class VideoStreamCapability(ActionOnlyCapabilityMixin, StateCapability[GetStreamInstanceActionState]):
@@ -49,33 +157,61 @@ class VideoStreamCapability(ActionOnlyCapabilityMixin, StateCapability[GetStream
         self, context: Context, state: GetStreamInstanceActionState
     ) -> GetStreamInstanceActionResultValue:
         """Change capability instance state."""
+        return GetStreamInstanceActionResultValue(stream_url=await self._async_get_stream_url(), protocol="hls")
+
+    async def async_prewarm(self) -> None:
+        """Start the stream in advance to reduce time to the first frame."""
+        try:
+            await self._async_get_stream_url()
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"Failed to pre-warm stream of {self.state.entity_id}: timeout")
+        except HomeAssistantError as e:
+            _LOGGER.warning(f"Failed to pre-warm stream of {self.state.entity_id}: {e}")
+
+        return None
+
+    async def _async_get_stream_url(self) -> str:
+        """Start the stream and return its URL."""
         component: YandexSmartHome = self._hass.data[DOMAIN]
         entity_id = self.state.entity_id
         stream = await self._async_request_stream(entity_id)
 
+        if self._entity_config.get(CONF_STREAM_PREWARM):
+            component.warm_streams.touch(entity_id, stream, self._entry_data.entry.entry_id)
+
         if self._entry_data.use_cloud_stream:
             cloud_stream = component.cloud_streams.get(entity_id)
+            if cloud_stream and cloud_stream.is_stale(stream):
+                _LOGGER.debug(f"Stream of {entity_id} was restarted, reconnecting cloud stream")
+                await cloud_stream.async_stop()
+                cloud_stream = None
+
             if not cloud_stream:
-                cloud_stream = CloudStreamManager(self._hass, stream, async_get_clientsession(self._hass))
+                cloud_stream = CloudStreamManager(
+                    self._hass,
+                    stream,
+                    async_get_clientsession(self._hass),
+                    on_disconnect=partial(component.cloud_streams.pop, entity_id, None),
+                    max_send_lag=self._entry_data.cloud_stream_max_lag,
+                    max_write_buffer_size=self._entry_data.cloud_stream_max_buffer_size,
+                )
                 component.cloud_streams[entity_id] = cloud_stream
 
             await cloud_stream.async_start()
-            stream_url = cloud_stream.stream_url
-            if not stream_url:
+            if not cloud_stream.stream_url:
                 raise APIError(ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE, "Failed to start stream")
-        else:
-            try:
-                external_url = network.get_url(self._hass, allow_internal=False)
-            except network.NoURLAvailableError:
-                raise APIError(
-                    ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
-                    "Missing Home Assistant external URL. Have you set external URLs in Configuration -> General?",
-                )
 
-            endpoint_url = stream.endpoint_url(StreamType.HLS)
-            stream_url = f"{external_url}{endpoint_url}"
+            return cloud_stream.stream_url
 
-        return GetStreamInstanceActionResultValue(stream_url=stream_url, protocol="hls")
+        try:
+            external_url = network.get_url(self._hass, allow_internal=False)
+        except network.NoURLAvailableError:
+            raise APIError(
+                ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
+                "Missing Home Assistant external URL. Have you set external URLs in Configuration -> General?",
+            )
+
+        return f"{external_url}{stream.endpoint_url(StreamType.HLS)}"
 
     async def _async_request_stream(self, entity_id: str) -> Stream:
         camera_entity = _get_camera_from_entity_id(self._hass, self.state.entity_id)
@@ -86,6 +222,9 @@ class VideoStreamCapability(ActionOnlyCapabilityMixin, StateCapability[GetStream
                 ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE, f"{entity_id} does not support play stream service"
             )
 
+        if stream.access_token and StreamType.HLS in stream.outputs():
+            return stream
+
         stream.add_provider(StreamType.HLS)
 
         await stream.start()
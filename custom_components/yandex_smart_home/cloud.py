@@ -1,22 +1,35 @@
 """Implement the Yandex Smart Home cloud connection manager."""
 from __future__ import annotations
 
+import asyncio
 from asyncio import TimeoutError
+from collections import Counter, deque
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from enum import IntEnum
+from functools import partial
 from http import HTTPStatus
+import itertools
 import logging
-from typing import TYPE_CHECKING, Any, AsyncIterable, cast
+import math
+import random
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, cast
+import zlib
 
 from aiohttp import ClientConnectorError, ClientResponseError, ClientWebSocketResponse, WSMessage, WSMsgType, hdrs
 from homeassistant.core import Context, HassJob
 from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE, async_create_clientsession, async_get_clientsession
 from homeassistant.helpers.event import async_call_later
 from homeassistant.util import dt
+from homeassistant.util.json import json_loads
 from pydantic import BaseModel
 
 from . import handlers
 from .const import CLOUD_BASE_URL, DOMAIN
-from .helpers import RequestData
+from .helpers import RequestData, should_log_debug, truncate_log_body
+from .tracing import Trace, span
 
 if TYPE_CHECKING:
     from homeassistant.core import CALLBACK_TYPE, HomeAssistant
@@ -29,6 +42,17 @@ DEFAULT_RECONNECTION_DELAY = 2
 MAX_RECONNECTION_DELAY = 180
 FAST_RECONNECTION_TIME = timedelta(seconds=6)
 FAST_RECONNECTION_THRESHOLD = 5
+MAX_CONCURRENT_REQUESTS = 10
+MAX_REQUEST_WAIT_TIME = 5
+DRAIN_TIMEOUT = 10
+RESPONSE_BUFFER_SIZE = 100
+RESPONSE_BUFFER_TTL = 60
+COMPRESSION_WBITS = 15
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_RATIO_SAMPLE_RATE = 20
+RECONNECTION_STAGGER = 5
+STANDBY_EVICTION_TIME = 5
+LATENCY_STATS_SIZE = 200
 BASE_API_URL = f"{CLOUD_BASE_URL}/api/home_assistant/v1"
 
 
@@ -45,57 +69,443 @@ class CloudRequest(BaseModel):
 
     request_id: str
     action: str
-    message: str = ""
+    message: str | dict[str, Any] = ""
+
+    @classmethod
+    def parse_message(cls, data: str) -> CloudRequest:
+        """Decode a request from websocket message without validation."""
+        envelope = cast(dict[str, Any], json_loads(data))
+        return cls.construct(
+            request_id=envelope["request_id"], action=envelope["action"], message=envelope.get("message", "")
+        )
+
+
+class RequestPriority(IntEnum):
+    """Priority of a cloud request, lower value is handled first."""
+
+    ACTION = 0
+    QUERY = 1
+    DISCOVERY = 2
+
+    @classmethod
+    def from_action(cls, action: str) -> RequestPriority:
+        """Return priority for the request action."""
+        match action:
+            case "/user/devices/action":
+                return cls.ACTION
+            case "/user/devices":
+                return cls.DISCOVERY
+
+        return cls.QUERY
+
+
+@dataclass(order=True)
+class _RequestWaiter:
+    """Request waiting for a free slot."""
+
+    priority: RequestPriority
+    seq: int
+    created_at: float = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class RequestScheduler:
+    """Limit number of concurrent requests and start waiting ones by priority.
+
+    A request that waits longer than max_wait_time is started before any other to avoid starvation.
+    """
+
+    def __init__(self, limit: int, max_wait_time: float):
+        """Initialize the scheduler."""
+        self._limit = limit
+        self._max_wait_time = max_wait_time
+        self._active = 0
+        self._waiters: list[_RequestWaiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """Return number of requests waiting for a slot."""
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, priority: RequestPriority) -> AsyncIterator[None]:
+        """Hold a slot while handling a request."""
+        await self._async_acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _async_acquire(self, priority: RequestPriority) -> None:
+        """Wait for a free slot."""
+        if self._active < self._limit and not self._waiters:
+            self._active += 1
+            return None
+
+        waiter = _RequestWaiter(priority, next(self._seq), time.monotonic(), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.future.cancelled():
+                self._release()
+            raise
+
+        return None
+
+    def _release(self) -> None:
+        """Free a slot and wake up next waiting request."""
+        self._active -= 1
+
+        while self._active < self._limit and self._waiters:
+            waiter = self._next_waiter()
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                self._active += 1
+
+        return None
+
+    def _next_waiter(self) -> _RequestWaiter:
+        """Return the request to run next."""
+        oldest = min(self._waiters, key=lambda w: w.seq)
+        if time.monotonic() - oldest.created_at >= self._max_wait_time:
+            return oldest
+
+        return min(self._waiters)
+
+
+@dataclass
+class RequestTiming:
+    """Time marks of cloud request handling stages."""
+
+    action: str
+    received: float
+    parsed: float
+    started: float = 0.0
+    handled: float = 0.0
+    serialized: float = 0.0
+    sent: float = 0.0
+
+
+class LatencyStats:
+    """Keep timings of recent cloud requests by action."""
+
+    STAGES = ("parse", "wait", "handle", "serialize", "send", "total")
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, size: int):
+        """Initialize the stats."""
+        self._size = size
+        self._timings: dict[str, deque[tuple[float, ...]]] = {}
+
+    def add(self, timing: RequestTiming) -> None:
+        """Record timing of a request."""
+        if timing.action not in self._timings:
+            self._timings[timing.action] = deque(maxlen=self._size)
+
+        self._timings[timing.action].append(
+            (
+                timing.parsed - timing.received,
+                timing.started - timing.parsed,
+                timing.handled - timing.started,
+                timing.serialized - timing.handled,
+                timing.sent - timing.serialized,
+                timing.sent - timing.received,
+            )
+        )
+        return None
+
+    def summary(self) -> dict[str, Any]:
+        """Return percentiles of stage durations (milliseconds) by action."""
+        summary: dict[str, Any] = {}
+        for action, timings in self._timings.items():
+            summary[action] = {"count": len(timings)}
+            for idx, stage in enumerate(self.STAGES):
+                values = sorted(t[idx] for t in timings)
+                summary[action][stage] = {
+                    f"p{q}": round(values[max(math.ceil(q / 100 * len(values)) - 1, 0)] * 1000, 3)
+                    for q in self.PERCENTILES
+                }
+
+        return summary
+
+
+@dataclass
+class _BufferedResponse:
+    """Response to a cloud request."""
+
+    request_id: str
+    response: str
+    created_at: float
+    sent: bool = False
+    timing: RequestTiming | None = None
+    ws: ClientWebSocketResponse | None = None
+
+
+class ResponseBuffer:
+    """Keep recent responses by request id.
+
+    Used to deliver responses computed while the connection was down and to answer retried requests
+    without handling them again.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """Initialize the buffer."""
+        self._max_size = max_size
+        self._ttl = ttl
+        self._responses: dict[str, _BufferedResponse] = {}
+
+    def get(self, request_id: str) -> _BufferedResponse | None:
+        """Return not expired response for the request."""
+        self._prune()
+        return self._responses.get(request_id)
+
+    def add(
+        self,
+        request_id: str,
+        response: str,
+        timing: RequestTiming | None = None,
+        ws: ClientWebSocketResponse | None = None,
+    ) -> _BufferedResponse:
+        """Store response for the request received from the connection."""
+        self._responses.pop(request_id, None)
+        buffered = self._responses[request_id] = _BufferedResponse(
+            request_id, response, time.monotonic(), timing=timing, ws=ws
+        )
+        self._prune()
+        return buffered
+
+    def unsent(self) -> list[_BufferedResponse]:
+        """Return not expired responses that were not delivered yet."""
+        self._prune()
+        return [r for r in self._responses.values() if not r.sent]
+
+    def _prune(self) -> None:
+        """Remove expired and excess responses."""
+        expire_before = time.monotonic() - self._ttl
+        for request_id in list(self._responses):
+            if len(self._responses) > self._max_size or self._responses[request_id].created_at < expire_before:
+                del self._responses[request_id]
+            else:
+                break
+
+        return None
+
+
+@dataclass
+class TrafficCounter:
+    """Counter of messages sent to the cloud.
+
+    Wire bytes of compressed messages are estimated from the compression ratio measured on every
+    COMPRESSION_RATIO_SAMPLE_RATE-th message to avoid compressing every message twice.
+    """
+
+    messages: int = 0
+    raw_bytes: int = 0
+    wire_bytes: int = 0
+    _ratio: float = field(default=1.0, repr=False)
+
+    def add(self, raw_bytes: int, wire_bytes: int) -> None:
+        """Account a sent message."""
+        self.messages += 1
+        self.raw_bytes += raw_bytes
+        self.wire_bytes += wire_bytes
+        return None
+
+    def add_compressed(self, raw: bytes) -> None:
+        """Account a message sent compressed."""
+        if self.messages % COMPRESSION_RATIO_SAMPLE_RATE == 0:
+            self._ratio = _deflated_size(raw) / len(raw)
+
+        return self.add(len(raw), round(len(raw) * self._ratio))
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the counters."""
+        return {"messages": self.messages, "raw_bytes": self.raw_bytes, "wire_bytes": self.wire_bytes}
+
+
+def _deflated_size(data: bytes) -> int:
+    """Return size of the message compressed by permessage-deflate extension."""
+    compressobj = zlib.compressobj(level=zlib.Z_BEST_SPEED, wbits=-COMPRESSION_WBITS)
+    return len(compressobj.compress(data) + compressobj.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+
+class CloudConnectionPool:
+    """Track cloud managers of all config entries by instance id.
+
+    When connection of one instance is restored after an outage, other instances waiting for reconnection
+    reconnect shortly (with random stagger) instead of waiting for their backoff delay.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the pool."""
+        self._managers: dict[str, CloudManager] = {}
+
+    @property
+    def instance_ids(self) -> list[str]:
+        """Return ids of registered cloud instances."""
+        return list(self._managers)
+
+    def get_health(self) -> dict[str, int]:
+        """Return number of established and total cloud connections."""
+        return {
+            "total": len(self._managers),
+            "connected": len([m for m in self._managers.values() if m.connected]),
+        }
+
+    def register(self, manager: CloudManager) -> None:
+        """Add a cloud manager to the pool."""
+        if manager.instance_id in self._managers:
+            _LOGGER.warning(f"Cloud instance {manager.instance_id} is used by multiple config entries")
+
+        self._managers[manager.instance_id] = manager
+        return None
+
+    def unregister(self, manager: CloudManager) -> None:
+        """Remove a cloud manager from the pool."""
+        if self._managers.get(manager.instance_id) is manager:
+            del self._managers[manager.instance_id]
+
+        return None
+
+    def on_connection_restored(self, manager: CloudManager) -> None:
+        """Speed up reconnection of other instances."""
+        for other in self._managers.values():
+            if other is not manager:
+                other.reconnect_soon(random.uniform(0, RECONNECTION_STAGGER))
+
+        return None
 
 
 class CloudManager:
     """Class to manage cloud connection."""
 
-    def __init__(self, hass: HomeAssistant, entry_data: ConfigEntryData):
+    def __init__(self, hass: HomeAssistant, entry_data: ConfigEntryData, pool: CloudConnectionPool | None = None):
         """Initialize a cloud manager with entry data and client session."""
         self._hass = hass
         self._entry_data = entry_data
+        self._pool = pool
         self._session = async_get_clientsession(hass)
         self._last_connection_at: datetime | None = None
         self._fast_reconnection_count = 0
+        self._disconnected_at: float | None = None
+        self._disconnections = 0
+        self._time_without_connection = 0.0
+        self._last_time_without_connection = 0.0
         self._ws: ClientWebSocketResponse | None = None
-        self._ws_reconnect_delay = DEFAULT_RECONNECTION_DELAY
+        self._ws_standby: ClientWebSocketResponse | None = None
+        self._standby_reader: asyncio.Task[None] | None = None
+        self._standby_connected_at: float | None = None
+        self._standby_disabled = False
+        self._ws_reconnect_delay: float = DEFAULT_RECONNECTION_DELAY
         self._ws_active = True
         self._unsub_connect: CALLBACK_TYPE | None = None
+        self._reconnect_at: float | None = None
+        self._requests_scheduler = RequestScheduler(entry_data.cloud_concurrent_requests, MAX_REQUEST_WAIT_TIME)
+        self._requests_tasks: set[asyncio.Task[None]] = set()
+        self._requests_in_flight: Counter[str] = Counter()
+        self._requests_pending: set[str] = set()
+        self._responses = ResponseBuffer(RESPONSE_BUFFER_SIZE, RESPONSE_BUFFER_TTL)
+        self._traffic_compressed = TrafficCounter()
+        self._traffic_uncompressed = TrafficCounter()
+        self._compression_min_size = entry_data.cloud_compression_min_size
+        self._latency_stats = LatencyStats(LATENCY_STATS_SIZE) if entry_data.use_cloud_request_stats else None
 
         self._url = f"{BASE_API_URL}/connect"
 
+        if self._pool:
+            self._pool.register(self)
+
+    @property
+    def instance_id(self) -> str:
+        """Return cloud instance id."""
+        return self._entry_data.cloud_instance_id
+
+    @property
+    def requests_in_flight(self) -> dict[str, int]:
+        """Return number of requests being handled per action."""
+        return {action: count for action, count in self._requests_in_flight.items() if count > 0}
+
+    @property
+    def _standby_available(self) -> bool:
+        """Test if the standby connection can replace the main one."""
+        return self._ws_standby is not None and not self._ws_standby.closed and self._standby_reader is not None
+
+    @property
+    def connected(self) -> bool:
+        """Test if the connection to the cloud is established."""
+        return self._disconnected_at is None and self._ws is not None and not self._ws.closed
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return diagnostics for the cloud connection."""
+        time_without_connection = self._time_without_connection
+        if self._disconnected_at is not None:
+            time_without_connection += time.monotonic() - self._disconnected_at
+
+        return {
+            "connected": self.connected,
+            "standby_connected": self._standby_available,
+            "standby_disabled": self._standby_disabled,
+            "disconnections": self._disconnections,
+            "time_without_connection": round(time_without_connection, 3),
+            "last_time_without_connection": round(self._last_time_without_connection, 3),
+            "reconnect_delay": round(self._ws_reconnect_delay, 3),
+            "requests_in_flight": self.requests_in_flight,
+            "traffic": {
+                "compressed": self._traffic_compressed.as_dict(),
+                "uncompressed": self._traffic_uncompressed.as_dict(),
+            },
+            **({"latency": self._latency_stats.summary()} if self._latency_stats else {}),
+        }
+
     async def async_connect(self, *_: Any) -> None:
         """Connect to the cloud."""
+        self._reconnect_at = None
+
         # noinspection PyBroadException
         try:
-            _LOGGER.debug(f"Connecting to {self._url}")
-            self._ws = await self._session.ws_connect(
-                self._url,
-                heartbeat=45,
-                compress=15,
-                headers={
-                    hdrs.AUTHORIZATION: f"Bearer {self._entry_data.cloud_connection_token}",
-                    hdrs.USER_AGENT: f"{SERVER_SOFTWARE} {DOMAIN}/{self._entry_data.version}",
-                },
-            )
+            reader: asyncio.Task[None] | None = None
+            if self._standby_available:
+                _LOGGER.debug("Switching to standby connection")
+                self._ws, reader = self._ws_standby, self._standby_reader
+                self._ws_standby = self._standby_reader = None
+            else:
+                _LOGGER.debug(f"Connecting to {self._url}")
+                self._ws = await self._async_ws_connect()
 
             _LOGGER.debug("Connection to Yandex Smart Home cloud established")
-            self._ws_reconnect_delay = DEFAULT_RECONNECTION_DELAY
-            self._last_connection_at = dt.utcnow()
+            self._on_connected()
+
+            await self._async_flush_responses()
+
+            if self._entry_data.use_cloud_standby and not self._standby_disabled and not self._standby_available:
+                self._hass.async_create_background_task(self._async_connect_standby(), f"{DOMAIN} cloud standby")
 
-            async for msg in cast(AsyncIterable[WSMessage], self._ws):
-                if msg.type == WSMsgType.TEXT:
-                    await self._on_message(msg)
+            assert self._ws is not None
+            if reader:
+                await reader
+            else:
+                await self._async_receive(self._ws)
 
             _LOGGER.debug(f"Disconnected: {self._ws.close_code}")
+            if self._standby_available and self._standby_connected_recently:
+                self._disable_standby("main connection was closed after standby connection was established")
+
+            self._on_connection_lost()
             if self._ws.close_code is not None:
                 self._try_reconnect()
         except (ClientConnectorError, ClientResponseError, TimeoutError):
             _LOGGER.exception("Failed to connect to Yandex Smart Home cloud")
+            self._on_connection_lost()
             self._try_reconnect()
         except Exception:
             _LOGGER.exception("Unexpected exception")
+            self._on_connection_lost()
             self._try_reconnect()
 
         return None
@@ -103,8 +513,15 @@ class CloudManager:
     async def async_disconnect(self, *_: Any) -> None:
         """Disconnect from the cloud."""
         self._ws_active = False
+        if self._pool:
+            self._pool.unregister(self)
+
         if self._ws:
             await self._ws.close()
+        if self._ws_standby:
+            await self._ws_standby.close()
+
+        await self._async_drain_requests()
 
         if self._unsub_connect:
             self._unsub_connect()
@@ -112,44 +529,306 @@ class CloudManager:
 
         return None
 
-    async def _on_message(self, message: WSMessage) -> None:
-        """Handle incoming request from the cloud."""
-        request = CloudRequest.parse_raw(message.data)
-        _LOGGER.debug("Request: %s (message: %s)" % (request.action, request.message))
-
-        data = RequestData(
-            entry_data=self._entry_data,
-            context=Context(user_id=self._entry_data.user_id),
-            request_user_id=self._entry_data.cloud_instance_id,
-            request_id=request.request_id,
+    async def _async_ws_connect(self) -> ClientWebSocketResponse:
+        """Open a websocket connection to the cloud."""
+        ws = await self._session.ws_connect(
+            self._url,
+            heartbeat=45,
+            compress=COMPRESSION_WBITS,
+            headers={
+                hdrs.AUTHORIZATION: f"Bearer {self._entry_data.cloud_connection_token}",
+                hdrs.USER_AGENT: f"{SERVER_SOFTWARE} {DOMAIN}/{self._entry_data.version}",
+            },
         )
 
-        result = await handlers.async_handle_request(self._hass, data, request.action, request.message)
-        response = result.as_json()
-        _LOGGER.debug(f"Response: {response}")
+        # aiohttp compresses every frame once the extension is negotiated, compression is enabled per message instead.
+        # The writer is private, so leave aiohttp defaults if it has changed (every message is compressed then).
+        writer: Any = getattr(ws, "_writer", None)
+        if ws.compress and isinstance(getattr(writer, "compress", None), int):
+            writer.compress = 0
+        elif ws.compress:
+            _LOGGER.debug("Per-message compression is not supported by aiohttp, all messages will be compressed")
+
+        return ws
+
+    async def _async_send_str(self, ws: ClientWebSocketResponse, data: str) -> None:
+        """Send a message, compress it only if it is large enough."""
+        raw = data.encode()
+        if ws.compress and len(raw) >= self._compression_min_size:
+            await ws.send_str(data, compress=ws.compress)
+            self._traffic_compressed.add_compressed(raw)
+        else:
+            await ws.send_str(data)
+            self._traffic_uncompressed.add(len(raw), len(raw))
+
+        return None
+
+    async def _async_receive(self, ws: ClientWebSocketResponse) -> None:
+        """Handle incoming messages until the connection is closed."""
+        async for msg in cast(AsyncIterable[WSMessage], ws):
+            if msg.type == WSMsgType.TEXT:
+                self._on_message(msg, ws)
 
-        assert self._ws is not None
-        await self._ws.send_str(response)
         return None
 
-    def _try_reconnect(self) -> None:
-        """Schedule reconnection to the cloud."""
-        if not self._ws_active:
+    # noinspection PyBroadException
+    async def _async_connect_standby(self) -> None:
+        """Open a standby connection to replace the main one on failure.
+
+        Assumes the relay accepts two connections with the same token for one instance and routes requests to either
+        of them. That is not guaranteed by the relay API: if opening one connection closes the other, the standby
+        is disabled until the config entry is reloaded.
+        """
+        try:
+            ws = await self._async_ws_connect()
+        except Exception:
+            _LOGGER.debug("Failed to establish standby connection", exc_info=True)
+            return None
+
+        if not self._ws_active or self._standby_available:
+            await ws.close()
+            return None
+
+        _LOGGER.debug("Standby connection established")
+        self._ws_standby = ws
+        self._standby_connected_at = time.monotonic()
+        self._standby_reader = asyncio.create_task(self._async_receive_standby(ws))
+        return None
+
+    async def _async_receive_standby(self, ws: ClientWebSocketResponse) -> None:
+        """Handle incoming messages of the standby connection until it is closed."""
+        await self._async_receive(ws)
+
+        if self._ws_active and ws is not self._ws and self._standby_connected_recently:
+            self._disable_standby("standby connection was closed shortly after it was established")
+
+        return None
+
+    @property
+    def _standby_connected_recently(self) -> bool:
+        """Test if the standby connection was established too recently to be closed by chance."""
+        if self._standby_connected_at is None:
+            return False
+
+        return time.monotonic() - self._standby_connected_at < STANDBY_EVICTION_TIME
+
+    def _disable_standby(self, reason: str) -> None:
+        """Stop opening standby connections, the relay doesn't seem to accept two connections."""
+        if not self._standby_disabled:
+            _LOGGER.warning(f"Standby connection is disabled: {reason}")
+
+        self._standby_disabled = True
+        return None
+
+    def _on_connected(self) -> None:
+        """Update connection statistics after connection is established."""
+        self._last_connection_at = dt.utcnow()
+
+        if self._disconnected_at is not None:
+            self._last_time_without_connection = time.monotonic() - self._disconnected_at
+            self._time_without_connection += self._last_time_without_connection
+            self._disconnected_at = None
+            _LOGGER.debug(f"Connection was not available for {self._last_time_without_connection:.3f} seconds")
+
+            if self._pool:
+                self._pool.on_connection_restored(self)
+
+        return None
+
+    def _on_connection_lost(self) -> None:
+        """Update connection statistics and reconnection state after connection is lost."""
+        if self._disconnected_at is not None:
             return None
 
-        self._ws_reconnect_delay = min(2 * self._ws_reconnect_delay, MAX_RECONNECTION_DELAY)
+        self._disconnected_at = time.monotonic()
+        self._disconnections += 1
 
         if self._last_connection_at and self._last_connection_at + FAST_RECONNECTION_TIME > dt.utcnow():
             self._fast_reconnection_count += 1
         else:
             self._fast_reconnection_count = 0
+            self._ws_reconnect_delay = DEFAULT_RECONNECTION_DELAY
+
+        return None
+
+    def _on_message(self, message: WSMessage, ws: ClientWebSocketResponse | None = None) -> None:
+        """Handle incoming request from the cloud received from the connection."""
+        received_at = time.monotonic() if self._latency_stats else 0.0
+        trace_started = time.perf_counter() if self._entry_data.tracer else 0.0
+        request = CloudRequest.parse_message(message.data)
+        timing = RequestTiming(request.action, received_at, time.monotonic()) if self._latency_stats else None
+
+        trace: Trace | None = None
+        if self._entry_data.tracer:
+            trace = self._entry_data.tracer.new_trace(request.action, request.request_id, trace_started)
+            trace.add_span("parse", trace_started, time.perf_counter())
+
+        if log := should_log_debug(_LOGGER, self._entry_data.log_sample_rate):
+            _LOGGER.debug(f"Request: {request.action} (message: {truncate_log_body(request.message)})")
+
+        if request.request_id in self._requests_pending:
+            _LOGGER.debug(f"Request {request.request_id} is already being handled")
+            return None
+
+        if buffered := self._responses.get(request.request_id):
+            _LOGGER.debug(f"Request {request.request_id} was already handled, sending previous response")
+            buffered.sent = False
+            buffered.ws = ws
+            self._hass.async_create_task(self._async_flush_responses())
+            return None
+
+        self._requests_pending.add(request.request_id)
+        self._requests_in_flight[request.action] += 1
+        task = self._hass.async_create_task(self._async_handle_request(request, timing, log, trace, ws))
+        self._requests_tasks.add(task)
+        task.add_done_callback(self._requests_tasks.discard)
+        return None
+
+    # noinspection PyBroadException
+    async def _async_handle_request(
+        self,
+        request: CloudRequest,
+        timing: RequestTiming | None = None,
+        log: bool = False,
+        trace: Trace | None = None,
+        ws: ClientWebSocketResponse | None = None,
+    ) -> None:
+        """Handle a request and send the response back to the cloud using the connection it was received from."""
+        tracer = self._entry_data.tracer
+        try:
+            with tracer.activate(trace) if tracer and trace else nullcontext():
+                data = RequestData(
+                    entry_data=self._entry_data,
+                    context=Context(user_id=self._entry_data.user_id),
+                    request_user_id=self._entry_data.cloud_instance_id,
+                    request_id=request.request_id,
+                )
+
+                result = await handlers.async_handle_request(
+                    self._hass,
+                    data,
+                    request.action,
+                    request.message,
+                    slot=partial(self._request_slot, request.action, timing, trace, time.perf_counter()),
+                )
+                if timing:
+                    timing.handled = time.monotonic()
+
+                with span("serialize"):
+                    response = result.as_json()
+                if timing:
+                    timing.serialized = time.monotonic()
+
+                if log:
+                    _LOGGER.debug(f"Response: {truncate_log_body(response)}")
+
+                self._responses.add(request.request_id, response, timing, ws)
+                with span("send"):
+                    await self._async_flush_responses()
+        except Exception:
+            _LOGGER.exception(f"Failed to handle request {request.request_id}")
+        finally:
+            self._requests_in_flight[request.action] -= 1
+            self._requests_pending.discard(request.request_id)
+
+        return None
+
+    @asynccontextmanager
+    async def _request_slot(
+        self, action: str, timing: RequestTiming | None, trace: Trace | None, waiting_since: float
+    ) -> AsyncIterator[None]:
+        """Hold a slot of the request scheduler while handling an admitted request."""
+        async with self._requests_scheduler.slot(RequestPriority.from_action(action)):
+            if timing:
+                timing.started = time.monotonic()
+            if trace:
+                trace.add_span("wait", waiting_since, time.perf_counter())
+
+            with span("handle"):
+                yield
+
+    async def _async_flush_responses(self) -> None:
+        """Send responses that were not delivered yet, keep them buffered while the connection is down.
+
+        A response is sent using the connection its request was received from. If that connection is closed,
+        the main connection is used.
+        """
+        for buffered in self._responses.unsent():
+            if buffered.sent:  # sent by another flush while this one was sending
+                continue
+
+            ws = buffered.ws if buffered.ws is not None and not buffered.ws.closed else self._ws
+            if ws is None or ws.closed:
+                _LOGGER.debug(f"Connection is not available, response to {buffered.request_id} is buffered")
+                continue
+
+            buffered.sent = True
+            try:
+                await self._async_send_str(ws, buffered.response)
+            except ConnectionError:
+                buffered.sent = False
+                _LOGGER.debug(f"Failed to send response to {buffered.request_id}, response is buffered")
+                continue
+
+            if buffered.timing and self._latency_stats:
+                buffered.timing.sent = time.monotonic()
+                self._latency_stats.add(buffered.timing)
+                buffered.timing = None
+
+        return None
+
+    async def _async_drain_requests(self) -> None:
+        """Wait for requests being handled, cancel ones that don't finish in time."""
+        if not self._requests_tasks:
+            return None
+
+        _LOGGER.debug(f"Waiting for {len(self._requests_tasks)} request(s) to complete")
+        _, pending = await asyncio.wait(list(self._requests_tasks), timeout=DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+
+        return None
+
+    def _try_reconnect(self) -> None:
+        """Schedule reconnection to the cloud.
+
+        Delay is calculated using decorrelated jitter backoff and is not reset while the connection keeps dropping
+        shortly after being established. Standby connection is used immediately if available.
+        """
+        if not self._ws_active:
+            return None
+
+        if self._standby_available:
+            self._schedule_connect(0)
+            return None
+
+        self._ws_reconnect_delay = min(
+            random.uniform(DEFAULT_RECONNECTION_DELAY, self._ws_reconnect_delay * 3), MAX_RECONNECTION_DELAY
+        )
 
         if self._fast_reconnection_count >= FAST_RECONNECTION_THRESHOLD:
-            self._ws_reconnect_delay = MAX_RECONNECTION_DELAY
-            _LOGGER.warning(f"Reconnecting too fast, next reconnection in {self._ws_reconnect_delay} seconds")
+            _LOGGER.warning(f"Reconnecting too fast, next reconnection in {self._ws_reconnect_delay:.0f} seconds")
+
+        _LOGGER.debug(f"Trying to reconnect in {self._ws_reconnect_delay:.0f} seconds")
+        self._schedule_connect(self._ws_reconnect_delay)
+        return None
+
+    def reconnect_soon(self, delay: float) -> None:
+        """Reconnect after the delay if waiting for reconnection longer."""
+        if not self._ws_active or self._reconnect_at is None or self._reconnect_at - time.monotonic() <= delay:
+            return None
+
+        if self._unsub_connect:
+            self._unsub_connect()
+
+        _LOGGER.debug(f"Network is available again, trying to reconnect in {delay:.0f} seconds")
+        self._schedule_connect(delay)
+        return None
 
-        _LOGGER.debug(f"Trying to reconnect in {self._ws_reconnect_delay} seconds")
-        self._unsub_connect = async_call_later(self._hass, self._ws_reconnect_delay, HassJob(self.async_connect))
+    def _schedule_connect(self, delay: float) -> None:
+        """Schedule connection to the cloud."""
+        self._reconnect_at = time.monotonic() + delay
+        self._unsub_connect = async_call_later(self._hass, delay, HassJob(self.async_connect))
         return None
 
 
@@ -1,8 +1,12 @@
 """Implement the Yandex Smart Home cloud connection manager for video streaming."""
 import asyncio
+from collections import OrderedDict
 from datetime import timedelta
+from functools import lru_cache
+from http import HTTPStatus
 import logging
-from typing import Any, AsyncIterable, cast
+import time
+from typing import Any, AsyncIterable, Callable, cast
 
 from aiohttp import (
     ClientConnectionError,
@@ -34,7 +38,13 @@ from .const import CLOUD_STREAM_BASE_URL
 _LOGGER = logging.getLogger(__name__)
 
 RECONNECTION_DELAY = 2
+KEEPALIVE_INTERVAL = timedelta(seconds=30)
 WAIT_FOR_CONNECTION_TIMEOUT = 10
+MAX_CONCURRENT_REQUESTS = 4
+SEGMENT_CACHE_MAX_ITEMS = 32
+SEGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+MAX_SEND_LAG = 3.0
+MAX_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
 
 
 class Request(BaseModel):
@@ -53,6 +63,80 @@ class ResponseMeta(BaseModel):
     headers: dict[str, str]
 
 
+VIEWS: dict[str, type[StreamView]] = {
+    "master_playlist": HlsMasterPlaylistView,
+    "playlist": HlsPlaylistView,
+    "init": HlsInitView,
+    "part": HlsPartView,
+    "segment": HlsSegmentView,
+}
+CACHEABLE_VIEWS = {"part", "segment"}
+
+
+@lru_cache(maxsize=64)
+def _encode_response_meta(status_code: int, headers: tuple[tuple[str, str], ...]) -> bytes:
+    """Return encoded response metadata with the separator."""
+    return ResponseMeta(status_code=status_code, headers=dict(headers)).json().encode() + b"\r\n"
+
+
+def frame_response(status_code: int, headers: tuple[tuple[str, str], ...], body: bytes) -> bytes:
+    """Return response message: metadata, separator and body.
+
+    Metadata is encoded once per distinct status and headers, the body is copied only once.
+    """
+    return b"".join((_encode_response_meta(status_code, headers), body))
+
+
+class SegmentCache:
+    """LRU cache of framed responses limited by number of items and total size."""
+
+    def __init__(self, max_items: int, max_bytes: int):
+        """Initialize the cache."""
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._items: OrderedDict[tuple[str, str, str], bytes] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[str, str, str]) -> bytes | None:
+        """Return cached response and mark it as recently used."""
+        if (response := self._items.get(key)) is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._items.move_to_end(key)
+        return response
+
+    def put(self, key: tuple[str, str, str], response: bytes) -> None:
+        """Store a response, evict least recently used ones if needed."""
+        if len(response) > self._max_bytes:
+            return None
+
+        if (previous := self._items.pop(key, None)) is not None:
+            self._size -= len(previous)
+
+        self._items[key] = response
+        self._size += len(response)
+
+        while len(self._items) > self._max_items or self._size > self._max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+        return None
+
+
+def _write_buffer_size(ws: ClientWebSocketResponse) -> int:
+    """Return number of bytes waiting in the transport to be sent."""
+    # aiohttp does not expose the transport of a client websocket
+    transport = getattr(getattr(ws, "_writer", None), "transport", None)
+    if transport is None:
+        return 0
+
+    return cast(int, transport.get_write_buffer_size())
+
+
 class WebRequest:
     """Represent minimal HTTP request to use in HomeAssistantView"""
 
@@ -70,17 +154,33 @@ class WebRequest:
 class CloudStreamManager:
     """Class to manage cloud connection for streaming."""
 
-    def __init__(self, hass: HomeAssistant, stream: Stream, session: ClientSession):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        stream: Stream,
+        session: ClientSession,
+        on_disconnect: Callable[[], Any] | None = None,
+        max_send_lag: float = MAX_SEND_LAG,
+        max_write_buffer_size: int = MAX_WRITE_BUFFER_SIZE,
+    ):
         """Initialize a cloud manager with stream and client session."""
 
         self._hass = hass
         self._stream = stream
+        self._on_disconnect = on_disconnect
+        self._max_send_lag = max_send_lag
+        self._max_write_buffer_size = max_write_buffer_size
         self._running_stream_id: str | None = None
         self._session = session
         self._connected = asyncio.Event()
         self._ws: ClientWebSocketResponse | None = None
         self._unsub_connect: CALLBACK_TYPE | None = None
         self._unsub_keepalive: CALLBACK_TYPE | None = None
+        self._segment_cache = SegmentCache(SEGMENT_CACHE_MAX_ITEMS, SEGMENT_CACHE_MAX_BYTES)
+
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.dropped_parts = 0
 
     @property
     def stream_url(self) -> str | None:
@@ -90,6 +190,25 @@ class CloudStreamManager:
 
         return f"{CLOUD_STREAM_BASE_URL}/{self._running_stream_id}/master_playlist.m3u8"
 
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return diagnostics for the stream relay."""
+        return {
+            "connected": self._connected.is_set(),
+            "lag": round(self.lag, 3),
+            "max_lag": round(self.max_lag, 3),
+            "dropped_parts": self.dropped_parts,
+            "cache_hits": self._segment_cache.hits,
+            "cache_misses": self._segment_cache.misses,
+        }
+
+    def is_stale(self, stream: Stream) -> bool:
+        """Test if the manager relays another stream or an access token the stream doesn't use anymore."""
+        return self._stream is not stream or (self._running_stream_id is not None and not self._stream_alive)
+
+    async def async_stop(self) -> None:
+        """Disconnect from the cloud."""
+        return await self._async_disconnect()
+
     async def async_start(self) -> None:
         """Start connection."""
         if self._ws or not self._stream.access_token:
@@ -101,12 +220,20 @@ class CloudStreamManager:
         await asyncio.wait_for(self._connected.wait(), timeout=WAIT_FOR_CONNECTION_TIMEOUT)
         return await self._async_keepalive()
 
+    @property
+    def _stream_alive(self) -> bool:
+        """Test if the stream is still running with the same access token."""
+        return self._stream.access_token == self._running_stream_id
+
     async def _async_keepalive(self, *_: Any) -> None:
-        """Disconnect if stream is not active anymore."""
-        if self._stream.access_token != self._running_stream_id:
+        """Disconnect if stream is not active anymore.
+
+        Liveness is checked on every request from the cloud, the timer only catches streams without requests.
+        """
+        if not self._stream_alive:
             return await self._async_disconnect()
 
-        self._unsub_keepalive = async_call_later(self._hass, timedelta(seconds=1), HassJob(self._async_keepalive))
+        self._unsub_keepalive = async_call_later(self._hass, KEEPALIVE_INTERVAL, HassJob(self._async_keepalive))
         return None
 
     async def _async_connect(self, *_: Any) -> None:
@@ -119,17 +246,15 @@ class CloudStreamManager:
         # noinspection PyBroadException
         try:
             _LOGGER.debug(f"Connecting to {ws_url}")
-            self._ws = await self._session.ws_connect(ws_url, heartbeat=30)
+            ws = self._ws = await self._session.ws_connect(ws_url, heartbeat=30)
 
             _LOGGER.debug("Connection to Yandex Smart Home cloud established")
             self._connected.set()
 
-            async for msg in cast(AsyncIterable[WSMessage], self._ws):
-                if msg.type == WSMsgType.TEXT:
-                    await self._on_message(msg)
+            await self._async_handle_messages(ws)
 
-            _LOGGER.debug(f"Disconnected: {self._ws.close_code}")
-            if self._ws.close_code is not None:
+            _LOGGER.debug(f"Disconnected: {ws.close_code}")
+            if ws.close_code is not None:
                 self._try_reconnect()
         except (ClientConnectionError, ClientResponseError, asyncio.TimeoutError):
             _LOGGER.exception("Failed to connect to Yandex Smart Home cloud")
@@ -156,40 +281,109 @@ class CloudStreamManager:
         self._unsub_connect = None
         self._unsub_keepalive = None
 
+        if self._on_disconnect:
+            self._on_disconnect()
+            self._on_disconnect = None
+
+        return None
+
+    async def _async_handle_messages(self, ws: ClientWebSocketResponse) -> None:
+        """Handle incoming requests concurrently, send responses in order of the requests."""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        responses: asyncio.Queue[asyncio.Task[tuple[str, bytes, float]] | None] = asyncio.Queue()
+        sender = asyncio.create_task(self._async_send_responses(ws, responses))
+
+        try:
+            async for msg in cast(AsyncIterable[WSMessage], ws):
+                if msg.type == WSMsgType.TEXT:
+                    if not self._stream_alive:
+                        _LOGGER.debug("Stream is not active anymore")
+                        self._hass.async_create_task(self._async_disconnect())
+                        break
+
+                    await semaphore.acquire()
+                    task = asyncio.create_task(self._async_prepare_response(msg))
+                    task.add_done_callback(lambda _: semaphore.release())
+                    responses.put_nowait(task)
+
+            responses.put_nowait(None)
+            await sender
+        finally:
+            sender.cancel()
+            while not responses.empty():
+                if pending := responses.get_nowait():
+                    pending.cancel()
+
         return None
 
-    async def _on_message(self, message: WSMessage) -> None:
-        """Handle incoming request from the cloud."""
+    async def _async_send_responses(
+        self,
+        ws: ClientWebSocketResponse,
+        responses: asyncio.Queue[asyncio.Task[tuple[str, bytes, float]] | None],
+    ) -> None:
+        """Send responses to the cloud as soon as they are ready, keeping order of the requests.
+
+        When the connection can't keep up, stale parts and segments are replaced with an error response
+        so the player skips them instead of falling further behind.
+        """
+        # noinspection PyBroadException
+        try:
+            while (task := await responses.get()) is not None:
+                view, response, ready_at = await task
+
+                self.lag = time.monotonic() - ready_at
+                self.max_lag = max(self.max_lag, self.lag)
+                if view in CACHEABLE_VIEWS and (
+                    self.lag > self._max_send_lag or _write_buffer_size(ws) > self._max_write_buffer_size
+                ):
+                    _LOGGER.debug(f"Connection is lagging ({self.lag:.1f}s), dropping {view}")
+                    self.dropped_parts += 1
+                    response = frame_response(HTTPStatus.SERVICE_UNAVAILABLE, (), b"")
+
+                await ws.send_bytes(response, compress=False)
+        except Exception:
+            _LOGGER.exception("Failed to handle request")
+            await ws.close()
+
+        return None
+
+    async def _async_prepare_response(self, message: WSMessage) -> tuple[str, bytes, float]:
+        """Return the requested view, the response and the time it became ready to send."""
         _LOGGER.debug(f"Request: {message.data}")
 
         request = Request.parse_raw(message.data)
+        return request.view, await self._on_message(request), time.monotonic()
+
+    async def _on_message(self, request: Request) -> bytes:
+        """Handle incoming request from the cloud and return the response."""
+        cache_key = (request.view, request.sequence, request.part_num)
+        cacheable = request.view in CACHEABLE_VIEWS
+        if cacheable and (cached := self._segment_cache.get(cache_key)) is not None:
+            return cached
+
         request_url = yarl.URL.build(path=f"{request.view}", query=request.url_query)
         web_request = cast(AIOWebRequest, WebRequest(self._hass, request_url))
 
-        views: dict[str, type[StreamView]] = {
-            "master_playlist": HlsMasterPlaylistView,
-            "playlist": HlsPlaylistView,
-            "init": HlsInitView,
-            "part": HlsPartView,
-            "segment": HlsSegmentView,
-        }
-
-        view = views[request.view]()
+        view = VIEWS[request.view]()
 
         r = cast(
             web.Response,
             await view.get(web_request, self._stream.access_token or "", request.sequence, request.part_num),
         )
-        assert self._ws is not None
         body = r.body if r.body is not None else b""
         assert isinstance(body, bytes)
-        meta = ResponseMeta(status_code=r.status, headers=dict(r.headers))
-        response = bytes(meta.json(), "utf-8") + b"\r\n" + body
-        return await self._ws.send_bytes(response, compress=False)
+        response = frame_response(r.status, tuple(r.headers.items()), body)
+        if cacheable and r.status == HTTPStatus.OK:
+            self._segment_cache.put(cache_key, response)
+
+        return response
 
     def _try_reconnect(self) -> None:
-        """Schedule reconnection to the cloud."""
+        """Schedule reconnection to the cloud unless the stream was stopped."""
+        if self._running_stream_id is None or not self._stream_alive:
+            _LOGGER.debug("Stream is not active anymore, not reconnecting")
+            return None
 
         _LOGGER.debug(f"Trying to reconnect in {RECONNECTION_DELAY} seconds")
-        self._unsub_reconnect = async_call_later(self._hass, RECONNECTION_DELAY, HassJob(self._async_connect))
+        self._unsub_connect = async_call_later(self._hass, RECONNECTION_DELAY, HassJob(self._async_connect))
         return None
@@ -1,7 +1,10 @@
 """Color manipulation helpers."""
+from __future__ import annotations
+
+from collections import OrderedDict
 from enum import StrEnum
 from math import sqrt
-from typing import Self
+from typing import Any, Self
 
 from homeassistant.components import light
 from homeassistant.core import State
@@ -47,12 +50,31 @@ def int_to_rgb(i: int) -> RGBColor:
     return RGBColor(r=(i >> 16) & 0xFF, g=(i >> 8) & 0xFF, b=i & 0xFF)
 
 
+TEMPERATURE_CONVERTERS_CACHE_SIZE = 128
+"""Max number of color temperature converters kept for distinct profile and light temperature ranges."""
+
+COLOR_MATCH_TOLERANCE = 2
+"""Max euclidean distance between HA color and profile color to treat them as equal."""
+
+
+def _neighbour_offsets(tolerance: int) -> list[int]:
+    """Return packed int offsets of all the colors within the distance (excluding out of range channels)."""
+    r = range(-tolerance, tolerance + 1)
+    return [
+        (dr << 16) + (dg << 8) + db
+        for dr in r
+        for dg in r
+        for db in r
+        if dr * dr + dg * dg + db * db <= tolerance * tolerance
+    ]
+
+
 ColorProfile = dict[ColorName, int]
 """Hold int value for color/temperature name."""
 
 
 class ColorProfiles(dict[str, ColorProfile]):
-    """Represent color profiles."""
+    """Represent color profiles and converters shared by all the lights using them."""
 
     _default_profiles = {
         "natural": {
@@ -72,16 +94,66 @@ class ColorProfiles(dict[str, ColorProfile]):
         }
     }
 
+    def __init__(self, profiles: dict[str, ColorProfile] | None = None):
+        """Initialize the color profiles."""
+        super().__init__(profiles or {})
+
+        self._color_converters: dict[str | None, ColorConverter] = {}
+        self._temperature_converters: OrderedDict[
+            tuple[str | None, int, int], ColorTemperatureConverter
+        ] = OrderedDict()
+        self._temperature_converters_hits = 0
+        self._temperature_converters_misses = 0
+
     @classmethod
     def from_dict(cls, data: dict[str, dict[str, int]]) -> Self:
         """Intialize the color profiles from a dict."""
-        profiles = cls._default_profiles.copy()
+        profiles = {name: profile.copy() for name, profile in cls._default_profiles.items()}
         for profile_name, mapping in data.items():
             profiles.setdefault(profile_name, {})
             profiles[profile_name].update({ColorName(name): v for name, v in mapping.items()})
 
         return cls(profiles)
 
+    def get_color_converter(self, profile_name: str | None) -> ColorConverter:
+        """Return the color converter for a profile (raises KeyError if the profile not found)."""
+        if (converter := self._color_converters.get(profile_name)) is None:
+            converter = ColorConverter(self[profile_name] if profile_name else None)
+            self._color_converters[profile_name] = converter
+
+        return converter
+
+    def get_temperature_converter(self, profile_name: str | None, state: State) -> ColorTemperatureConverter:
+        """Return the color temperature converter for a profile and the light's temperature range."""
+        min_color_temp, max_color_temp = ColorTemperatureConverter.get_state_range(state)
+        key = (profile_name, min_color_temp, max_color_temp)
+
+        if (converter := self._temperature_converters.get(key)) is not None:
+            self._temperature_converters_hits += 1
+            self._temperature_converters.move_to_end(key)
+            return converter
+
+        self._temperature_converters_misses += 1
+        converter = ColorTemperatureConverter(
+            self[profile_name] if profile_name else None, min_color_temp, max_color_temp
+        )
+        self._temperature_converters[key] = converter
+        if len(self._temperature_converters) > TEMPERATURE_CONVERTERS_CACHE_SIZE:
+            self._temperature_converters.popitem(last=False)
+
+        return converter
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return converters cache statistics."""
+        return {
+            "color_converters": len(self._color_converters),
+            "temperature_converters": {
+                "size": len(self._temperature_converters),
+                "hits": self._temperature_converters_hits,
+                "misses": self._temperature_converters_misses,
+            },
+        }
+
 
 class ColorConverter:
     """Utility to convert Yandex color to HA and vise-versa."""
@@ -119,17 +191,35 @@ class ColorConverter:
             self._yandex_mapping[yandex_value] = ha_value
             self._ha_mapping[ha_value] = yandex_value
 
+        self._ha_index = self._build_ha_index(self._ha_mapping)
+
     def get_ha_color(self, yandex_color: int) -> RGBColor:
         """Return HA color for Yandex color."""
         return int_to_rgb(self._yandex_mapping.get(yandex_color, yandex_color))
 
     def get_yandex_color(self, ha_color: RGBColor) -> int:
         """Return Yandex color for HA color."""
-        for from_ha_value, to_yandex_value in self._ha_mapping.items():
-            if self._distance(ha_color, int_to_rgb(from_ha_value)) <= 2:
-                return to_yandex_value
+        ha_value = rgb_to_int(ha_color)
+        return self._ha_index.get(ha_value, ha_value)
 
-        return rgb_to_int(ha_color)
+    @staticmethod
+    def _build_ha_index(ha_mapping: dict[int, int]) -> dict[int, int]:
+        """Return Yandex color for every HA color close to a profile color.
+
+        The first profile color in the mapping order wins if several are close to the same HA color.
+        """
+        index: dict[int, int] = {}
+        offsets = _neighbour_offsets(COLOR_MATCH_TOLERANCE)
+        for from_ha_value, to_yandex_value in ha_mapping.items():
+            color = int_to_rgb(from_ha_value)
+            for offset in offsets:
+                neighbour = from_ha_value + offset
+                if neighbour < 0 or neighbour > 0xFFFFFF:
+                    continue
+                if ColorConverter._distance(color, int_to_rgb(neighbour)) <= COLOR_MATCH_TOLERANCE:
+                    index.setdefault(neighbour, to_yandex_value)
+
+        return index
 
     @staticmethod
     def _distance(a: RGBColor, b: RGBColor) -> float:
@@ -154,20 +244,14 @@ class ColorTemperatureConverter:
     }
     _temperature_steps = sorted(_palette.values())
 
-    def __init__(self, profile: ColorProfile | None, state: State):
-        """Initialize the color temperature converter from color profile."""
+    def __init__(self, profile: ColorProfile | None, min_color_temp: int, max_color_temp: int):
+        """Initialize the color temperature converter from color profile and rounded temperature range."""
 
         self._yandex_mapping: dict[int, int] = {}
         self._ha_mapping: dict[int, int] = {}
 
         profile = profile or {}
         range_extend_threshold = 200
-        min_color_temp = self._round_color_temperature(
-            int(state.attributes.get(light.ATTR_MIN_COLOR_TEMP_KELVIN, 2000))
-        )
-        max_color_temp = self._round_color_temperature(
-            int(state.attributes.get(light.ATTR_MAX_COLOR_TEMP_KELVIN, 6500))
-        )
 
         for color_name, yandex_value in self._palette.items():
             ha_value = self._round_color_temperature(profile.get(color_name, yandex_value))
@@ -197,6 +281,14 @@ class ColorTemperatureConverter:
         color_temperature = self._round_color_temperature(ha_color_temperature)
         return self._ha_mapping.get(color_temperature, color_temperature)
 
+    @classmethod
+    def get_state_range(cls, state: State) -> tuple[int, int]:
+        """Return rounded temperature range of a light."""
+        return (
+            cls._round_color_temperature(int(state.attributes.get(light.ATTR_MIN_COLOR_TEMP_KELVIN, 2000))),
+            cls._round_color_temperature(int(state.attributes.get(light.ATTR_MAX_COLOR_TEMP_KELVIN, 6500))),
+        )
+
     @property
     def supported_range(self) -> tuple[int, int]:
         """Return temperature range supported for the state."""
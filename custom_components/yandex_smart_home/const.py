@@ -7,6 +7,18 @@ CONF_SETTINGS = "settings"
 CONF_PRESSURE_UNIT = "pressure_unit"
 CONF_BETA = "beta"
 CONF_CLOUD_STREAM = "cloud_stream"
+CONF_CLOUD_STREAM_MAX_LAG = "cloud_stream_max_lag"
+CONF_CLOUD_STREAM_MAX_BUFFER_SIZE = "cloud_stream_max_buffer_size"
+CONF_CLOUD_STANDBY = "cloud_standby"
+CONF_CLOUD_REQUEST_STATS = "cloud_request_stats"
+CONF_CLOUD_COMPRESSION_MIN_SIZE = "cloud_compression_min_size"
+CONF_CLOUD_CONCURRENT_REQUESTS = "cloud_concurrent_requests"
+CONF_REQUEST_TRACING = "request_tracing"
+CONF_LOG_SAMPLE_RATE = "log_sample_rate"
+CONF_REQUEST_LIMITS = "request_limits"
+CONF_REQUEST_LIMIT = "limit"
+CONF_REQUEST_QUEUE_SIZE = "queue_size"
+CONF_REQUEST_QUEUE_TIMEOUT = "queue_timeout"
 CONF_NOTIFIER = "notifier"
 CONF_NOTIFIER_OAUTH_TOKEN = "oauth_token"
 CONF_NOTIFIER_SKILL_ID = "skill_id"
@@ -29,6 +41,7 @@ CONF_DEVICE_CLASS = "device_class"
 CONF_FEATURES = "features"
 CONF_SUPPORT_SET_CHANNEL = "support_set_channel"
 CONF_STATE_UNKNOWN = "state_unknown"
+CONF_STREAM_PREWARM = "stream_prewarm"
 CONF_ERROR_CODE_TEMPLATE = "error_code_template"
 CONF_ENTITY_PROPERTY_TYPE = "type"
 CONF_ENTITY_PROPERTY_ENTITY = "entity"
@@ -1,6 +1,7 @@
 """Yandex Smart Home user device."""
 from __future__ import annotations
 
+from dataclasses import dataclass
 import logging
 import re
 from typing import TYPE_CHECKING, Any
@@ -48,10 +49,10 @@ from . import (  # noqa: F401
 )
 from . import const  # noqa: F401
 from .capability import STATE_CAPABILITIES_REGISTRY, StateCapability
-from .capability_custom import get_custom_capability
+from .capability_custom import CustomCapabilityFactory, get_custom_capability_factory
 from .helpers import ActionNotAllowed, APIError
 from .property import STATE_PROPERTIES_REGISTRY, StateProperty
-from .property_custom import get_custom_property
+from .property_custom import CustomPropertyFactory, get_custom_property_factory
 from .schema import (
     CapabilityDescription,
     CapabilityInstanceAction,
@@ -66,12 +67,14 @@ from .schema import (
     PropertyInstanceState,
     ResponseCode,
 )
+from .tracing import span
 
 if TYPE_CHECKING:
     from homeassistant.core import Context, HomeAssistant
     from homeassistant.helpers.area_registry import AreaEntry, AreaRegistry
     from homeassistant.helpers.device_registry import DeviceEntry, DeviceRegistry
     from homeassistant.helpers.entity_registry import EntityRegistry, RegistryEntry
+    from homeassistant.helpers.typing import ConfigType
 
     from .capability import Capability
     from .entry_data import ConfigEntryData
@@ -143,6 +146,42 @@ def _alias_priority(text: str) -> tuple[int, str]:
     return 1, text
 
 
+@dataclass(frozen=True)
+class DevicePlan:
+    """Custom capabilities and properties of a device compiled from the entity configuration.
+
+    Property classes resolved from a configured value template are detected when the property is created,
+    see get_custom_property_factory.
+    """
+
+    capabilities: tuple[CustomCapabilityFactory, ...] = ()
+    properties: tuple[CustomPropertyFactory | APIError, ...] = ()
+
+    @classmethod
+    def compile(cls, hass: HomeAssistant, device_id: str, config: ConfigType) -> DevicePlan:
+        """Compile the plan from the entity configuration."""
+        capabilities: list[CustomCapabilityFactory] = []
+        properties: list[CustomPropertyFactory | APIError] = []
+
+        for capability_type, config_key in (
+            (CapabilityType.MODE, const.CONF_ENTITY_CUSTOM_MODES),
+            (CapabilityType.TOGGLE, const.CONF_ENTITY_CUSTOM_TOGGLES),
+            (CapabilityType.RANGE, const.CONF_ENTITY_CUSTOM_RANGES),
+        ):
+            for instance, capability_config in config.get(config_key, {}).items():
+                capabilities.append(
+                    get_custom_capability_factory(capability_config, capability_type, instance, device_id)
+                )
+
+        for property_config in config.get(const.CONF_ENTITY_PROPERTIES, []):
+            try:
+                properties.append(get_custom_property_factory(hass, property_config, device_id))
+            except APIError as e:
+                properties.append(e)
+
+        return cls(tuple(capabilities), tuple(properties))
+
+
 class Device:
     """Represent user device."""
 
@@ -164,24 +203,10 @@ class Device:
         """Return all capabilities of the device."""
         capabilities: list[Capability[Any]] = []
 
-        for capability_type, config_key in (
-            (CapabilityType.MODE, const.CONF_ENTITY_CUSTOM_MODES),
-            (CapabilityType.TOGGLE, const.CONF_ENTITY_CUSTOM_TOGGLES),
-            (CapabilityType.RANGE, const.CONF_ENTITY_CUSTOM_RANGES),
-        ):
-            if config_key in self._config:
-                for instance in self._config[config_key]:
-                    custom_capability = get_custom_capability(
-                        self._hass,
-                        self._entry_data,
-                        self._config[config_key][instance],
-                        capability_type,
-                        instance,
-                        self.id,
-                    )
-
-                    if custom_capability.supported and custom_capability not in capabilities:
-                        capabilities.append(custom_capability)
+        for capability_factory in self._entry_data.get_device_plan(self._hass, self.id).capabilities:
+            custom_capability = capability_factory(self._hass, self._entry_data)
+            if custom_capability.supported and custom_capability not in capabilities:
+                capabilities.append(custom_capability)
 
         for CapabilityT in STATE_CAPABILITIES_REGISTRY:
             state_capability = CapabilityT(self._hass, self._entry_data, self._state)
@@ -200,9 +225,13 @@ class Device:
         """Return all properties for the device."""
         properties: list[Property] = []
 
-        for property_config in self._config.get(const.CONF_ENTITY_PROPERTIES, []):
+        for property_factory in self._entry_data.get_device_plan(self._hass, self.id).properties:
+            if isinstance(property_factory, APIError):
+                _LOGGER.error(property_factory)
+                continue
+
             try:
-                custom_property = get_custom_property(self._hass, self._entry_data, property_config, self.id)
+                custom_property = property_factory(self._hass, self._entry_data)
             except APIError as e:
                 _LOGGER.error(e)
                 continue
@@ -303,21 +332,26 @@ class Device:
         if self.unavailable:
             return DeviceState(id=self.id, error_code=ResponseCode.DEVICE_UNREACHABLE)
 
-        capabilities: list[CapabilityInstanceState] = []
-        for c in [c for c in self.get_capabilities() if c.retrievable]:
-            try:
-                if (capability_state := c.get_instance_state()) is not None:
-                    capabilities.append(capability_state)
-            except APIError as e:
-                _LOGGER.error(e)
+        with span("resolve", device_id=self.id):
+            retrievable_capabilities = [c for c in self.get_capabilities() if c.retrievable]
+            retrievable_properties = [p for p in self.get_properties() if p.retrievable]
 
+        capabilities: list[CapabilityInstanceState] = []
         properties: list[PropertyInstanceState] = []
-        for p in [p for p in self.get_properties() if p.retrievable]:
-            try:
-                if (property_state := p.get_instance_state()) is not None:
-                    properties.append(property_state)
-            except APIError as e:
-                _LOGGER.error(e)
+        with span("values", device_id=self.id):
+            for c in retrievable_capabilities:
+                try:
+                    if (capability_state := c.get_instance_state()) is not None:
+                        capabilities.append(capability_state)
+                except APIError as e:
+                    _LOGGER.error(e)
+
+            for p in retrievable_properties:
+                try:
+                    if (property_state := p.get_instance_state()) is not None:
+                        properties.append(property_state)
+                except APIError as e:
+                    _LOGGER.error(e)
 
         if not capabilities and not properties:
             return DeviceState(id=self.id, error_code=ResponseCode.DEVICE_UNREACHABLE)
@@ -355,7 +389,8 @@ class Device:
                 raise ActionNotAllowed(code)
 
         try:
-            return await target_capability.set_instance_state(context, action.state)
+            with span("service_call", device_id=self.id, instance=action.state.instance):
+                return await target_capability.set_instance_state(context, action.state)
         except (APIError, ActionNotAllowed):
             raise
         except Exception as e:
@@ -429,12 +464,13 @@ async def async_get_devices(hass: HomeAssistant, entry_data: ConfigEntryData) ->
     """Return list of supported user devices."""
     devices: list[Device] = []
 
-    for state in hass.states.async_all():
-        device = Device(hass, entry_data, state.entity_id, state)
-        if not device.should_expose:
-            continue
+    with span("get_devices"):
+        for state in hass.states.async_all():
+            device = Device(hass, entry_data, state.entity_id, state)
+            if not device.should_expose:
+                continue
 
-        devices.append(device)
+            devices.append(device)
 
     return devices
 
@@ -445,7 +481,10 @@ async def async_get_device_description(hass: HomeAssistant, device: Device) -> D
     dev_reg = device_registry.async_get(hass)
     area_reg = area_registry.async_get(hass)
 
-    if (description := await device.describe(ent_reg, dev_reg, area_reg)) is not None:
+    with span("describe", device_id=device.id):
+        description = await device.describe(ent_reg, dev_reg, area_reg)
+
+    if description is not None:
         return description
 
     _LOGGER.debug(f"Missing capabilities and properties for {device.id}")
@@ -20,6 +20,7 @@ async def async_get_config_entry_diagnostics(hass: HomeAssistant, config_entry:
         "devices": {},
     }
     diag.update(component.get_diagnostics())
+    diag.update(entry_data.get_diagnostics())
 
     for device in await async_get_devices(hass, entry_data):
         diag["devices"][device.id] = {
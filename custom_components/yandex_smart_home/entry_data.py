@@ -1,12 +1,19 @@
 """Config entry data for the Yandex Smart Home."""
 
 import asyncio
+from functools import cached_property
 import logging
-from typing import Any, Self, cast
+from typing import TYPE_CHECKING, Any, Self, cast
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EVENT_HOMEASSISTANT_STARTED, EVENT_HOMEASSISTANT_STOP
-from homeassistant.core import CoreState, HomeAssistant
+from homeassistant.const import (
+    ATTR_ENTITY_ID,
+    EVENT_HOMEASSISTANT_STARTED,
+    EVENT_HOMEASSISTANT_STOP,
+    EVENT_STATE_CHANGED,
+    STATE_UNAVAILABLE,
+)
+from homeassistant.core import CoreState, Event, HomeAssistant, State, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import issue_registry as ir
 from homeassistant.helpers.entityfilter import EntityFilter
@@ -16,16 +23,25 @@ from homeassistant.loader import DATA_CUSTOM_COMPONENTS
 
 from . import capability_custom, const, property_custom
 from .capability_custom import CustomCapability, get_custom_capability
-from .cloud import CloudManager
+from .capability_video import VideoStreamCapability
+from .cloud import COMPRESSION_MIN_SIZE, MAX_CONCURRENT_REQUESTS, CloudManager
+from .cloud_stream import MAX_SEND_LAG, MAX_WRITE_BUFFER_SIZE
 from .color import ColorProfiles
 from .const import DOMAIN, ConnectionType
-from .helpers import APIError, CacheStore
-from .notifier import NotifierConfig, YandexCloudNotifier, YandexDirectNotifier, YandexNotifier
+from .device import Device, DevicePlan
+from .helpers import LOG_SAMPLE_RATE, AdmissionController, APIError, CacheStore
+from .notifier import NotifierConfig, ReportedStates, YandexCloudNotifier, YandexDirectNotifier, YandexNotifier
 from .property_custom import CustomProperty, get_custom_property
 from .schema import CapabilityType
+from .tracing import RequestTracer
+
+if TYPE_CHECKING:
+    from . import YandexSmartHome
 
 _LOGGER = logging.getLogger(__name__)
 
+_EMPTY_DEVICE_PLAN = DevicePlan()
+
 
 class ConfigEntryData:
     """Class to hold config entry data."""
@@ -44,11 +60,15 @@ class ConfigEntryData:
         self.entry = entry
         self.entity_config: ConfigType = entity_config or {}
         self._yaml_config: ConfigType = yaml_config or {}
+        self.tracer = RequestTracer() if self.use_request_tracing else None
+        self.admission = AdmissionController(self.request_limits)
 
         self._hass = hass
         self._entity_filter = entity_filter
         self._cloud_manager: CloudManager | None = None
         self._notifiers: list[YandexNotifier] = []
+        self._exposed_entities: set[str] | None = None
+        self._device_plans: dict[str, DevicePlan] = {}
         self._notifier_configs: list[NotifierConfig] = []
 
     async def async_setup(self) -> Self:
@@ -66,6 +86,11 @@ class ConfigEntryData:
         else:
             self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, self._async_setup_notifiers)
 
+        if self._hass.state == CoreState.running:
+            self._prewarm_streams()
+        else:
+            self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STARTED, self._prewarm_streams)
+
         if self._yaml_config.get(const.CONF_SETTINGS, {}).get(const.CONF_PRESSURE_UNIT):
             ir.async_create_issue(
                 self._hass,
@@ -92,6 +117,50 @@ class ConfigEntryData:
 
         return None
 
+    def get_diagnostics(self) -> ConfigType:
+        """Return diagnostics for the config entry."""
+        diag: ConfigType = {
+            "admission": self.admission.get_diagnostics(),
+            "color_profiles": self.color_profiles.get_diagnostics(),
+        }
+        if self._cloud_manager:
+            diag["cloud"] = self._cloud_manager.get_diagnostics()
+
+        if self.tracer:
+            diag["traces"] = self.tracer.get_diagnostics()
+
+        component: YandexSmartHome | None = self._hass.data.get(DOMAIN)
+        if self.use_cloud_stream and component:
+            diag["cloud_streams"] = {
+                entity_id: cloud_stream.get_diagnostics() for entity_id, cloud_stream in component.cloud_streams.items()
+            }
+
+        return diag
+
+    def get_health(self) -> ConfigType:
+        """Return health data without touching the state machine."""
+        return {
+            "devices": self.exposed_device_count,
+            "notifiers": [{"pending_states": n.pending_states} for n in self._notifiers],
+        }
+
+    @property
+    def exposed_device_count(self) -> int:
+        """Return number of exposed devices.
+
+        The devices are counted once, the counter is updated on state changes after that.
+        """
+        if self._exposed_entities is None:
+            self._exposed_entities = set()
+            for state in self._hass.states.async_all():
+                self._update_exposed_entity(state.entity_id, state)
+
+            self.entry.async_on_unload(
+                self._hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed_for_exposed)
+            )
+
+        return len(self._exposed_entities)
+
     @property
     def is_reporting_states(self) -> bool:
         """Test if the config entry can report state changes."""
@@ -106,6 +175,60 @@ class ConfigEntryData:
         settings = self._yaml_config.get(const.CONF_SETTINGS, {})
         return bool(settings.get(const.CONF_CLOUD_STREAM))
 
+    @property
+    def cloud_stream_max_lag(self) -> float:
+        """Return delay of a stream part (seconds) after which it is dropped instead of sending to the cloud."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return float(settings.get(const.CONF_CLOUD_STREAM_MAX_LAG, MAX_SEND_LAG))
+
+    @property
+    def cloud_stream_max_buffer_size(self) -> int:
+        """Return size of unsent stream data (bytes) after which stream parts are dropped."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return int(settings.get(const.CONF_CLOUD_STREAM_MAX_BUFFER_SIZE, MAX_WRITE_BUFFER_SIZE))
+
+    @property
+    def use_cloud_standby(self) -> bool:
+        """Test if the config entry keeps a standby connection to the cloud."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return bool(settings.get(const.CONF_CLOUD_STANDBY))
+
+    @property
+    def use_cloud_request_stats(self) -> bool:
+        """Test if the config entry collects timings of cloud requests."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return bool(settings.get(const.CONF_CLOUD_REQUEST_STATS))
+
+    @property
+    def cloud_compression_min_size(self) -> int:
+        """Return minimal size of a message to the cloud to be compressed (bytes)."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return int(settings.get(const.CONF_CLOUD_COMPRESSION_MIN_SIZE, COMPRESSION_MIN_SIZE))
+
+    @property
+    def cloud_concurrent_requests(self) -> int:
+        """Return maximum number of cloud requests handled at the same time."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return int(settings.get(const.CONF_CLOUD_CONCURRENT_REQUESTS, MAX_CONCURRENT_REQUESTS))
+
+    @property
+    def use_request_tracing(self) -> bool:
+        """Test if the config entry records traces of requests."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return bool(settings.get(const.CONF_REQUEST_TRACING))
+
+    @property
+    def log_sample_rate(self) -> float:
+        """Return share of requests to log when debug logging is enabled."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return float(settings.get(const.CONF_LOG_SAMPLE_RATE, LOG_SAMPLE_RATE))
+
+    @property
+    def request_limits(self) -> ConfigType:
+        """Return overrides of the request admission limits by action."""
+        settings = self._yaml_config.get(const.CONF_SETTINGS, {})
+        return cast(ConfigType, settings.get(const.CONF_REQUEST_LIMITS, {}))
+
     @property
     def connection_type(self) -> ConnectionType:
         """Return connection type."""
@@ -132,15 +255,27 @@ class ConfigEntryData:
         """Return user id for service calls (used only when cloud connection)."""
         return self.entry.options.get(const.CONF_USER_ID)
 
-    @property
+    @cached_property
     def color_profiles(self) -> ColorProfiles:
-        """Return color profiles."""
+        """Return color profiles (parsed once per config load)."""
         return ColorProfiles.from_dict(self._yaml_config.get(const.CONF_COLOR_PROFILE, {}))
 
     def get_entity_config(self, entity_id: str) -> ConfigType:
         """Return configuration for the entity."""
         return cast(ConfigType, self.entity_config.get(entity_id, {}))
 
+    def get_device_plan(self, hass: HomeAssistant, device_id: str) -> DevicePlan:
+        """Return the device plan compiled from the entity configuration (once per config load)."""
+        if device_id not in self.entity_config:
+            return _EMPTY_DEVICE_PLAN
+
+        if (plan := self._device_plans.get(device_id)) is None:
+            plan = self._device_plans[device_id] = DevicePlan.compile(
+                hass, device_id, self.get_entity_config(device_id)
+            )
+
+        return plan
+
     def should_expose(self, entity_id: str) -> bool:
         """Test if the entity should be exposed."""
         if self._entity_filter and not self._entity_filter.empty_filter:
@@ -183,16 +318,76 @@ class ConfigEntryData:
 
         return None
 
+    @callback
+    def _async_state_changed_for_exposed(self, event: Event) -> None:
+        """Update the exposed device counter on state change."""
+        old_state: State | None = event.data.get("old_state")
+        new_state: State | None = event.data.get("new_state")
+
+        if (
+            old_state
+            and new_state
+            and old_state.attributes == new_state.attributes
+            and (old_state.state == STATE_UNAVAILABLE) == (new_state.state == STATE_UNAVAILABLE)
+        ):
+            return None
+
+        return self._update_exposed_entity(event.data[ATTR_ENTITY_ID], new_state)
+
+    def _update_exposed_entity(self, entity_id: str, state: State | None) -> None:
+        """Add or remove the entity from the exposed ones."""
+        assert self._exposed_entities is not None
+
+        if state and Device(self._hass, self, entity_id, state).should_expose:
+            self._exposed_entities.add(entity_id)
+        else:
+            self._exposed_entities.discard(entity_id)
+
+        return None
+
+    @callback
+    def _prewarm_streams(self, *_: Any) -> None:
+        """Start streams of the cameras with pre-warm enabled."""
+        for entity_id, entity_config in self.entity_config.items():
+            if not entity_config.get(const.CONF_STREAM_PREWARM) or not self.should_expose(entity_id):
+                continue
+
+            if state := self._hass.states.get(entity_id):
+                capability = VideoStreamCapability(self._hass, self, state)
+                if capability.supported:
+                    self._hass.async_create_task(capability.async_prewarm())
+
+        return None
+
     async def _async_setup_cloud_connection(self) -> None:
         """Set up the cloud connection."""
-        self._cloud_manager = CloudManager(self._hass, self)
+        component: YandexSmartHome | None = self._hass.data.get(DOMAIN)
+        self._cloud_manager = CloudManager(self._hass, self, component.cloud_connections if component else None)
 
         self._hass.loop.create_task(self._cloud_manager.async_connect())
         return self.entry.async_on_unload(
             self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._cloud_manager.async_disconnect)
         )
 
+    async def async_remove(self) -> None:
+        """Remove data persisted for the config entry."""
+        for config in self._notifier_configs or self._build_notifier_configs():
+            await ReportedStates.async_remove(self._hass, config)
+
+        return None
+
     async def _get_notifier_configs(self) -> list[NotifierConfig]:
+        """Return validated notifier configurations."""
+        configs = self._build_notifier_configs()
+        for config in configs:
+            try:
+                await config.async_validate(self._hass)
+            except Exception as exc:
+                raise ConfigEntryNotReady from exc
+
+        return configs
+
+    def _build_notifier_configs(self) -> list[NotifierConfig]:
         """Return notifier configurations."""
         configs: list[NotifierConfig] = []
 
@@ -212,12 +407,6 @@ class ConfigEntryData:
                         )
                     )
 
-        for config in configs:
-            try:
-                await config.async_validate(self._hass)
-            except Exception as exc:
-                raise ConfigEntryNotReady from exc
-
         return configs
 
     def _get_trackable_states(self) -> dict[Template, list[CustomCapability | CustomProperty]]:
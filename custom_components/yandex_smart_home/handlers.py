@@ -1,10 +1,12 @@
 """The Yandex Smart Home request handlers."""
+from contextlib import AbstractAsyncContextManager, nullcontext
 import logging
-from typing import Any, Callable, Coroutine
+from typing import Any, Callable, Coroutine, cast
 
 from homeassistant.const import ATTR_ENTITY_ID
 from homeassistant.core import HomeAssistant
 from homeassistant.util.decorator import Registry
+from homeassistant.util.json import json_loads
 
 from .const import ATTR_CAPABILITY, ATTR_ERROR_CODE, EVENT_DEVICE_ACTION
 from .device import Device, async_get_device_description, async_get_device_states, async_get_devices
@@ -23,23 +25,42 @@ from .schema import (
     Response,
     ResponseCode,
     ResponsePayload,
-    StatesRequest,
     SuccessActionResult,
 )
+from .tracing import span
 
 _LOGGER = logging.getLogger(__name__)
 
+RequestPayload = str | dict[str, Any]
+
 HANDLERS: Registry[
     str,
     Callable[
-        [HomeAssistant, RequestData, str],
+        [HomeAssistant, RequestData, RequestPayload],
         Coroutine[Any, Any, ResponsePayload | None],
     ],
 ] = Registry()
 
 
-async def async_handle_request(hass: HomeAssistant, data: RequestData, action: str, payload: str) -> Response:
-    """Handle incoming API request."""
+def _decode_payload(payload: RequestPayload) -> dict[str, Any]:
+    """Return decoded request payload, JSON string is decoded once."""
+    if isinstance(payload, str):
+        return cast(dict[str, Any], json_loads(payload))
+
+    return payload
+
+
+async def async_handle_request(
+    hass: HomeAssistant,
+    data: RequestData,
+    action: str,
+    payload: RequestPayload,
+    slot: Callable[[], AbstractAsyncContextManager[None]] | None = None,
+) -> Response:
+    """Handle incoming API request.
+
+    The request is admitted first, then it takes the optional slot (a request scheduler of the connection).
+    """
     handler = HANDLERS.get(action)
 
     if handler is None:
@@ -48,7 +69,8 @@ async def async_handle_request(hass: HomeAssistant, data: RequestData, action: s
 
     # noinspection PyBroadException
     try:
-        return Response(request_id=data.request_id, payload=await handler(hass, data, payload))
+        async with data.entry_data.admission.admit(action), slot() if slot else nullcontext():
+            return Response(request_id=data.request_id, payload=await handler(hass, data, payload))
     except APIError as err:
         _LOGGER.error(f"{err.message} ({err.code})")
         return Response(request_id=data.request_id, payload=Error(error_code=ResponseCode(err.code)))
@@ -58,7 +80,7 @@ async def async_handle_request(hass: HomeAssistant, data: RequestData, action: s
 
 
 @HANDLERS.register("/user/devices")
-async def async_device_list(hass: HomeAssistant, data: RequestData, _payload: str) -> DeviceList:
+async def async_device_list(hass: HomeAssistant, data: RequestData, _payload: RequestPayload) -> DeviceList:
     """Handle request that return information about supported user devices.
 
     https://yandex.ru/dev/dialogs/smart-home/doc/reference/get-devices.html
@@ -75,23 +97,27 @@ async def async_device_list(hass: HomeAssistant, data: RequestData, _payload: st
 
 
 @HANDLERS.register("/user/devices/query")
-async def async_devices_query(hass: HomeAssistant, data: RequestData, payload: str) -> DeviceStates:
+async def async_devices_query(hass: HomeAssistant, data: RequestData, payload: RequestPayload) -> DeviceStates:
     """Handle request that return information about the states of user devices.
 
     https://yandex.ru/dev/dialogs/smart-home/doc/reference/post-devices-query.html
     """
-    request = StatesRequest.parse_raw(payload)
-    states = await async_get_device_states(hass, data.entry_data, [rd.id for rd in request.devices])
+    with span("parse"):
+        device_ids = [str(rd["id"]) for rd in _decode_payload(payload)["devices"]]
+
+    states = await async_get_device_states(hass, data.entry_data, device_ids)
     return DeviceStates(devices=states)
 
 
 @HANDLERS.register("/user/devices/action")
-async def async_devices_action(hass: HomeAssistant, data: RequestData, payload: str) -> ActionResult:
+async def async_devices_action(hass: HomeAssistant, data: RequestData, payload: RequestPayload) -> ActionResult:
     """Handle request that changes current state of user devices.
 
     https://yandex.ru/dev/dialogs/smart-home/doc/reference/post-action.html
     """
-    request = ActionRequest.parse_raw(payload)
+    with span("parse"):
+        request = ActionRequest.parse_obj(_decode_payload(payload))
+
     results: list[ActionResultDevice] = []
 
     for device_id, actions in [(rd.id, rd.capabilities) for rd in request.payload.devices]:
@@ -158,7 +184,7 @@ async def async_devices_action(hass: HomeAssistant, data: RequestData, payload:
 
 
 @HANDLERS.register("/user/unlink")
-async def async_user_unlink(_hass: HomeAssistant, _data: RequestData, _payload: str) -> None:
+async def async_user_unlink(_hass: HomeAssistant, _data: RequestData, _payload: RequestPayload) -> None:
     """Handle request indicates that the user has unlink the account.
 
     https://yandex.ru/dev/dialogs/smart-home/doc/reference/unlink.html
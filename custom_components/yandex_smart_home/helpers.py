@@ -1,23 +1,68 @@
 """Helper classes for Yandex Smart Home integration."""
 from __future__ import annotations
 
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Any, Protocol, TypeVar
+import logging
+import random
+from typing import TYPE_CHECKING, Any, AsyncIterator, Protocol, TypeVar
 
 from homeassistant.core import callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.storage import Store
 
-from .const import DOMAIN
+from .const import CONF_REQUEST_LIMIT, CONF_REQUEST_QUEUE_SIZE, CONF_REQUEST_QUEUE_TIMEOUT, DOMAIN
 from .schema import ResponseCode
 
 if TYPE_CHECKING:
     from homeassistant.core import Context, HomeAssistant
+    from homeassistant.helpers.typing import ConfigType
 
     from .entry_data import ConfigEntryData
 
 STORE_CACHE_ATTRS = "attrs"
 
+LOG_BODY_MAX_LENGTH = 4096
+LOG_SAMPLE_RATE = 1.0
+
+ADMISSION_LIMITS = {
+    "/user/devices": 1,
+    "/user/devices/query": 4,
+    "/user/devices/action": 8,
+}
+ADMISSION_DEFAULT_LIMIT = 4
+ADMISSION_MAX_QUEUE_SIZE = 16
+ADMISSION_QUEUE_TIMEOUTS = {
+    "/user/devices": 30.0,
+}
+ADMISSION_QUEUE_TIMEOUT = 3.0
+
+
+def should_log_debug(logger: logging.Logger, sample_rate: float = LOG_SAMPLE_RATE) -> bool:
+    """Test if the logger should log details of a request.
+
+    Returns False without any work if debug logging is disabled, otherwise only the sample_rate share
+    of requests is logged.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+
+    return sample_rate >= 1 or random.random() < sample_rate
+
+
+def truncate_log_body(body: Any) -> str:
+    """Return a request or response body shortened to LOG_BODY_MAX_LENGTH characters."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+
+    text = str(body)
+    if len(text) <= LOG_BODY_MAX_LENGTH:
+        return text
+
+    return f"{text[:LOG_BODY_MAX_LENGTH]}... ({len(text) - LOG_BODY_MAX_LENGTH} more characters)"
+
 
 class APIError(HomeAssistantError):
     """Base API error."""
@@ -93,6 +138,71 @@ class RequestData:
     request_id: str | None
 
 
+class AdmissionController:
+    """Limit number of concurrently handled requests of each action.
+
+    Requests over the limit wait in a queue, a request is rejected if the queue is full or the request
+    is not started in time. Defaults of the limit, queue size and timeout can be overridden by action.
+    Device list requests may take long on large installations, so they get a longer queue timeout.
+    """
+
+    def __init__(self, limits: ConfigType | None = None) -> None:
+        """Initialize the admission controller."""
+        self._limits: ConfigType = limits or {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._waiting: Counter[str] = Counter()
+        self.admitted: Counter[str] = Counter()
+        self.shed: Counter[str] = Counter()
+
+    @asynccontextmanager
+    async def admit(self, action: str) -> AsyncIterator[None]:
+        """Hold a slot of the action while handling a request."""
+        if (semaphore := self._semaphores.get(action)) is None:
+            semaphore = self._semaphores[action] = asyncio.Semaphore(
+                self._limits.get(action, {}).get(
+                    CONF_REQUEST_LIMIT, ADMISSION_LIMITS.get(action, ADMISSION_DEFAULT_LIMIT)
+                )
+            )
+
+        if semaphore.locked():
+            await self._async_wait(action, semaphore)
+        else:
+            await semaphore.acquire()
+
+        self.admitted[action] += 1
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    async def _async_wait(self, action: str, semaphore: asyncio.Semaphore) -> None:
+        """Wait in the queue for a free slot."""
+        limits = self._limits.get(action, {})
+        if self._waiting[action] >= limits.get(CONF_REQUEST_QUEUE_SIZE, ADMISSION_MAX_QUEUE_SIZE):
+            self.shed[action] += 1
+            raise APIError(ResponseCode.DEVICE_BUSY, f"Too many {action} requests in queue, request rejected")
+
+        self._waiting[action] += 1
+        try:
+            await asyncio.wait_for(
+                semaphore.acquire(),
+                timeout=limits.get(
+                    CONF_REQUEST_QUEUE_TIMEOUT, ADMISSION_QUEUE_TIMEOUTS.get(action, ADMISSION_QUEUE_TIMEOUT)
+                ),
+            )
+        except asyncio.TimeoutError:
+            self.shed[action] += 1
+            raise APIError(ResponseCode.DEVICE_BUSY, f"Request {action} was not started in time, request rejected")
+        finally:
+            self._waiting[action] -= 1
+
+        return None
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return counters of admitted and rejected requests."""
+        return {"admitted": dict(self.admitted), "shed": dict(self.shed)}
+
+
 class HasInstance(Protocol):
     """Protocol type for objects that has instance attribute."""
 
@@ -1,17 +1,26 @@
 """The Yandex Smart Home HTTP interface."""
 from __future__ import annotations
 
+from contextlib import nullcontext
+import hashlib
+from http import HTTPStatus
+import json
 import logging
+import struct
 from typing import TYPE_CHECKING, Any, Awaitable, Callable, Coroutine, TypeVar
+import zlib
 
+from aiohttp import hdrs
 from aiohttp.web import HTTPServiceUnavailable, Request, Response, json_response
 from homeassistant.components.http import HomeAssistantView
 from homeassistant.core import callback
+from multidict import CIMultiDict
 
 from . import handlers
 from .const import DOMAIN
-from .device import async_get_devices
-from .helpers import RequestData
+from .helpers import LOG_SAMPLE_RATE, RequestData, should_log_debug, truncate_log_body
+from .schema import DeviceList, Response as APIResponse
+from .tracing import span
 
 if TYPE_CHECKING:
     from homeassistant.core import HomeAssistant
@@ -21,6 +30,9 @@ if TYPE_CHECKING:
 _LOGGER = logging.getLogger(__name__)
 _T = TypeVar("_T", bound="YandexSmartHomeView")
 
+GZIP_MIN_SIZE = 1024
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
 
 @callback
 def async_register_http(hass: HomeAssistant, component: YandexSmartHome) -> None:
@@ -38,18 +50,19 @@ def async_http_request(
     async def _log_request(request: Request) -> None:
         """Log the request."""
         if body := await request.text():
-            _LOGGER.debug(f"Request: {request.url} ({request.method} data: {body})")
+            _LOGGER.debug(f"Request: {request.url} ({request.method} data: {truncate_log_body(body)})")
         else:
             _LOGGER.debug(f"Request: {request.url} ({request.method})")
 
     async def decorator(self: _T, request: Request) -> Response:
         """Decorate."""
-        await _log_request(request)
+        entry_data = self._component.get_direct_connection_entry_data()
+        if log := should_log_debug(_LOGGER, entry_data.log_sample_rate if entry_data else LOG_SAMPLE_RATE):
+            await _log_request(request)
 
         hass: HomeAssistant = request.app["hass"]
         context = self.context(request)
 
-        entry_data = self._component.get_direct_connection_entry_data()
         if not entry_data:
             raise HTTPServiceUnavailable(text="Error: Integration is not enabled or use cloud connection")
 
@@ -60,11 +73,73 @@ def async_http_request(
             request_id=request.headers.get("X-Request-Id"),
         )
 
-        return await func(self, hass, request, data)
+        tracer = entry_data.tracer if isinstance(self, YandexSmartHomeAPIView) else None
+        action = request.path.removeprefix(YandexSmartHomeAPIView.url) or "/"
+        with tracer.activate(tracer.new_trace(action, data.request_id)) if tracer else nullcontext():
+            response = await func(self, hass, request, data)
+        if log and response.body is not None:
+            if encoding := response.headers.get(hdrs.CONTENT_ENCODING):
+                _LOGGER.debug(f"Response: {response.content_length} bytes ({encoding})")
+            else:
+                _LOGGER.debug(f"Response: {truncate_log_body(response.body)}")
+
+        return response
 
     return decorator
 
 
+def _deflate(data: bytes, final: bool) -> bytes:
+    """Return raw deflate stream of the data.
+
+    A non-final stream ends on a byte boundary, so another raw deflate stream can be appended to it.
+    """
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _gzip_with_prefix(prefix: bytes, body: bytes, body_deflated: bytes) -> bytes:
+    """Return gzip of the prefix followed by the already compressed body."""
+    crc = zlib.crc32(body, zlib.crc32(prefix))
+    size = (len(prefix) + len(body)) & 0xFFFFFFFF
+    return b"".join((_GZIP_HEADER, _deflate(prefix, final=False), body_deflated, struct.pack("<II", crc, size)))
+
+
+def _accepts_gzip(request: Request) -> bool:
+    """Test if the Accept-Encoding header of the request allows gzip (with a non-zero quality value)."""
+    qvalues: dict[str, float] = {}
+    for coding in request.headers.get(hdrs.ACCEPT_ENCODING, "").split(","):
+        name, *params = coding.split(";")
+        qvalue = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+
+        qvalues[name.strip().lower()] = qvalue
+
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qvalues:
+            return qvalues[name] > 0
+
+    return False
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Test if the If-None-Match header of the request matches the entity tag."""
+    if not (if_none_match := request.headers.get(hdrs.IF_NONE_MATCH)):
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+
 class YandexSmartHomeView(HomeAssistantView):
     def __init__(self, component: YandexSmartHome):
         self._component = component
@@ -91,10 +166,14 @@ class YandexSmartHomePingView(YandexSmartHomeView):
     requires_auth = False
 
     @async_http_request
-    async def get(self, hass: HomeAssistant, _request: Request, data: RequestData) -> Response:
+    async def get(self, _hass: HomeAssistant, request: Request, data: RequestData) -> Response:
         """Handle Yandex Smart Home GET requests."""
-        devices = await async_get_devices(hass, data.entry_data)
-        return Response(text=f"OK: {len(devices)}", status=200)
+        if "health" in request.query:
+            health = data.entry_data.get_health()
+            health["cloud_connections"] = self._component.cloud_connections.get_health()
+            return json_response(health)
+
+        return Response(text=f"OK: {data.entry_data.exposed_device_count}", status=200)
 
 
 class YandexSmartHomeAPIView(YandexSmartHomeView):
@@ -110,15 +189,54 @@ class YandexSmartHomeAPIView(YandexSmartHomeView):
     name = f"api:{DOMAIN}"
     requires_auth = True
 
+    def __init__(self, component: YandexSmartHome):
+        super().__init__(component)
+        self._device_list_cache: tuple[str, bytes] | None = None
+
     async def _async_handle_request(self, hass: HomeAssistant, request: Request, data: RequestData) -> Response:
         """Handle Yandex Smart Home requests."""
+        with span("read_body"):
+            payload = await request.text()
+
         result = await handlers.async_handle_request(
-            hass, data, action=request.path.replace(self.url, "", 1), payload=await request.text()
+            hass, data, action=request.path.replace(self.url, "", 1), payload=payload
         )
-        response = json_response(text=result.as_json())
-        _LOGGER.debug(f"Response: {response.text}")
+        with span("serialize"):
+            if isinstance(result.payload, DeviceList):
+                return self._device_list_response(request, result)
 
-        return response
+            return json_response(text=result.as_json())
+
+    def _device_list_response(self, request: Request, result: APIResponse) -> Response:
+        """Return device list response with entity tag, compressed if the client accepts it.
+
+        The entity tag is calculated from the payload only, the request id is different for every request.
+        """
+        assert result.payload
+        payload = result.payload.as_json().encode()
+        etag = f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+        headers = CIMultiDict({hdrs.ETAG: etag, hdrs.VARY: hdrs.ACCEPT_ENCODING})
+
+        if _etag_matches(request, etag):
+            return Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        if result.request_id is not None:
+            prefix = f'{{"request_id": {json.dumps(result.request_id, ensure_ascii=False)}, "payload": '.encode()
+        else:
+            prefix = b'{"payload": '
+
+        if len(payload) < GZIP_MIN_SIZE or not _accepts_gzip(request):
+            return Response(body=prefix + payload + b"}", content_type="application/json", headers=headers)
+
+        if not self._device_list_cache or self._device_list_cache[0] != etag:
+            self._device_list_cache = (etag, _deflate(payload + b"}", final=True))
+
+        headers[hdrs.CONTENT_ENCODING] = "gzip"
+        return Response(
+            body=_gzip_with_prefix(prefix, payload + b"}", self._device_list_cache[1]),
+            content_type="application/json",
+            headers=headers,
+        )
 
     @async_http_request
     async def post(self, hass: HomeAssistant, request: Request, data: RequestData) -> Response:
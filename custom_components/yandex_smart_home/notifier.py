@@ -7,22 +7,24 @@ from contextlib import suppress
 from dataclasses import dataclass
 import itertools
 import logging
-from typing import TYPE_CHECKING, Any, Mapping, Protocol, Self, Sequence
+from typing import TYPE_CHECKING, Any, Callable, Mapping, Protocol, Self, Sequence
 
 from aiohttp import JsonPayload, hdrs
 from aiohttp.client_exceptions import ClientConnectionError
 from homeassistant.const import ATTR_ENTITY_ID, EVENT_STATE_CHANGED
-from homeassistant.core import HassJob
+from homeassistant.core import HassJob, callback
 from homeassistant.exceptions import TemplateError
-from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE, async_create_clientsession
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE, async_get_clientsession
 from homeassistant.helpers.event import TrackTemplate, async_call_later, async_track_template_result
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.template import Template
+from homeassistant.util import slugify
 from pydantic import ValidationError
 
 from . import DOMAIN, const
 from .capability import Capability
 from .device import Device
-from .helpers import APIError
+from .helpers import APIError, should_log_debug, truncate_log_body
 from .property import Property
 from .schema import (
     CallbackDiscoveryRequest,
@@ -147,6 +149,10 @@ class PendingStates:
             self._device_states.clear()
             return states
 
+    def __len__(self) -> int:
+        """Return number of pending states."""
+        return sum(len(states) for states in self._device_states.values())
+
     @property
     def empty(self) -> bool:
         """Test if pending states exist."""
@@ -162,6 +168,87 @@ class PendingStates:
         return False
 
 
+class ReportedStates:
+    """Hold values that were successfully reported, persisted across restarts."""
+
+    _STORAGE_VERSION = 1
+    _SAVE_DELAY = 10.0
+
+    def __init__(self, hass: HomeAssistant, config: NotifierConfig, should_keep: Callable[[str], bool]) -> None:
+        """Initialize."""
+        self._store = self._get_store(hass, config)
+        self._should_keep = should_keep
+        self._device_values: dict[str, dict[str, Any]] = {}
+
+    @classmethod
+    async def async_remove(cls, hass: HomeAssistant, config: NotifierConfig) -> None:
+        """Remove persisted values of the notifier."""
+        await cls._get_store(hass, config).async_remove()
+        return None
+
+    @classmethod
+    def _get_store(cls, hass: HomeAssistant, config: NotifierConfig) -> Store[dict[str, dict[str, Any]]]:
+        """Return store of the notifier values."""
+        key = "_".join(filter(None, [config.skill_id, config.user_id]))
+        return Store[dict[str, dict[str, Any]]](hass, cls._STORAGE_VERSION, f"{DOMAIN}.reported_states.{slugify(key)}")
+
+    async def async_load(self) -> None:
+        """Load store data."""
+        if data := await self._store.async_load():
+            self._device_values = data
+
+        return None
+
+    def check_value_change(self, state: ReportableDeviceState) -> bool:
+        """Test if the state value differs from the last reported value."""
+        try:
+            instance_state = state.get_instance_state()
+        except APIError:
+            return True
+
+        if instance_state is None:
+            return False
+
+        values = self._device_values.get(state.device_id, {})
+        key = self._get_key(instance_state)
+        return key not in values or values[key] != instance_state.state.value
+
+    @callback
+    def async_update(self, devices: Sequence[DeviceState]) -> None:
+        """Remember reported values of the devices."""
+        has_changed = False
+
+        for device in devices:
+            values = self._device_values.setdefault(device.id, {})
+            instance_states: list[CapabilityInstanceState | PropertyInstanceState] = [
+                *(device.capabilities or []),
+                *(device.properties or []),
+            ]
+            for instance_state in instance_states:
+                key = self._get_key(instance_state)
+                if key not in values or values[key] != instance_state.state.value:
+                    values[key] = instance_state.state.value
+                    has_changed = True
+
+        if has_changed:
+            self._store.async_delay_save(self._data_to_save, self._SAVE_DELAY)
+
+        return None
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Return values to persist, drop devices that are gone or no longer exposed."""
+        for device_id in [device_id for device_id in self._device_values if not self._should_keep(device_id)]:
+            del self._device_values[device_id]
+
+        return self._device_values
+
+    @staticmethod
+    def _get_key(instance_state: CapabilityInstanceState | PropertyInstanceState) -> str:
+        """Return compact key for the instance state."""
+        return f"{instance_state.type.short}.{instance_state.state.instance}"
+
+
 class YandexNotifier(ABC):
     """Base class for a notifier."""
 
@@ -176,9 +263,10 @@ class YandexNotifier(ABC):
         self._hass = hass
         self._entry_data = entry_data
         self._config = config
-        self._session = async_create_clientsession(hass)
+        self._session = async_get_clientsession(hass)
 
         self._pending = PendingStates()
+        self._reported_states = ReportedStates(hass, config, self._is_known_device)
         self._report_states_job = HassJob(self._async_report_states)
 
         self._track_templates = track_templates
@@ -189,8 +277,15 @@ class YandexNotifier(ABC):
         self._unsub_report_states: CALLBACK_TYPE | None = None
         self._unsub_discovery: CALLBACK_TYPE | None = None
 
+    @property
+    def pending_states(self) -> int:
+        """Return number of states waiting to be reported."""
+        return len(self._pending)
+
     async def async_setup(self) -> None:
         """Set up the notifier."""
+        await self._reported_states.async_load()
+
         self._unsub_state_changed = self._hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_state_changed)
         self._unsub_initial_report = async_call_later(
             self._hass, INITIAL_REPORT_DELAY, HassJob(self._async_initial_report)
@@ -235,7 +330,8 @@ class YandexNotifier(ABC):
         """Send notification about change of devices' parameters."""
         _LOGGER.debug(self._format_log_message("Sending discovery request"))
         request = CallbackDiscoveryRequest(payload=CallbackDiscoveryRequestPayload(user_id=self._config.user_id))
-        return await self._async_send_request(f"{self._base_url}/discovery", request)
+        await self._async_send_request(f"{self._base_url}/discovery", request)
+        return None
 
     @property
     @abstractmethod
@@ -289,7 +385,7 @@ class YandexNotifier(ABC):
                 payload=CallbackStatesRequestPayload(user_id=self._config.user_id, devices=states)
             )
 
-            asyncio.create_task(self._async_send_request(f"{self._base_url}/state", request))
+            asyncio.create_task(self._async_send_states(request))
 
         if self._pending.empty:
             self._unsub_report_states = None
@@ -302,16 +398,25 @@ class YandexNotifier(ABC):
 
         return None
 
+    async def _async_send_states(self, request: CallbackStatesRequest) -> None:
+        """Send notification about device state change and remember reported values."""
+        if await self._async_send_request(f"{self._base_url}/state", request):
+            self._reported_states.async_update(request.payload.devices)
+
+        return None
+
     # noinspection PyBroadException
-    async def _async_send_request(self, url: str, request: CallbackRequest) -> None:
-        """Send a request to the url."""
+    async def _async_send_request(self, url: str, request: CallbackRequest) -> bool:
+        """Send a request to the url. Return True if the request was accepted."""
         try:
-            _LOGGER.debug(f"Request: {url} (POST data: {request.as_json()})")
+            data = request.as_json()
+            if should_log_debug(_LOGGER, self._entry_data.log_sample_rate):
+                _LOGGER.debug(f"Request: {url} (POST data: {truncate_log_body(data)})")
 
             r = await self._session.post(
                 url,
                 headers=self._request_headers,
-                data=JsonPayload(request.as_json(), dumps=lambda p: p),
+                data=JsonPayload(data, dumps=lambda p: p),
                 timeout=5,
             )
 
@@ -327,6 +432,8 @@ class YandexNotifier(ABC):
 
             if r.status != 202 or error_message:
                 _LOGGER.warning(self._format_log_message(f"Notification request failed: {error_message or r.status}"))
+            else:
+                return True
         except ClientConnectionError as e:
             _LOGGER.warning(self._format_log_message(f"Notification request failed: {e!r}"))
         except asyncio.TimeoutError as e:
@@ -334,7 +441,7 @@ class YandexNotifier(ABC):
         except Exception:
             _LOGGER.exception(self._format_log_message("Unexpected exception"))
 
-        return None
+        return False
 
     async def _async_template_result_changed(
         self,
@@ -359,12 +466,14 @@ class YandexNotifier(ABC):
                 old_state = state.new_with_value_template(old_value_template)
                 new_state = state.new_with_value_template(new_value_template)
 
-                for pending_state in await self._pending.async_add([new_state], [old_state]):
-                    _LOGGER.debug(
-                        self._format_log_message(
-                            f"State report with value '{pending_state.get_value()}' scheduled for {pending_state!r}"
+                scheduled = await self._pending.async_add([new_state], [old_state])
+                if _LOGGER.isEnabledFor(logging.DEBUG):
+                    for pending_state in scheduled:
+                        _LOGGER.debug(
+                            self._format_log_message(
+                                f"State report with value '{pending_state.get_value()}' scheduled for {pending_state!r}"
+                            )
                         )
-                    )
 
         return self._schedule_report_states()
 
@@ -392,25 +501,36 @@ class YandexNotifier(ABC):
             old_states.extend(old_device.get_state_capabilities())
             old_states.extend(old_device.get_state_properties())
 
-        for pending_state in await self._pending.async_add(new_states, old_states):
-            _LOGGER.debug(
-                self._format_log_message(
-                    f"State report with value '{pending_state.get_value()}' scheduled for {pending_state!r}"
+        scheduled = await self._pending.async_add(new_states, old_states)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            for pending_state in scheduled:
+                _LOGGER.debug(
+                    self._format_log_message(
+                        f"State report with value '{pending_state.get_value()}' scheduled for {pending_state!r}"
+                    )
                 )
-            )
 
         return self._schedule_report_states()
 
     async def _async_initial_report(self, *_: Any) -> None:
-        """Schedule initial report."""
+        """Schedule initial report of states that differ from the last reported ones."""
         _LOGGER.debug("Reporting initial states")
         for state in self._hass.states.async_all():
             device = Device(self._hass, self._entry_data, state.entity_id, state)
             if not device.should_expose:
                 continue
 
-            await self._pending.async_add(device.get_capabilities(), [])
-            await self._pending.async_add([p for p in device.get_properties() if p.report_on_startup], [])
+            await self._pending.async_add(
+                [c for c in device.get_capabilities() if self._reported_states.check_value_change(c)], []
+            )
+            await self._pending.async_add(
+                [
+                    p
+                    for p in device.get_properties()
+                    if p.report_on_startup and self._reported_states.check_value_change(p)
+                ],
+                [],
+            )
 
         return self._schedule_report_states()
 
@@ -427,6 +547,10 @@ class YandexNotifier(ABC):
 
         return None
 
+    def _is_known_device(self, device_id: str) -> bool:
+        """Test if the device still exists and is exposed."""
+        return self._hass.states.get(device_id) is not None and self._entry_data.should_expose(device_id)
+
 
 class YandexDirectNotifier(YandexNotifier):
     """Notifier for direct connection."""
@@ -1,7 +1,8 @@
 """Implement the Yandex Smart Home custom properties."""
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Protocol, Self, cast
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Protocol, Self, cast
 
 from homeassistant.components import binary_sensor
 from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
@@ -289,10 +290,24 @@ class BatteryLevelCustomFloatProperty(BatteryLevelPercentageProperty, CustomFloa
     pass
 
 
+CustomPropertyFactory = Callable[["HomeAssistant", "ConfigEntryData"], CustomProperty]
+"""Create custom property with already resolved class and value template."""
+
+
 def get_custom_property(
     hass: HomeAssistant, entry_data: ConfigEntryData, config: ConfigType, device_id: str
 ) -> CustomProperty:
     """Return initialized custom property based on property configuration."""
+    return get_custom_property_factory(hass, config, device_id)(hass, entry_data)
+
+
+def get_custom_property_factory(hass: HomeAssistant, config: ConfigType, device_id: str) -> CustomPropertyFactory:
+    """Return factory of custom property based on property configuration.
+
+    The property class of an instance without explicit type depends on the entity referenced by the value template.
+    It's resolved once for a configured entity or attribute, but on every call of the factory for a configured
+    value template since it may reference different entities on each render.
+    """
     cls: type[CustomEventProperty] | type[CustomFloatProperty]
     property_type: str = config[CONF_ENTITY_PROPERTY_TYPE]
     value_template = get_value_template(device_id, config)
@@ -302,33 +317,47 @@ def get_custom_property(
         cls = EVENT_PROPERTIES_REGISTRY[property_type.split(".", 1)[1]]
     elif property_type.startswith(f"{PropertyInstanceType.FLOAT}."):
         cls = FLOAT_PROPERTIES_REGISTRY[property_type.split(".", 1)[1]]
+    elif CONF_ENTITY_PROPERTY_VALUE_TEMPLATE in config:
+
+        def _factory(hass: HomeAssistant, entry_data: ConfigEntryData) -> CustomProperty:
+            """Create custom property with the class detected by the current template render."""
+            cls = _detect_property_class(property_type, value_template, device_id)
+            return cls(hass, entry_data, config=config, device_id=device_id, value_template=value_template)
+
+        return _factory
     else:
-        instance = property_type
-        if instance not in FLOAT_PROPERTIES_REGISTRY and instance in EVENT_PROPERTIES_REGISTRY:
-            property_type = PropertyType.EVENT
-        else:
-            property_type = PropertyType.FLOAT
+        cls = _detect_property_class(property_type, value_template, device_id)
 
-        info = value_template.async_render_to_info()
-        if len(info.entities) == 1:
-            entity_id = next(iter(info.entities))
-            domain, _ = split_entity_id(entity_id)
+    return partial(cls, config=config, device_id=device_id, value_template=value_template)
 
-            if domain == binary_sensor.DOMAIN:
-                if instance not in EVENT_PROPERTIES_REGISTRY:
-                    raise APIError(
-                        ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
-                        f"Unsupported entity {entity_id} for {instance} property of {device_id}",
-                    )
 
-                property_type = PropertyType.EVENT
+def _detect_property_class(
+    instance: str, value_template: Template, device_id: str
+) -> type[CustomEventProperty] | type[CustomFloatProperty]:
+    """Return property class for the instance based on the entity referenced by the value template."""
+    if instance not in FLOAT_PROPERTIES_REGISTRY and instance in EVENT_PROPERTIES_REGISTRY:
+        property_type = PropertyType.EVENT
+    else:
+        property_type = PropertyType.FLOAT
+
+    info = value_template.async_render_to_info()
+    if len(info.entities) == 1:
+        entity_id = next(iter(info.entities))
+        domain, _ = split_entity_id(entity_id)
+
+        if domain == binary_sensor.DOMAIN:
+            if instance not in EVENT_PROPERTIES_REGISTRY:
+                raise APIError(
+                    ResponseCode.NOT_SUPPORTED_IN_CURRENT_MODE,
+                    f"Unsupported entity {entity_id} for {instance} property of {device_id}",
+                )
+
+            property_type = PropertyType.EVENT
 
-        if property_type == PropertyType.EVENT:
-            cls = EVENT_PROPERTIES_REGISTRY[instance]
-        else:
-            cls = FLOAT_PROPERTIES_REGISTRY[instance]
+    if property_type == PropertyType.EVENT:
+        return EVENT_PROPERTIES_REGISTRY[instance]
 
-    return cls(hass, entry_data, config, device_id, value_template)
+    return FLOAT_PROPERTIES_REGISTRY[instance]
 
 
 def get_value_template(device_id: str, property_config: ConfigType) -> Template:
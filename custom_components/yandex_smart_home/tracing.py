@@ -0,0 +1,141 @@
+"""Request tracing for Yandex Smart Home integration."""
+from __future__ import annotations
+
+from collections import deque
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import time
+from typing import Any, Iterator
+
+TRACE_BUFFER_SIZE = 100
+SLOWEST_TRACES = 10
+
+_current_trace: ContextVar[Trace | None] = ContextVar("yandex_smart_home_trace", default=None)
+_NULL_SPAN: AbstractContextManager[None] = nullcontext()
+
+
+@dataclass
+class Span:
+    """Timed stage of request handling."""
+
+    name: str
+    start: float
+    end: float = 0.0
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        """Return the span duration (seconds)."""
+        return self.end - self.start
+
+
+@dataclass
+class Trace:
+    """Spans recorded while handling a request."""
+
+    action: str
+    request_id: str | None
+    start: float
+    end: float = 0.0
+    spans: list[Span] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        """Return the request duration (seconds)."""
+        return self.end - self.start
+
+    def add_span(self, name: str, start: float, end: float, **attrs: Any) -> None:
+        """Add an already finished span."""
+        self.spans.append(Span(name, start, end, attrs))
+        return None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the trace with times in milliseconds relative to the trace start."""
+        return {
+            "action": self.action,
+            "request_id": self.request_id,
+            "duration": round(self.duration * 1000, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "start": round((s.start - self.start) * 1000, 3),
+                    "duration": round(s.duration * 1000, 3),
+                    **s.attrs,
+                }
+                for s in self.spans
+            ],
+        }
+
+
+class RequestTracer:
+    """Keep traces of the last requests in a ring buffer."""
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        """Initialize the tracer."""
+        self._traces: deque[Trace] = deque(maxlen=size)
+
+    @staticmethod
+    def new_trace(action: str, request_id: str | None, start: float | None = None) -> Trace:
+        """Return a new trace started at the time (now by default)."""
+        return Trace(action, request_id, start if start is not None else time.perf_counter())
+
+    @contextmanager
+    def activate(self, trace: Trace) -> Iterator[Trace]:
+        """Record spans of the request handled in the current context to the trace."""
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.end = time.perf_counter()
+            self._traces.append(trace)
+
+    def slowest(self, count: int = SLOWEST_TRACES) -> list[Trace]:
+        """Return the slowest traces."""
+        return sorted(self._traces, key=lambda t: t.duration, reverse=True)[:count]
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return the slowest traces and all the traces in Chrome trace event format."""
+        return {"slowest": [t.as_dict() for t in self.slowest()], "chrome_trace": self.as_chrome_trace()}
+
+    def as_chrome_trace(self) -> dict[str, Any]:
+        """Return the traces in Chrome trace event format (chrome://tracing, Perfetto)."""
+        events: list[dict[str, Any]] = []
+        for tid, trace in enumerate(self._traces, start=1):
+            events.append(_chrome_event(trace.action, trace.start, trace.end, tid, {"request_id": trace.request_id}))
+            events.extend(_chrome_event(s.name, s.start, s.end, tid, s.attrs) for s in trace.spans)
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _chrome_event(name: str, start: float, end: float, tid: int, args: dict[str, Any]) -> dict[str, Any]:
+    """Return complete event in Chrome trace event format."""
+    return {
+        "name": name,
+        "ph": "X",
+        "ts": round(start * 1_000_000),
+        "dur": round((end - start) * 1_000_000),
+        "pid": 1,
+        "tid": tid,
+        "args": args,
+    }
+
+
+@contextmanager
+def _span(trace: Trace, name: str, attrs: dict[str, Any]) -> Iterator[None]:
+    """Record a span to the trace."""
+    span = Span(name, time.perf_counter(), attrs=attrs)
+    try:
+        yield
+    finally:
+        span.end = time.perf_counter()
+        trace.spans.append(span)
+
+
+def span(name: str, **attrs: Any) -> AbstractContextManager[None]:
+    """Return context manager recording a span if the request is traced, does nothing otherwise."""
+    if (trace := _current_trace.get()) is None:
+        return _NULL_SPAN
+
+    return _span(trace, name, attrs)
@@ -21,6 +21,24 @@ from custom_components.yandex_smart_home.config_flow import ConfigFlowHandler
 pytest_plugins = "pytest_homeassistant_custom_component"
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--benchmark", action="store_true", default=False, help="run micro-benchmarks and simulations")
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line("markers", "benchmark: micro-benchmark or simulation, runs only with --benchmark")
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if config.getoption("--benchmark"):
+        return
+
+    skip_benchmark = pytest.mark.skip(reason="use --benchmark to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
 @pytest.fixture(autouse=True)
 def enable_custom_integrations(enable_custom_integrations):
     return enable_custom_integrations
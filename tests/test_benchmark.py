@@ -0,0 +1,125 @@
+"""Micro-benchmarks for hot paths.
+
+Skipped by default, results are printed only. Use `pytest tests/test_benchmark.py --benchmark -s` to see them.
+"""
+import json
+import random
+import timeit
+from typing import Any, Callable
+
+from homeassistant.components import light
+from homeassistant.const import STATE_ON
+from homeassistant.core import State
+from homeassistant.util.color import RGBColor
+import pytest
+
+from custom_components.yandex_smart_home import const
+from custom_components.yandex_smart_home.capability_color import RGBColorCapability
+from custom_components.yandex_smart_home.cloud import CloudRequest
+from custom_components.yandex_smart_home.cloud_stream import ResponseMeta, frame_response
+from custom_components.yandex_smart_home.color import ColorConverter, int_to_rgb, rgb_to_int
+from custom_components.yandex_smart_home.handlers import _decode_payload
+from custom_components.yandex_smart_home.schema import StatesRequest
+
+from . import MockConfigEntryData
+
+pytestmark = pytest.mark.benchmark
+
+
+def _benchmark(name: str, func: Callable[[], Any], number: int = 2000) -> float:
+    """Run the function and print time per call (microseconds)."""
+    per_call = min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+    print(f"\n{name}: {per_call:.2f} us")
+    return per_call
+
+
+def test_benchmark_cloud_request_parsing():
+    message = json.dumps(
+        {
+            "request_id": "2f6b1c2e-5a1e-4c5b-9d1c-8e0d1f2a3b4c",
+            "action": "/user/devices/query",
+            "message": json.dumps({"devices": [{"id": f"sensor.temperature_{i}"} for i in range(20)]}),
+        }
+    )
+
+    def _pydantic() -> list[str]:
+        request = CloudRequest.parse_raw(message)
+        return [d.id for d in StatesRequest.parse_raw(request.message).devices]
+
+    def _fast() -> list[str]:
+        request = CloudRequest.parse_message(message)
+        return [str(d["id"]) for d in _decode_payload(request.message)["devices"]]
+
+    assert _pydantic() == _fast()
+
+    _benchmark("cloud request (pydantic)", _pydantic)
+    _benchmark("cloud request (fast path)", _fast)
+
+
+def test_benchmark_cloud_stream_framing():
+    bitrate = 6_000_000  # 1080p
+    parts_per_second = 4
+    body = bytes(bitrate // 8 // parts_per_second)
+    headers = (("Content-Type", "video/iso.segment"),)
+
+    def _pydantic() -> bytes:
+        meta = ResponseMeta(status_code=200, headers=dict(headers))
+        return bytes(meta.json(), "utf-8") + b"\r\n" + body
+
+    def _framed() -> bytes:
+        return frame_response(200, headers, body)
+
+    assert _pydantic() == _framed()
+
+    meta_size = len(_framed()) - len(body)
+    print(
+        f"\ncloud stream bytes copied per second: "
+        f"pydantic={parts_per_second * (2 * meta_size + len(body))} framed={parts_per_second * (meta_size + len(body))}"
+    )
+    for name, func in (("pydantic", _pydantic), ("framed", _framed)):
+        per_part = _benchmark(f"cloud stream part framing ({name})", func, number=200)
+        print(f"cloud stream CPU per second of 1080p ({name}): {per_part * parts_per_second:.2f} us")
+
+
+async def test_benchmark_rgb_lights_query(hass):
+    entry_data = MockConfigEntryData(
+        hass=hass,
+        yaml_config={const.CONF_COLOR_PROFILE: {"custom": {"red": 16711680, "green": 65280}}},
+        entity_config={f"light.rgb_{i}": {const.CONF_COLOR_PROFILE: "custom"} for i in range(0, 300, 2)},
+    )
+    rng = random.Random(0)
+    states = []
+    for i in range(300):
+        # every third light shows one of the palette colors
+        value = rng.choice(list(ColorConverter._palette.values())) if i % 3 == 0 else rng.randrange(1 << 24)
+        states.append(
+            State(
+                f"light.rgb_{i}",
+                STATE_ON,
+                {
+                    light.ATTR_SUPPORTED_COLOR_MODES: [light.ColorMode.RGB],
+                    light.ATTR_COLOR_MODE: light.ColorMode.RGB,
+                    light.ATTR_RGB_COLOR: tuple(int_to_rgb(value)),
+                },
+            )
+        )
+
+    def _linear_scan(converter: ColorConverter, ha_color: RGBColor) -> int:
+        for from_ha_value, to_yandex_value in converter._ha_mapping.items():
+            if converter._distance(ha_color, int_to_rgb(from_ha_value)) <= 2:
+                return to_yandex_value
+
+        return rgb_to_int(ha_color)
+
+    def _query(lookup: Callable[[ColorConverter, RGBColor], int]) -> list[int]:
+        values = []
+        for state in states:
+            capability = RGBColorCapability(hass, entry_data, state)
+            values.append(lookup(capability._converter, RGBColor(*state.attributes[light.ATTR_RGB_COLOR])))
+
+        return values
+
+    assert _query(_linear_scan) == _query(ColorConverter.get_yandex_color)
+
+    _benchmark("300 rgb lights query (linear scan)", lambda: _query(_linear_scan), number=20)
+    _benchmark("300 rgb lights query (index)", lambda: _query(ColorConverter.get_yandex_color), number=20)
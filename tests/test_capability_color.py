@@ -1,4 +1,5 @@
 from typing import cast
+from unittest.mock import patch
 
 from homeassistant.components import light
 from homeassistant.const import ATTR_ENTITY_ID, ATTR_SUPPORTED_FEATURES, STATE_OFF
@@ -15,7 +16,7 @@ from custom_components.yandex_smart_home.capability_color import (
     ColorTemperatureCapability,
     RGBColorCapability,
 )
-from custom_components.yandex_smart_home.color import ColorConverter, ColorName, rgb_to_int
+from custom_components.yandex_smart_home.color import ColorConverter, ColorName, ColorProfiles, rgb_to_int
 from custom_components.yandex_smart_home.entry_data import ConfigEntryData
 from custom_components.yandex_smart_home.helpers import APIError
 from custom_components.yandex_smart_home.schema import (
@@ -309,6 +310,94 @@ async def test_capability_color_setting_rgb_with_internal_profile(hass, color_mo
     assert calls[0].data == {ATTR_ENTITY_ID: state.entity_id, light.ATTR_RGB_COLOR: (255, 0, 0)}
 
 
+def test_color_converter_tolerance():
+    converter = ColorConverter({ColorName.RED: rgb_to_int(RGBColor(255, 0, 0)), ColorName.CORAL: 0x000100})
+    red, coral = ColorConverter._palette[ColorName.RED], ColorConverter._palette[ColorName.CORAL]
+
+    assert converter.get_yandex_color(RGBColor(255, 0, 0)) == red
+    assert converter.get_yandex_color(RGBColor(253, 0, 0)) == red
+    assert converter.get_yandex_color(RGBColor(254, 1, 1)) == red
+    assert converter.get_yandex_color(RGBColor(253, 1, 0)) == rgb_to_int(RGBColor(253, 1, 0))
+    assert converter.get_yandex_color(RGBColor(0, 0, 0)) == coral
+    assert converter.get_yandex_color(RGBColor(0, 0, 255)) == rgb_to_int(RGBColor(0, 0, 255))
+    assert converter.get_yandex_color(RGBColor(1, 0, 0)) == coral
+    assert converter.get_yandex_color(RGBColor(0, 1, 2)) == coral
+    assert converter.get_yandex_color(RGBColor(0, 0, 2)) == 2
+
+
+async def test_capability_color_setting_shared_converters(hass):
+    config = _get_color_profile_entry_data(
+        {"light.a": {const.CONF_COLOR_PROFILE: "test"}, "light.b": {const.CONF_COLOR_PROFILE: "test"}}
+    )
+    assert config.color_profiles is config.color_profiles
+    assert ColorProfiles._default_profiles["natural"].get(ColorName.WHITE) is None
+
+    attributes = {
+        light.ATTR_SUPPORTED_COLOR_MODES: [light.ColorMode.COLOR_TEMP, light.ColorMode.RGB],
+        light.ATTR_MIN_COLOR_TEMP_KELVIN: 2000,
+        light.ATTR_MAX_COLOR_TEMP_KELVIN: 6500,
+    }
+    caps = {}
+    for entity_id, attrs in (
+        ("light.a", attributes),
+        ("light.b", attributes | {light.ATTR_MIN_COLOR_TEMP_KELVIN: 2020}),
+        ("light.c", attributes),
+        ("light.d", attributes | {light.ATTR_MAX_COLOR_TEMP_KELVIN: 9000}),
+    ):
+        state = State(entity_id, STATE_OFF, attrs)
+        caps[entity_id] = (
+            cast(
+                RGBColorCapability,
+                get_exact_one_capability(
+                    hass, config, state, CapabilityType.COLOR_SETTING, ColorSettingCapabilityInstance.RGB
+                ),
+            ),
+            cast(
+                ColorTemperatureCapability,
+                get_exact_one_capability(
+                    hass, config, state, CapabilityType.COLOR_SETTING, ColorSettingCapabilityInstance.TEMPERATURE_K
+                ),
+            ),
+        )
+
+    assert caps["light.a"][0]._converter is caps["light.b"][0]._converter
+    assert caps["light.a"][0]._converter is not caps["light.c"][0]._converter
+    assert caps["light.a"][1]._converter is caps["light.b"][1]._converter
+    assert caps["light.a"][1]._converter is not caps["light.c"][1]._converter
+    assert caps["light.c"][1]._converter is not caps["light.d"][1]._converter
+    assert caps["light.c"][1]._converter.supported_range == (1500, 6500)
+    assert caps["light.d"][1]._converter.supported_range == (1500, 9000)
+
+
+def test_color_profiles_temperature_converters_cache():
+    profiles = ColorProfiles.from_dict({"test": {"white": 4120}})
+
+    def _state(min_temp: int, max_temp: int) -> State:
+        return State(
+            "light.test",
+            STATE_OFF,
+            {light.ATTR_MIN_COLOR_TEMP_KELVIN: min_temp, light.ATTR_MAX_COLOR_TEMP_KELVIN: max_temp},
+        )
+
+    with patch("custom_components.yandex_smart_home.color.TEMPERATURE_CONVERTERS_CACHE_SIZE", 2):
+        a = profiles.get_temperature_converter("test", _state(2000, 6500))
+        assert profiles.get_temperature_converter("test", _state(2010, 6540)) is a
+        b = profiles.get_temperature_converter(None, _state(2000, 6500))
+        assert b is not a
+        assert profiles.get_temperature_converter("test", _state(2000, 6500)) is a
+        profiles.get_temperature_converter("test", _state(2700, 6500))
+        assert profiles.get_temperature_converter("test", _state(2000, 6500)) is a
+        assert profiles.get_temperature_converter(None, _state(2000, 6500)) is not b
+
+    with pytest.raises(KeyError):
+        profiles.get_temperature_converter("missing", _state(2000, 6500))
+
+    assert profiles.get_diagnostics() == {
+        "color_converters": 0,
+        "temperature_converters": {"size": 2, "hits": 3, "misses": 5},
+    }
+
+
 @pytest.mark.parametrize(
     "attributes,temp_range",
     [
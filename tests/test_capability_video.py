@@ -1,5 +1,7 @@
+import asyncio
+import time
 from typing import cast
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from homeassistant.components import camera
 from homeassistant.components.camera import Camera, DynamicStreamSettings
@@ -13,7 +15,7 @@ import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.yandex_smart_home import ConnectionType, YandexSmartHome, const
-from custom_components.yandex_smart_home.capability_video import VideoStreamCapability
+from custom_components.yandex_smart_home.capability_video import VideoStreamCapability, WarmStreams
 from custom_components.yandex_smart_home.config_flow import ConfigFlowHandler
 from custom_components.yandex_smart_home.const import DOMAIN
 from custom_components.yandex_smart_home.helpers import APIError
@@ -25,7 +27,7 @@ from custom_components.yandex_smart_home.schema import (
     VideoStreamCapabilityInstance,
 )
 
-from . import BASIC_ENTRY_DATA, MockConfigEntryData
+from . import BASIC_ENTRY_DATA, MockConfigEntryData, generate_entity_filter
 from .test_capability import assert_no_capabilities, get_exact_one_capability
 
 ACTION_STATE = GetStreamInstanceActionState(
@@ -124,6 +126,141 @@ async def test_capability_video_stream_request_stream(hass):
         assert e.value.message == "camera.test does not support play stream service"
 
 
+async def test_capability_video_stream_reuse_running(hass):
+    state = State("camera.test", camera.STATE_IDLE, {ATTR_SUPPORTED_FEATURES: camera.CameraEntityFeature.STREAM})
+    cap = VideoStreamCapability(hass, BASIC_ENTRY_DATA, state)
+    stream = MockStream(hass)
+    camera_entity = MockCamera()
+
+    with patch.object(camera_entity, "async_create_stream", return_value=stream), patch(
+        "custom_components.yandex_smart_home.capability_video._get_camera_from_entity_id",
+        return_value=camera_entity,
+    ), patch.object(stream, "start") as mock_start:
+        assert await cap._async_request_stream(state.entity_id) is stream
+        mock_start.assert_called_once()
+
+        stream._outputs = {"hls": MagicMock()}
+        stream.access_token = "foo"
+        mock_start.reset_mock()
+        assert await cap._async_request_stream(state.entity_id) is stream
+        mock_start.assert_not_called()
+
+
+async def test_capability_video_stream_prewarm(hass_platform_direct, config_entry_direct):
+    hass = hass_platform_direct
+    component: YandexSmartHome = hass.data[DOMAIN]
+    await async_process_ha_core_config(hass, {"external_url": "https://example.com"})
+    entry_data = MockConfigEntryData(
+        hass=hass,
+        entry=config_entry_direct,
+        entity_config={"camera.test": {const.CONF_STREAM_PREWARM: True}, "camera.missing": {}},
+        entity_filter=generate_entity_filter(include_entity_globs=["camera.*"]),
+    )
+    state = State("camera.test", camera.STATE_IDLE, {ATTR_SUPPORTED_FEATURES: camera.CameraEntityFeature.STREAM})
+    hass.states.async_set(state.entity_id, state.state, state.attributes)
+    cap = VideoStreamCapability(hass, entry_data, state)
+    stream = MockStream(hass)
+
+    with patch.object(VideoStreamCapability, "_async_request_stream", return_value=stream) as mock_request_stream:
+        entry_data._prewarm_streams()
+        await hass.async_block_till_done()
+        mock_request_stream.assert_called_once_with("camera.test")
+        assert "camera.test" in component.warm_streams
+
+        assert (await cap.set_instance_state(Context(), ACTION_STATE)).stream_url == "https://example.com/foo"
+        assert len(component.warm_streams) == 1
+
+    with patch.object(
+        VideoStreamCapability, "_async_request_stream", side_effect=APIError(ResponseCode.INTERNAL_ERROR, "boo")
+    ), patch("custom_components.yandex_smart_home.capability_video._LOGGER.warning") as mock_warning:
+        await cap.async_prewarm()
+        mock_warning.assert_called_once_with("Failed to pre-warm stream of camera.test: boo")
+
+    with patch.object(VideoStreamCapability, "_async_request_stream", side_effect=asyncio.TimeoutError), patch(
+        "custom_components.yandex_smart_home.capability_video._LOGGER.warning"
+    ) as mock_warning:
+        await cap.async_prewarm()
+        mock_warning.assert_called_once_with("Failed to pre-warm stream of camera.test: timeout")
+
+    other_entry = MockConfigEntry(
+        domain=DOMAIN, version=ConfigFlowHandler.VERSION, data={const.CONF_CONNECTION_TYPE: ConnectionType.DIRECT}
+    )
+    other_state = State("camera.other", camera.STATE_IDLE, {ATTR_SUPPORTED_FEATURES: camera.CameraEntityFeature.STREAM})
+    other_cap = VideoStreamCapability(
+        hass,
+        MockConfigEntryData(
+            hass=hass, entry=other_entry, entity_config={"camera.other": {const.CONF_STREAM_PREWARM: True}}
+        ),
+        other_state,
+    )
+    with patch.object(VideoStreamCapability, "_async_request_stream", return_value=stream), patch(
+        "custom_components.yandex_smart_home.capability_video._LOGGER.warning"
+    ) as mock_warning:
+        await other_cap.async_prewarm()
+        mock_warning.assert_not_called()
+
+    assert len(component.warm_streams) == 2
+    assert await hass.config_entries.async_unload(config_entry_direct.entry_id)
+    assert "camera.test" not in component.warm_streams
+    assert "camera.other" in component.warm_streams
+
+    component.warm_streams.remove_entry(other_entry.entry_id)
+    assert len(component.warm_streams) == 0
+    assert component.warm_streams._unsub_refresh is None
+
+
+async def test_warm_streams(hass):
+    warm_streams = WarmStreams(hass)
+    streams = [MockStream(hass) for _ in range(3)]
+    for stream in streams:
+        stream._outputs = {"hls": MagicMock()}
+        stream.access_token = "foo"
+
+    with patch("custom_components.yandex_smart_home.capability_video.MAX_WARM_STREAMS", 2):
+        for idx, stream in enumerate(streams):
+            warm_streams.touch(f"camera.test_{idx}", stream, "entry")
+            stream.outputs()["hls"].idle_timer.awake.assert_called_once()
+
+    assert len(warm_streams) == 2
+    assert "camera.test_0" not in warm_streams
+    assert warm_streams._unsub_refresh is not None
+
+    streams[2].access_token = None
+    warm_streams._refresh()
+    assert streams[1].outputs()["hls"].idle_timer.awake.call_count == 2
+    assert streams[0].outputs()["hls"].idle_timer.awake.call_count == 1
+    assert "camera.test_1" in warm_streams
+    assert "camera.test_2" not in warm_streams
+
+    with patch("time.monotonic", return_value=time.monotonic() + 3600):
+        warm_streams._refresh()
+    assert len(warm_streams) == 0
+    assert warm_streams._unsub_refresh is None
+
+
+async def test_warm_streams_remove_entry(hass):
+    warm_streams = WarmStreams(hass)
+    streams = [MockStream(hass) for _ in range(3)]
+    for stream in streams:
+        stream._outputs = {"hls": MagicMock()}
+        stream.access_token = "foo"
+
+    warm_streams.touch("camera.test_0", streams[0], "entry_1")
+    warm_streams.touch("camera.test_1", streams[1], "entry_2")
+    warm_streams.touch("camera.test_2", streams[2], "entry_1")
+    warm_streams.touch("camera.test_2", streams[2], "entry_2")
+
+    warm_streams.remove_entry("entry_1")
+    assert "camera.test_0" not in warm_streams
+    assert "camera.test_1" in warm_streams
+    assert "camera.test_2" in warm_streams
+    assert warm_streams._unsub_refresh is not None
+
+    warm_streams.remove_entry("entry_2")
+    assert len(warm_streams) == 0
+    assert warm_streams._unsub_refresh is None
+
+
 async def test_capability_video_stream_direct(hass_platform_direct, config_entry_direct):
     hass = hass_platform_direct
     entry_data = MockConfigEntryData(entry=config_entry_direct)
@@ -162,7 +299,10 @@ async def test_capability_video_stream_cloud(hass_platform_direct, connection_ty
     entry = MockConfigEntry(
         domain=DOMAIN, version=ConfigFlowHandler.VERSION, data={const.CONF_CONNECTION_TYPE: connection_type}
     )
-    entry_data = MockConfigEntryData(entry=entry, yaml_config={const.CONF_SETTINGS: {const.CONF_CLOUD_STREAM: True}})
+    entry_data = MockConfigEntryData(
+        entry=entry,
+        yaml_config={const.CONF_SETTINGS: {const.CONF_CLOUD_STREAM: True, const.CONF_CLOUD_STREAM_MAX_LAG: 5}},
+    )
     state = State("camera.test", camera.STATE_IDLE, {ATTR_SUPPORTED_FEATURES: camera.CameraEntityFeature.STREAM})
 
     cap = cast(
@@ -184,10 +324,28 @@ async def test_capability_video_stream_cloud(hass_platform_direct, connection_ty
 
         assert len(component.cloud_streams) == 1
         cloud_stream = component.cloud_streams[state.entity_id]
-        cloud_stream._running_stream_id = "foo"
+        assert cloud_stream._max_send_lag == 5
+        stream.access_token = cloud_stream._running_stream_id = "foo"
         assert (await cap.set_instance_state(Context(), ACTION_STATE)).dict() == {
             "protocol": "hls",
             "stream_url": "https://stream.yaha-cloud.ru/foo/master_playlist.m3u8",
         }
 
         assert component.cloud_streams[state.entity_id] == cloud_stream
+
+        # stream was idle-stopped and restarted with a new token
+        stream.access_token = "bar"
+        with pytest.raises(APIError):
+            await cap.set_instance_state(Context(), ACTION_STATE)
+        assert cloud_stream.stream_url is None
+        assert component.cloud_streams[state.entity_id] is not cloud_stream
+
+        # camera returned another stream
+        new_cloud_stream = component.cloud_streams[state.entity_id]
+        new_cloud_stream._running_stream_id = "bar"
+        with patch.object(cap, "_async_request_stream", return_value=MockStream(hass)), pytest.raises(APIError):
+            await cap.set_instance_state(Context(), ACTION_STATE)
+        assert component.cloud_streams[state.entity_id] is not new_cloud_stream
+
+    await component.cloud_streams[state.entity_id].async_stop()
+    assert component.cloud_streams == {}
@@ -1,20 +1,36 @@
+import asyncio
 from asyncio import TimeoutError
+from datetime import timedelta
 import json
 from typing import Any
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
-from aiohttp import WSMessage, WSMsgType
+from aiohttp import WSMessage, WSMsgType, web
 from homeassistant import core
 from homeassistant.components import demo
 from homeassistant.const import MAJOR_VERSION, MINOR_VERSION, Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import DATA_CLIENTSESSION
 from homeassistant.setup import async_setup_component
+from homeassistant.util.decorator import Registry
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.yandex_smart_home import DOMAIN, YandexSmartHome
-from custom_components.yandex_smart_home.cloud import CloudManager
+from custom_components.yandex_smart_home import DOMAIN, ConnectionType, YandexSmartHome, const
+from custom_components.yandex_smart_home.cloud import (
+    COMPRESSION_RATIO_SAMPLE_RATE,
+    CloudManager,
+    LatencyStats,
+    RequestPriority,
+    RequestScheduler,
+    RequestTiming,
+    ResponseBuffer,
+    TrafficCounter,
+    _deflated_size,
+)
+from custom_components.yandex_smart_home.schema import Response
+
+from . import MockConfigEntryData
 
 
 class MockWSConnection:
@@ -24,6 +40,7 @@ class MockWSConnection:
         self.close_code: int | None = kwargs.get("ws_close_code")
         self.closed = False
         self.msg = kwargs.get("msg", []) or []
+        self.compress = kwargs.get("compress", 0)
         self.send_queue = []
 
     def __aiter__(self):
@@ -41,7 +58,7 @@ class MockWSConnection:
     async def close(self):
         self.closed = True
 
-    async def send_str(self, s):
+    async def send_str(self, s, compress=None):
         self.send_queue.append(s)
 
 
@@ -59,6 +76,45 @@ class MockSession:
         return self.ws
 
 
+class BlockingMockWSConnection(MockWSConnection):
+    def __init__(self, url, headers, **kwargs):
+        super().__init__(url, headers, **kwargs)
+        self.msg = []
+        self._event = asyncio.Event()
+
+    async def _async_next_msg(self):
+        while not self.closed:
+            if self.msg:
+                return self.msg.pop(0)
+
+            await self._event.wait()
+            self._event.clear()
+
+        raise StopAsyncIteration
+
+    def wakeup(self):
+        self._event.set()
+
+    def drop(self, close_code):
+        self.close_code = close_code
+        self.closed = True
+        self._event.set()
+
+    async def close(self):
+        self.drop(self.close_code)
+
+
+class BlockingMockSession(MockSession):
+    def __init__(self, aioclient):
+        super().__init__(aioclient)
+        self.connections: list[BlockingMockWSConnection] = []
+
+    async def ws_connect(self, *args, **kwargs):
+        self.ws = BlockingMockWSConnection(*args, **kwargs)
+        self.connections.append(self.ws)
+        return self.ws
+
+
 def mock_client_session(hass, session):
     if MAJOR_VERSION > 2023 or (MAJOR_VERSION == 2023 and MINOR_VERSION >= 11):
         from homeassistant.helpers.aiohttp_client import _make_key
@@ -163,34 +219,47 @@ async def test_cloud_try_reconnect(hass_platform, config_entry_cloud, aioclient_
     hass = hass_platform
     session = MockSession(aioclient_mock, ws_close_code=1000)
 
-    with patch.object(session, "ws_connect", side_effect=TimeoutError()):
+    with patch.object(session, "ws_connect", side_effect=TimeoutError()), patch(
+        "random.uniform", side_effect=lambda a, b: b
+    ):
         await async_setup_entry(hass, config_entry_cloud, session=session)
 
-    manager = _get_manager(hass, config_entry_cloud)
+        manager = _get_manager(hass, config_entry_cloud)
 
-    mock_call_later.assert_called_once()
-    assert manager._ws_reconnect_delay == 4
+        mock_call_later.assert_called_once()
+        assert manager._ws_reconnect_delay == 6
 
-    mock_call_later.reset_mock()
-    with patch.object(session, "ws_connect", side_effect=TimeoutError()):
+        mock_call_later.reset_mock()
         await manager.async_connect()
-    mock_call_later.assert_called_once()
+        mock_call_later.assert_called_once()
 
-    assert manager._ws_reconnect_delay == 8
+        assert manager._ws_reconnect_delay == 18
 
-    for _ in range(1, 10):
-        mock_call_later.reset_mock()
-        with patch.object(session, "ws_connect", side_effect=TimeoutError()):
+        for _ in range(1, 10):
+            mock_call_later.reset_mock()
             await manager.async_connect()
-        mock_call_later.assert_called_once()
+            mock_call_later.assert_called_once()
 
-    assert manager._ws_reconnect_delay == 180
+        assert manager._ws_reconnect_delay == 180
 
-    mock_call_later.reset_mock()
-    await manager.async_connect()
-    mock_call_later.assert_called_once()
+    with patch("random.uniform", side_effect=lambda a, b: a):
+        mock_call_later.reset_mock()
+        await manager.async_connect()
+        mock_call_later.assert_called_once()
+        assert manager._ws_reconnect_delay == 2
 
-    assert manager._ws_reconnect_delay == 4
+        manager._on_connected()
+        manager._last_connection_at -= timedelta(minutes=1)
+        manager._ws_reconnect_delay = 100
+        manager._on_connection_lost()
+        manager._try_reconnect()
+        assert manager._ws_reconnect_delay == 2
+
+    with patch("random.uniform", side_effect=lambda a, b: (a + b) / 2):
+        for _ in range(1, 10):
+            previous_delay = manager._ws_reconnect_delay
+            manager._try_reconnect()
+            assert 2 <= manager._ws_reconnect_delay <= min(previous_delay * 3, 180)
 
     mock_call_later.reset_mock()
     await manager.async_disconnect()
@@ -201,16 +270,130 @@ async def test_cloud_try_reconnect(hass_platform, config_entry_cloud, aioclient_
 async def test_cloud_fast_reconnect(hass_platform, config_entry_cloud, aioclient_mock, mock_call_later, caplog):
     hass = hass_platform
     session = MockSession(aioclient_mock, ws_close_code=1001)
+    with patch("random.uniform", side_effect=lambda a, b: b):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+        manager = _get_manager(hass, config_entry_cloud)
+        assert manager._ws_reconnect_delay == 6
+
+        for expected_delay in [18, 54, 162]:
+            await manager.async_connect()
+            assert manager._ws_reconnect_delay == expected_delay
+            assert "Reconnecting too fast" not in caplog.text
+
+        await manager.async_connect()
+        assert manager._ws_reconnect_delay == 180
+        assert caplog.messages[-2] == "Reconnecting too fast, next reconnection in 180 seconds"
+
+
+async def test_cloud_standby(hass_platform, config_entry_cloud, aioclient_mock, mock_call_later):
+    hass = hass_platform
+    session = BlockingMockSession(aioclient_mock)
+
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.use_cloud_standby",
+        new_callable=PropertyMock(return_value=True),
+    ), patch("custom_components.yandex_smart_home.cloud.STANDBY_EVICTION_TIME", 0):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+        await asyncio.sleep(0)
+        manager = _get_manager(hass, config_entry_cloud)
+
+        primary, standby = session.connections
+        assert manager._ws is primary
+        assert manager.get_diagnostics()["standby_connected"] is True
+
+        standby.msg.append(
+            WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps({"request_id": "bar", "action": "/unknown"}))
+        )
+        standby.wakeup()
+        await hass.async_block_till_done()
+        assert [json.loads(r)["request_id"] for r in standby.send_queue] == ["bar"]
+        assert primary.send_queue == []
+
+        primary.drop(1006)
+        await asyncio.sleep(0)
+        assert mock_call_later.call_args[0][1] == 0
+        assert manager.get_diagnostics()["connected"] is False
+
+        hass.async_create_background_task(manager.async_connect(), "test")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert manager._ws is standby
+        assert len(session.connections) == 3
+        assert manager._ws_standby is session.connections[2]
+
+        diagnostics = manager.get_diagnostics()
+        assert diagnostics["connected"] is True
+        assert diagnostics["disconnections"] == 1
+        assert diagnostics["time_without_connection"] == diagnostics["last_time_without_connection"]
+
+        standby.msg.append(
+            WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps({"request_id": "foo", "action": "/unknown"}))
+        )
+        standby.wakeup()
+        await hass.async_block_till_done()
+        assert [json.loads(r)["request_id"] for r in standby.send_queue] == ["bar", "foo"]
+
+        await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+        await hass.async_block_till_done()
+        assert all(ws.closed for ws in session.connections)
+
+
+@pytest.mark.parametrize("evicted", ["primary", "standby"])
+async def test_cloud_standby_evicted(
+    hass_platform, config_entry_cloud, aioclient_mock, mock_call_later, caplog, evicted
+):
+    hass = hass_platform
+    session = BlockingMockSession(aioclient_mock)
+
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.use_cloud_standby",
+        new_callable=PropertyMock(return_value=True),
+    ):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+        await asyncio.sleep(0)
+        manager = _get_manager(hass, config_entry_cloud)
+        primary, standby = session.connections
+
+        if evicted == "primary":
+            primary.drop(1000)
+            await asyncio.sleep(0)
+            assert manager.get_diagnostics()["standby_disabled"] is True
+
+            hass.async_create_background_task(manager.async_connect(), "test")
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            assert manager._ws is standby
+        else:
+            standby.drop(1000)
+            await asyncio.sleep(0)
+            assert manager._ws is primary
+
+        assert len(session.connections) == 2
+        assert manager.get_diagnostics()["standby_disabled"] is True
+        assert manager.get_diagnostics()["standby_connected"] is False
+        assert [m for m in caplog.messages if m.startswith("Standby connection is disabled")] != []
+
+        await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_standby_failed(hass_platform, config_entry_cloud, aioclient_mock, caplog):
+    hass = hass_platform
+    session = BlockingMockSession(aioclient_mock)
     await async_setup_entry(hass, config_entry_cloud, session=session)
     manager = _get_manager(hass, config_entry_cloud)
 
-    for _ in range(1, 4):
-        await manager.async_connect()
-        assert manager._ws_reconnect_delay == 4
+    with patch.object(session, "ws_connect", side_effect=TimeoutError()):
+        await manager._async_connect_standby()
+    assert manager._ws_standby is None
+    assert "Failed to establish standby connection" in caplog.messages
 
-    await manager.async_connect()
-    assert manager._ws_reconnect_delay == 180
-    assert caplog.messages[-2] == "Reconnecting too fast, next reconnection in 180 seconds"
+    manager._ws_active = False
+    await manager._async_connect_standby()
+    assert manager._ws_standby is None
+    assert session.connections[-1].closed is True
+
+    manager._ws_active = True
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
 
 
 async def test_cloud_messages_invalid_format(hass_platform, config_entry_cloud, aioclient_mock):
@@ -248,6 +431,510 @@ async def test_cloud_messages_invalid_format(hass_platform, config_entry_cloud,
         }
 
 
+async def test_cloud_messages_concurrent(hass_platform, config_entry_cloud, aioclient_mock, caplog):
+    hass = hass_platform
+    requests = [
+        {"request_id": "slow", "action": "/user/devices/action", "message": "foo"},
+        {"request_id": "fast", "action": "/user/devices/query", "message": "bar"},
+    ]
+    in_flight = []
+    fast_done = asyncio.Event()
+
+    async def _handle_request(_hass, data, action, _payload, slot):
+        async with slot():
+            in_flight.append(data.entry_data._cloud_manager.requests_in_flight)
+            if action == "/user/devices/action":
+                await asyncio.wait_for(fast_done.wait(), 0.1)
+            else:
+                fast_done.set()
+
+        return Response(request_id=data.request_id)
+
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    with patch("custom_components.yandex_smart_home.handlers.async_handle_request", side_effect=_handle_request):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+
+    assert [json.loads(r)["request_id"] for r in session.ws.send_queue] == ["fast", "slow"]
+    assert in_flight[0] == {"/user/devices/action": 1, "/user/devices/query": 1}
+    assert _get_manager(hass, config_entry_cloud).requests_in_flight == {}
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+    fast_done.clear()
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    with patch("custom_components.yandex_smart_home.handlers.async_handle_request", side_effect=_handle_request), patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.cloud_concurrent_requests",
+        new_callable=PropertyMock(return_value=1),
+    ):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+
+    assert [json.loads(r)["request_id"] for r in session.ws.send_queue] == ["fast"]
+    assert in_flight[2] == {"/user/devices/action": 1, "/user/devices/query": 1}
+    assert "Failed to handle request slow" in caplog.messages
+    assert _get_manager(hass, config_entry_cloud).requests_in_flight == {}
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_messages_admission(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+    r = Registry()
+    release = asyncio.Event()
+    handled = []
+
+    @r.register("/user/devices/action")
+    async def action(_hass, data, _payload):
+        await release.wait()
+        handled.append(data.request_id)
+
+    @r.register("/user/devices/query")
+    async def query(_hass, data, _payload):
+        handled.append(data.request_id)
+
+    session = MockSession(aioclient_mock)
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.cloud_concurrent_requests",
+        new_callable=PropertyMock(return_value=2),
+    ), patch.dict("custom_components.yandex_smart_home.helpers.ADMISSION_LIMITS", {"/user/devices/action": 1}):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+        manager = _get_manager(hass, config_entry_cloud)
+
+        with patch("custom_components.yandex_smart_home.handlers.HANDLERS", r):
+            for request in [
+                {"request_id": "action_1", "action": "/user/devices/action", "message": "{}"},
+                {"request_id": "action_2", "action": "/user/devices/action", "message": "{}"},
+                {"request_id": "query", "action": "/user/devices/query", "message": "{}"},
+            ]:
+                manager._on_message(WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(request)))
+                await asyncio.sleep(0)
+
+            # action_2 waits for admission without holding a scheduler slot
+            await asyncio.sleep(0.01)
+            assert handled == ["query"]
+            assert manager._requests_scheduler.waiting == 0
+
+            release.set()
+            await hass.async_block_till_done()
+
+    assert handled == ["query", "action_1", "action_2"]
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+@pytest.mark.parametrize(
+    "max_wait_time,expected_order",
+    [
+        (60, ["blocker", "action_1", "action_2", "query", "discovery"]),
+        (0, ["blocker", "discovery", "action_1", "query", "action_2"]),
+    ],
+)
+async def test_cloud_request_scheduler(max_wait_time, expected_order):
+    scheduler = RequestScheduler(1, max_wait_time)
+    order = []
+    release = asyncio.Event()
+
+    async def _run(name, action, wait=None):
+        async with scheduler.slot(RequestPriority.from_action(action)):
+            order.append(name)
+            if wait:
+                await wait.wait()
+
+    blocker = asyncio.create_task(_run("blocker", "/user/unlink", release))
+    await asyncio.sleep(0)
+
+    tasks = []
+    for name, action in [
+        ("discovery", "/user/devices"),
+        ("action_1", "/user/devices/action"),
+        ("query", "/user/devices/query"),
+        ("action_2", "/user/devices/action"),
+    ]:
+        tasks.append(asyncio.create_task(_run(name, action)))
+        await asyncio.sleep(0)
+
+    assert scheduler.waiting == 4
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    assert order == expected_order
+    assert scheduler._active == 0
+
+
+async def test_cloud_request_scheduler_cancel():
+    scheduler = RequestScheduler(1, 60)
+    release = asyncio.Event()
+
+    async def _run(wait=None):
+        async with scheduler.slot(RequestPriority.QUERY):
+            if wait:
+                await wait.wait()
+
+    blocker = asyncio.create_task(_run(release))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_run())
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 1
+
+    waiting.cancel()
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 0
+
+    granted = asyncio.create_task(_run())
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.sleep(0)
+    assert blocker.done()
+    assert scheduler._active == 1
+    granted.cancel()
+    await asyncio.sleep(0)
+    assert granted.cancelled()
+    assert scheduler._active == 0
+
+
+async def test_cloud_messages_drain(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+
+    async def _handle_request(*_, **__):
+        await asyncio.sleep(10)
+
+    await async_setup_entry(hass, config_entry_cloud, session=MockSession(aioclient_mock))
+    manager = _get_manager(hass, config_entry_cloud)
+
+    with patch("custom_components.yandex_smart_home.handlers.async_handle_request", side_effect=_handle_request), patch(
+        "custom_components.yandex_smart_home.cloud.DRAIN_TIMEOUT", 0.01
+    ):
+        manager._on_message(
+            WSMessage(
+                type=WSMsgType.TEXT, extra={}, data=json.dumps({"request_id": "stuck", "action": "/user/devices"})
+            )
+        )
+        await asyncio.sleep(0)
+        assert manager.requests_in_flight == {"/user/devices": 1}
+
+        await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+        await hass.async_block_till_done()
+
+    assert manager.requests_in_flight == {}
+    assert manager._requests_tasks == set()
+
+
+async def test_cloud_messages_buffered(hass_platform, config_entry_cloud, aioclient_mock, caplog):
+    hass = hass_platform
+    handled = []
+    request = {"request_id": "action", "action": "/user/devices/action", "message": "foo"}
+
+    async def _handle_request(_hass, data, _action, _payload, **_):
+        handled.append(data.request_id)
+        await asyncio.sleep(0)
+        return Response(request_id=data.request_id)
+
+    session = MockSession(aioclient_mock)
+    await async_setup_entry(hass, config_entry_cloud, session=session)
+    manager = _get_manager(hass, config_entry_cloud)
+    ws = session.ws
+
+    with patch("custom_components.yandex_smart_home.handlers.async_handle_request", side_effect=_handle_request):
+        manager._on_message(WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(request)))
+        manager._on_message(WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(request)))
+        ws.closed = True
+        await hass.async_block_till_done()
+
+        assert handled == ["action"]
+        assert ws.send_queue == []
+        assert "Request action is already being handled" in caplog.messages
+        assert "Connection is not available, response to action is buffered" in caplog.messages
+
+        session.msg = [WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(request))]
+        await manager.async_connect()
+        await hass.async_block_till_done()
+
+    assert handled == ["action"]
+    assert [json.loads(r)["request_id"] for r in session.ws.send_queue] == ["action", "action"]
+    assert "Request action was already handled, sending previous response" in caplog.messages
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_messages_send_failed(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+
+    async def _handle_request(_hass, data, _action, _payload, **_):
+        return Response(request_id=data.request_id)
+
+    session = MockSession(aioclient_mock)
+    await async_setup_entry(hass, config_entry_cloud, session=session)
+    manager = _get_manager(hass, config_entry_cloud)
+
+    with patch(
+        "custom_components.yandex_smart_home.handlers.async_handle_request", side_effect=_handle_request
+    ), patch.object(session.ws, "send_str", side_effect=ConnectionResetError):
+        manager._on_message(
+            WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps({"request_id": "foo", "action": "/user/devices"}))
+        )
+        await hass.async_block_till_done()
+
+    assert [r.request_id for r in manager._responses.unsent()] == ["foo"]
+    await manager._async_flush_responses()
+    assert [json.loads(r)["request_id"] for r in session.ws.send_queue] == ["foo"]
+    assert manager._responses.unsent() == []
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_messages_flush_overlapping(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+    session = MockSession(aioclient_mock)
+    await async_setup_entry(hass, config_entry_cloud, session=session)
+    manager = _get_manager(hass, config_entry_cloud)
+    ws = session.ws
+    sending = asyncio.Event()
+    send_str = ws.send_str
+
+    async def _slow_send_str(s, compress=None):
+        await sending.wait()
+        await send_str(s, compress)
+
+    manager._responses.add("foo", json.dumps({"request_id": "foo"}))
+    manager._responses.add("bar", json.dumps({"request_id": "bar"}))
+    with patch.object(ws, "send_str", side_effect=_slow_send_str):
+        flushes = [asyncio.create_task(manager._async_flush_responses()) for _ in range(3)]
+        await asyncio.sleep(0)
+        sending.set()
+        await asyncio.gather(*flushes)
+
+    assert sorted(json.loads(r)["request_id"] for r in ws.send_queue) == ["bar", "foo"]
+    assert manager._responses.unsent() == []
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_adaptive_compression(hass, config_entry_cloud, aiohttp_client, socket_enabled):
+    received = []
+
+    async def _handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            received.append(msg.data)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/connect", _handler)
+    client = await aiohttp_client(app)
+
+    manager = CloudManager(hass, MockConfigEntryData(hass, config_entry_cloud))
+    manager._session = client.session
+    manager._url = str(client.make_url("/connect"))
+
+    ws = await manager._async_ws_connect()
+    assert ws.compress == 15
+    # fails if aiohttp moves the private writer or its compress attribute
+    assert ws._writer.compress == 0
+
+    small = json.dumps({"request_id": "small", "payload": {}})
+    large = json.dumps({"request_id": "large", "payload": {"devices": [{"id": f"light.{i}"} for i in range(200)]}})
+    with patch.object(ws, "send_str", wraps=ws.send_str) as mock_send_str:
+        await manager._async_send_str(ws, small)
+        await manager._async_send_str(ws, large)
+        assert mock_send_str.call_args_list[0].kwargs == {}
+        assert mock_send_str.call_args_list[1].kwargs == {"compress": 15}
+
+    await ws.close()
+    assert received == [small, large]
+
+    traffic = manager.get_diagnostics()["traffic"]
+    assert traffic["uncompressed"] == {"messages": 1, "raw_bytes": len(small), "wire_bytes": len(small)}
+    assert traffic["compressed"]["messages"] == 1
+    assert traffic["compressed"]["raw_bytes"] == len(large)
+    assert 0 < traffic["compressed"]["wire_bytes"] < len(large) / 5
+
+    manager = CloudManager(
+        hass,
+        MockConfigEntryData(
+            hass, config_entry_cloud, yaml_config={const.CONF_SETTINGS: {const.CONF_CLOUD_COMPRESSION_MIN_SIZE: 0}}
+        ),
+    )
+    manager._session = client.session
+    manager._url = str(client.make_url("/connect"))
+
+    ws = await manager._async_ws_connect()
+    with patch.object(ws, "send_str", wraps=ws.send_str) as mock_send_str:
+        await manager._async_send_str(ws, small)
+        assert mock_send_str.call_args_list[0].kwargs == {"compress": 15}
+
+    await ws.close()
+
+
+def test_cloud_traffic_counter_sampling():
+    counter = TrafficCounter()
+    data = json.dumps({"payload": {"devices": [{"id": f"light.{i}"} for i in range(200)]}}).encode()
+
+    with patch("custom_components.yandex_smart_home.cloud._deflated_size", wraps=_deflated_size) as mock_size:
+        for _ in range(COMPRESSION_RATIO_SAMPLE_RATE * 2):
+            counter.add_compressed(data)
+
+    assert mock_size.call_count == 2
+    assert counter.as_dict() == {
+        "messages": COMPRESSION_RATIO_SAMPLE_RATE * 2,
+        "raw_bytes": len(data) * COMPRESSION_RATIO_SAMPLE_RATE * 2,
+        "wire_bytes": _deflated_size(data) * COMPRESSION_RATIO_SAMPLE_RATE * 2,
+    }
+
+
+async def test_cloud_connection_pool(hass_platform, config_entry_cloud, aioclient_mock, mock_call_later, caplog):
+    hass = hass_platform
+    await async_setup_entry(hass, config_entry_cloud, session=MockSession(aioclient_mock))
+    component: YandexSmartHome = hass.data[DOMAIN]
+    pool = component.cloud_connections
+    assert pool.instance_ids == ["i-test"]
+
+    def _entry(instance_id):
+        return MockConfigEntry(
+            domain=DOMAIN,
+            data={
+                const.CONF_CONNECTION_TYPE: ConnectionType.CLOUD,
+                const.CONF_CLOUD_INSTANCE: {
+                    const.CONF_CLOUD_INSTANCE_ID: instance_id,
+                    const.CONF_CLOUD_INSTANCE_CONNECTION_TOKEN: "token",
+                },
+            },
+        )
+
+    manager_a = CloudManager(hass, MockConfigEntryData(hass, _entry("a")), pool)
+    manager_b = CloudManager(hass, MockConfigEntryData(hass, _entry("b")), pool)
+    manager_dup = CloudManager(hass, MockConfigEntryData(hass, _entry("b")), pool)
+    assert "Cloud instance b is used by multiple config entries" in caplog.messages
+    assert pool.instance_ids == ["i-test", "a", "b"]
+    manager_dup._ws_active = False
+    pool.unregister(manager_b)
+    assert pool.instance_ids == ["i-test", "a", "b"]
+    pool.unregister(manager_dup)
+    assert pool.instance_ids == ["i-test", "a"]
+    pool.register(manager_b)
+
+    with patch("random.uniform", return_value=3), patch("time.monotonic", return_value=1000):
+        manager_a._schedule_connect(120)
+        manager_b._schedule_connect(2)
+        mock_call_later.reset_mock()
+
+        pool.on_connection_restored(_get_manager(hass, config_entry_cloud))
+        mock_call_later.assert_called_once()
+        assert mock_call_later.call_args[0][1] == 3
+        assert manager_a._reconnect_at == 1003
+        assert manager_b._reconnect_at == 1002
+
+    mock_call_later.reset_mock()
+    manager_a._ws_active = False
+    manager_a.reconnect_soon(0)
+    mock_call_later.assert_not_called()
+
+    await manager_a.async_disconnect()
+    await manager_b.async_disconnect()
+    assert pool.instance_ids == ["i-test"]
+
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+    assert pool.instance_ids == []
+
+
+async def test_cloud_latency_stats(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+    requests = [
+        {"request_id": "1", "action": "/user/devices/query", "message": json.dumps({"devices": []})},
+        {"request_id": "2", "action": "/user/devices/query", "message": json.dumps({"devices": []})},
+        {"request_id": "3", "action": "/user/unlink"},
+    ]
+    await async_setup_entry(hass, config_entry_cloud, session=MockSession(aioclient_mock))
+    assert "latency" not in _get_manager(hass, config_entry_cloud).get_diagnostics()
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.use_cloud_request_stats",
+        new_callable=PropertyMock(return_value=True),
+    ):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+
+    assert len(session.ws.send_queue) == 3
+    latency = _get_manager(hass, config_entry_cloud).get_diagnostics()["latency"]
+    assert list(latency.keys()) == ["/user/devices/query", "/user/unlink"]
+    assert latency["/user/devices/query"]["count"] == 2
+    assert latency["/user/unlink"]["count"] == 1
+    assert list(latency["/user/unlink"].keys()) == ["count", "parse", "wait", "handle", "serialize", "send", "total"]
+    assert list(latency["/user/unlink"]["total"].keys()) == ["p50", "p95", "p99"]
+    assert latency["/user/unlink"]["total"]["p50"] >= latency["/user/unlink"]["handle"]["p50"]
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+async def test_cloud_request_tracing(hass_platform, config_entry_cloud, aioclient_mock):
+    hass = hass_platform
+    requests = [
+        {
+            "request_id": "1",
+            "action": "/user/devices/query",
+            "message": json.dumps({"devices": [{"id": "sensor.outside_temp"}]}),
+        },
+        {"request_id": "2", "action": "/user/unlink"},
+    ]
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.use_request_tracing",
+        new_callable=PropertyMock(return_value=True),
+    ):
+        await async_setup_entry(hass, config_entry_cloud, session=session)
+
+    entry_data = hass.data[DOMAIN].get_entry_data(config_entry_cloud)
+    assert entry_data.tracer is not None
+    traces = {t["request_id"]: t for t in entry_data.get_diagnostics()["traces"]["slowest"]}
+    assert [s["name"] for s in traces["1"]["spans"]] == [
+        "parse",
+        "wait",
+        "parse",
+        "resolve",
+        "values",
+        "handle",
+        "serialize",
+        "send",
+    ]
+    assert traces["1"]["spans"][3]["device_id"] == "sensor.outside_temp"
+    assert [s["name"] for s in traces["2"]["spans"]] == ["parse", "wait", "handle", "serialize", "send"]
+    assert len(entry_data.get_diagnostics()["traces"]["chrome_trace"]["traceEvents"]) == 15
+    await hass.config_entries.async_unload(config_entry_cloud.entry_id)
+
+
+def test_cloud_latency_stats_summary():
+    stats = LatencyStats(size=100)
+    for i in range(1, 201):
+        stats.add(
+            RequestTiming("foo", received=0, parsed=0, started=0, handled=i / 1000, serialized=i / 1000, sent=i / 1000)
+        )
+
+    summary = stats.summary()["foo"]
+    assert summary["count"] == 100
+    assert summary["parse"] == {"p50": 0, "p95": 0, "p99": 0}
+    assert summary["handle"] == {"p50": 150, "p95": 195, "p99": 199}
+    assert summary["total"] == summary["handle"]
+
+
+def test_cloud_response_buffer():
+    buffer = ResponseBuffer(max_size=2, ttl=60)
+    with patch("time.monotonic", return_value=0):
+        buffer.add("a", "resp_a")
+        buffer.add("b", "resp_b")
+        buffer.add("c", "resp_c")
+
+    with patch("time.monotonic", return_value=30):
+        assert buffer.get("a") is None
+        assert buffer.get("b").response == "resp_b"
+        buffer.get("b").sent = True
+        buffer.add("d", "resp_d")
+        assert [r.request_id for r in buffer.unsent()] == ["c", "d"]
+
+    with patch("time.monotonic", return_value=61):
+        assert buffer.get("b") is None
+        assert [r.request_id for r in buffer.unsent()] == ["d"]
+
+
 async def test_cloud_req_user_devices(hass_platform, config_entry_cloud, aioclient_mock):
     hass = hass_platform
 
@@ -340,6 +1027,11 @@ async def test_cloud_req_user_devices_query(hass_platform, config_entry_cloud, a
             "action": "/user/devices/query",
             "message": json.dumps({"devices": [{"id": "sensor.not_existed"}]}),
         },
+        {
+            "request_id": "req_user_devices_query_3",
+            "action": "/user/devices/query",
+            "message": {"devices": [{"id": "sensor.not_existed"}]},
+        },
     ]
     session = MockSession(
         aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
@@ -363,6 +1055,10 @@ async def test_cloud_req_user_devices_query(hass_platform, config_entry_cloud, a
         "request_id": "req_user_devices_query_2",
         "payload": {"devices": [{"id": "sensor.not_existed", "error_code": "DEVICE_UNREACHABLE"}]},
     }
+    assert json.loads(session.ws.send_queue[2]) == {
+        "request_id": "req_user_devices_query_3",
+        "payload": {"devices": [{"id": "sensor.not_existed", "error_code": "DEVICE_UNREACHABLE"}]},
+    }
 
 
 async def test_cloud_req_user_devices_action(hass_platform, config_entry_cloud, aioclient_mock):
@@ -1,5 +1,7 @@
+import asyncio
 from asyncio import TimeoutError
 import json
+import logging
 from typing import cast
 from unittest.mock import MagicMock, patch
 
@@ -9,12 +11,12 @@ from homeassistant.components.camera import DynamicStreamSettings
 
 # noinspection PyProtectedMember
 from homeassistant.components.stream import OUTPUT_IDLE_TIMEOUT, Stream, StreamOutput, StreamSettings
-from homeassistant.components.stream.hls import HlsMasterPlaylistView
+from homeassistant.components.stream.hls import HlsMasterPlaylistView, HlsPartView, HlsPlaylistView, HlsSegmentView
 from homeassistant.core import HomeAssistant
 import pytest
 import yarl
 
-from custom_components.yandex_smart_home.cloud_stream import CloudStreamManager, WebRequest
+from custom_components.yandex_smart_home.cloud_stream import CloudStreamManager, SegmentCache, WebRequest
 
 
 class MockWSConnection:
@@ -141,7 +143,7 @@ async def test_cloud_stream_try_reconnect(hass, aioclient_mock, caplog):
     session = MockSession(aioclient_mock, ws_close_code=1000)
     stream = MockStream(hass)
     cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session))
-    cloud_stream._running_stream_id = "foo"
+    cloud_stream._running_stream_id = stream.access_token = "foo"
 
     caplog.clear()
     with patch("custom_components.yandex_smart_home.cloud_stream.async_call_later") as mock_reconnect:
@@ -149,6 +151,13 @@ async def test_cloud_stream_try_reconnect(hass, aioclient_mock, caplog):
         mock_reconnect.assert_called_once()
         assert caplog.messages[-1] == "Trying to reconnect in 2 seconds"
 
+    stream.access_token = "bar"
+    caplog.clear()
+    with patch("custom_components.yandex_smart_home.cloud_stream.async_call_later") as mock_reconnect:
+        await cloud_stream._async_connect()
+        mock_reconnect.assert_not_called()
+        assert caplog.messages[-1] == "Stream is not active anymore, not reconnecting"
+
 
 async def test_cloud_stream_keepalive(hass, aioclient_mock, mock_call_later):
     session = MockSession(aioclient_mock)
@@ -185,13 +194,211 @@ async def test_cloud_stream_handle_requests(hass, aioclient_mock):
         aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
     )
     cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session))
-    cloud_stream._running_stream_id = "foo"
+    cloud_stream._running_stream_id = stream.access_token = "foo"
     with patch.object(HlsMasterPlaylistView, "get", return_value=Response(body=b"master")):
         await cloud_stream._async_connect()
 
     assert session.ws.send_queue == [b'{"status_code": 200, "headers": {}}\r\nmaster']
 
 
+async def test_cloud_stream_handle_requests_concurrently(hass, aioclient_mock, caplog):
+    requests = [{"view": "segment", "sequence": "1"}, {"view": "playlist"}, {"view": "part", "sequence": "2"}]
+    stream = MockStream(hass)
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session))
+    cloud_stream._running_stream_id = stream.access_token = "foo"
+    playlist_done = asyncio.Event()
+    active = []
+
+    async def _segment(*_):
+        active.append("segment")
+        await asyncio.wait_for(playlist_done.wait(), 1)
+        return Response(body=b"segment")
+
+    async def _playlist(*_):
+        active.append("playlist")
+        playlist_done.set()
+        return Response(body=b"playlist")
+
+    with patch.object(HlsSegmentView, "get", side_effect=_segment), patch.object(
+        HlsPlaylistView, "get", side_effect=_playlist
+    ), patch.object(HlsPartView, "get", return_value=Response(body=b"part")), patch(
+        "custom_components.yandex_smart_home.cloud_stream.MAX_CONCURRENT_REQUESTS", 2
+    ):
+        await cloud_stream._async_connect()
+
+    assert active == ["segment", "playlist"]
+    assert [r.split(b"\r\n")[1] for r in session.ws.send_queue] == [b"segment", b"playlist", b"part"]
+
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session))
+    cloud_stream._running_stream_id = "foo"
+    with patch.object(HlsSegmentView, "get", side_effect=Exception("boom")), patch.object(
+        HlsPlaylistView, "get", return_value=Response(body=b"playlist")
+    ), patch.object(HlsPartView, "get", return_value=Response(body=b"part")), patch.object(
+        MockWSConnection, "close"
+    ) as mock_close:
+        await cloud_stream._async_connect()
+
+    assert session.ws.send_queue == []
+    assert "Failed to handle request" in caplog.messages
+    mock_close.assert_called_once()
+
+
+async def test_cloud_stream_handle_requests_stream_stopped(hass, aioclient_mock, mock_call_later, caplog):
+    requests = [{"view": "master_playlist"}]
+    stream = MockStream(hass)
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    on_disconnect = MagicMock()
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session), on_disconnect=on_disconnect)
+    cloud_stream._running_stream_id = "foo"
+    stream.access_token = "bar"
+
+    with patch.object(HlsMasterPlaylistView, "get", return_value=Response(body=b"master")) as mock_get:
+        await cloud_stream._async_connect()
+        await hass.async_block_till_done()
+
+    mock_get.assert_not_called()
+    assert session.ws.send_queue == []
+    assert cloud_stream._running_stream_id is None
+    assert cloud_stream._unsub_connect is None
+    mock_call_later.assert_not_called()
+    assert [r for r in caplog.records if r.levelno >= logging.ERROR] == []
+    on_disconnect.assert_called_once()
+
+    await cloud_stream._async_disconnect()
+    on_disconnect.assert_called_once()
+
+
+async def test_cloud_stream_segment_cache(hass, aioclient_mock):
+    requests = [
+        {"view": "segment", "sequence": "1"},
+        {"view": "part", "sequence": "1", "part_num": "0"},
+        {"view": "segment", "sequence": "1"},
+        {"view": "part", "sequence": "1", "part_num": "0"},
+        {"view": "part", "sequence": "1", "part_num": "1"},
+        {"view": "part", "sequence": "1", "part_num": "1"},
+        {"view": "playlist"},
+        {"view": "playlist"},
+    ]
+    stream = MockStream(hass)
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session))
+    cloud_stream._running_stream_id = stream.access_token = "foo"
+
+    async def _part(_request, _token, sequence, part_num):
+        if part_num == "1":
+            return Response(status=404)
+        return Response(body=f"part{sequence}.{part_num}".encode())
+
+    with patch.object(HlsSegmentView, "get", return_value=Response(body=b"segment")) as mock_segment, patch.object(
+        HlsPartView, "get", side_effect=_part
+    ) as mock_part, patch.object(HlsPlaylistView, "get", return_value=Response(body=b"playlist")) as mock_playlist:
+        await cloud_stream._async_connect()
+
+    assert [r.split(b"\r\n")[1] for r in session.ws.send_queue] == [
+        b"segment",
+        b"part1.0",
+        b"segment",
+        b"part1.0",
+        b"",
+        b"",
+        b"playlist",
+        b"playlist",
+    ]
+    assert mock_segment.call_count == 1
+    assert mock_part.call_count == 3
+    assert mock_playlist.call_count == 2
+    assert cloud_stream._segment_cache.hits == 2
+
+
+async def test_cloud_stream_backpressure(hass, aioclient_mock):
+    requests = [
+        {"view": "segment", "sequence": "1"},
+        {"view": "part", "sequence": "2", "part_num": "0"},
+        {"view": "playlist"},
+        {"view": "segment", "sequence": "2"},
+    ]
+    stream = MockStream(hass)
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session), max_send_lag=0.05)
+    cloud_stream._running_stream_id = stream.access_token = "foo"
+    send_bytes = MockWSConnection.send_bytes
+
+    async def _slow_send_bytes(ws, b, *args, **kwargs):
+        if not ws.send_queue:
+            await asyncio.sleep(0.1)
+        await send_bytes(ws, b, *args, **kwargs)
+
+    with patch.object(HlsSegmentView, "get", return_value=Response(body=b"segment")), patch.object(
+        HlsPartView, "get", return_value=Response(body=b"part")
+    ), patch.object(HlsPlaylistView, "get", return_value=Response(body=b"playlist")), patch.object(
+        MockWSConnection, "send_bytes", _slow_send_bytes
+    ):
+        await cloud_stream._async_connect()
+
+    assert [r.split(b"\r\n")[1] for r in session.ws.send_queue] == [b"segment", b"", b"playlist", b""]
+    assert b'"status_code": 503' in session.ws.send_queue[1]
+    assert cloud_stream.dropped_parts == 2
+    assert cloud_stream.max_lag >= 0.1
+
+    session = MockSession(
+        aioclient_mock, msg=[WSMessage(type=WSMsgType.TEXT, extra={}, data=json.dumps(r)) for r in requests]
+    )
+    cloud_stream = CloudStreamManager(hass, stream, cast(ClientSession, session), max_write_buffer_size=1024)
+    cloud_stream._running_stream_id = "foo"
+    writer = MagicMock()
+    writer.transport.get_write_buffer_size.return_value = 2048
+
+    with patch.object(HlsSegmentView, "get", return_value=Response(body=b"segment")), patch.object(
+        HlsPartView, "get", return_value=Response(body=b"part")
+    ), patch.object(HlsPlaylistView, "get", return_value=Response(body=b"playlist")), patch.object(
+        MockWSConnection, "_writer", writer, create=True
+    ):
+        await cloud_stream._async_connect()
+
+    assert [r.split(b"\r\n")[1] for r in session.ws.send_queue] == [b"", b"", b"playlist", b""]
+    diagnostics = cloud_stream.get_diagnostics()
+    assert diagnostics["connected"] is True
+    assert diagnostics["lag"] < 0.05
+    assert diagnostics["dropped_parts"] == 3
+    assert diagnostics["cache_misses"] == 3
+
+
+def test_cloud_stream_segment_cache_eviction():
+    cache = SegmentCache(max_items=3, max_bytes=10)
+    cache.put(("segment", "1", ""), b"1111")
+    cache.put(("segment", "2", ""), b"2222")
+    assert cache.get(("segment", "1", "")) == b"1111"
+
+    cache.put(("segment", "3", ""), b"333")
+    assert cache.get(("segment", "2", "")) is None
+    assert cache.get(("segment", "1", "")) == b"1111"
+
+    cache.put(("segment", "4", ""), b"4")
+    cache.put(("segment", "5", ""), b"5")
+    assert cache.get(("segment", "3", "")) is None
+    assert cache.get(("segment", "4", "")) == b"4"
+
+    cache.put(("segment", "6", ""), b"x" * 11)
+    assert cache.get(("segment", "6", "")) is None
+
+    cache.put(("segment", "4", ""), b"44")
+    assert cache.get(("segment", "4", "")) == b"44"
+    assert cache._size == 7
+    assert (cache.hits, cache.misses) == (4, 3)
+
+
 async def test_cloud_stream_web_request(hass):
     r = WebRequest(hass, yarl.URL("/test?foo=bar"))
     assert r.query == {"foo": "bar"}
@@ -16,6 +16,7 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 from homeassistant.core import Context, State
+from homeassistant.helpers.template import Template
 import pytest
 from pytest_homeassistant_custom_component.common import (
     MockConfigEntry,
@@ -47,12 +48,16 @@ from custom_components.yandex_smart_home.const import (
     CONF_ROOM,
     CONF_TYPE,
 )
-from custom_components.yandex_smart_home.device import Device
+from custom_components.yandex_smart_home.device import Device, DevicePlan
 from custom_components.yandex_smart_home.helpers import APIError
 from custom_components.yandex_smart_home.property_custom import (
+    BatteryLevelCustomEventProperty,
+    BatteryLevelCustomFloatProperty,
     ButtonPressCustomEventProperty,
+    HumidityCustomFloatProperty,
     VoltageCustomFloatProperty,
     get_custom_property,
+    get_custom_property_factory,
 )
 from custom_components.yandex_smart_home.property_event import BatteryLevelStateEvent, OpenStateEventProperty
 from custom_components.yandex_smart_home.property_float import (
@@ -239,6 +244,75 @@ async def test_device_properties(hass, caplog):
     assert caplog.messages[-1] == "Unsupported entity binary_sensor.foo for temperature property of sensor.temp"
 
 
+async def test_device_plan(hass):
+    hass.states.async_set("sensor.humidity", "33")
+    entity_config = {
+        "switch.test": {
+            const.CONF_ENTITY_CUSTOM_RANGES: {
+                "humidity": {
+                    const.CONF_ENTITY_CUSTOM_CAPABILITY_STATE_ENTITY_ID: "sensor.humidity",
+                    const.CONF_ENTITY_CUSTOM_RANGE_SET_VALUE: {},
+                }
+            },
+            const.CONF_ENTITY_PROPERTIES: [{const.CONF_ENTITY_PROPERTY_TYPE: "humidity"}],
+        }
+    }
+    entry_data = MockConfigEntryData(entity_config=entity_config)
+    state = State("switch.test", STATE_ON)
+
+    with patch(
+        "custom_components.yandex_smart_home.device.get_custom_property_factory",
+        wraps=get_custom_property_factory,
+    ) as mock_factory:
+        for _ in range(3):
+            device = Device(hass, entry_data, state.entity_id, state)
+            assert [type(c) for c in device.get_capabilities()][:1] == [CustomRangeCapability]
+            assert [type(p) for p in device.get_properties()] == [HumidityCustomFloatProperty]
+            assert device.query().capabilities[0].state.value == 33
+
+        assert mock_factory.call_count == 1
+
+        plan = entry_data.get_device_plan(hass, state.entity_id)
+        assert plan is entry_data.get_device_plan(hass, state.entity_id)
+        assert entry_data.get_device_plan(hass, "switch.foo") == DevicePlan()
+
+        entry_data = MockConfigEntryData(entity_config=entity_config)
+        Device(hass, entry_data, state.entity_id, state).get_properties()
+        assert mock_factory.call_count == 2
+        assert entry_data.get_device_plan(hass, state.entity_id) is not plan
+
+
+async def test_device_plan_template_property(hass, freezer):
+    hass.states.async_set("sensor.battery", "50")
+    hass.states.async_set("binary_sensor.battery_low", STATE_ON)
+    entity_config = {
+        "switch.test": {
+            const.CONF_ENTITY_PROPERTIES: [
+                {
+                    const.CONF_ENTITY_PROPERTY_TYPE: "battery_level",
+                    const.CONF_ENTITY_PROPERTY_VALUE_TEMPLATE: Template(
+                        "{{ states('binary_sensor.battery_low') if utcnow().hour < 12 else states('sensor.battery') }}"
+                    ),
+                },
+                {const.CONF_ENTITY_PROPERTY_TYPE: "battery_level", const.CONF_ENTITY_PROPERTY_ENTITY: "sensor.battery"},
+            ],
+        }
+    }
+    entry_data = MockConfigEntryData(entity_config=entity_config)
+    state = State("switch.test", STATE_ON)
+
+    freezer.move_to("2023-01-01 09:00:00")
+    device = Device(hass, entry_data, state.entity_id, state)
+    assert [type(p) for p in device.get_properties()] == [
+        BatteryLevelCustomEventProperty,
+        BatteryLevelCustomFloatProperty,
+    ]
+
+    freezer.move_to("2023-01-01 15:00:00")
+    device = Device(hass, entry_data, state.entity_id, state)
+    assert [type(p) for p in device.get_properties()] == [BatteryLevelCustomFloatProperty]
+
+
 async def test_device_info(hass, registries):
     ent_reg, dev_reg, area_reg = registries.entity, registries.device, registries.area
     config_entry = MockConfigEntry(domain="test", data={})
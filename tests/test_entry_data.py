@@ -37,6 +37,35 @@ def test_entry_data_trackable_states(hass, caplog):
     assert caplog.messages == ["Failed to track custom capability: foo"]
 
 
+def test_entry_data_cloud_concurrent_requests(hass):
+    assert MockConfigEntryData(hass).cloud_concurrent_requests == 10
+
+    entry_data = MockConfigEntryData(hass, yaml_config={const.CONF_SETTINGS: {const.CONF_CLOUD_CONCURRENT_REQUESTS: 2}})
+    assert entry_data.cloud_concurrent_requests == 2
+
+
+def test_entry_data_cloud_stream_backpressure(hass):
+    entry_data = MockConfigEntryData(hass)
+    assert entry_data.cloud_stream_max_lag == 3.0
+    assert entry_data.cloud_stream_max_buffer_size == 4 * 1024 * 1024
+
+    entry_data = MockConfigEntryData(
+        hass,
+        yaml_config={
+            const.CONF_SETTINGS: {const.CONF_CLOUD_STREAM_MAX_LAG: 5, const.CONF_CLOUD_STREAM_MAX_BUFFER_SIZE: 1024}
+        },
+    )
+    assert entry_data.cloud_stream_max_lag == 5.0
+    assert entry_data.cloud_stream_max_buffer_size == 1024
+
+
+def test_entry_data_log_sample_rate(hass):
+    assert MockConfigEntryData(hass).log_sample_rate == 1.0
+
+    entry_data = MockConfigEntryData(hass, yaml_config={const.CONF_SETTINGS: {const.CONF_LOG_SAMPLE_RATE: 0.1}})
+    assert entry_data.log_sample_rate == 0.1
+
+
 async def test_deprecated_pressure_unit(hass, config_entry_direct):
     issue_registry = ir.async_get(hass)
 
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from unittest.mock import Mock, patch
 
@@ -67,6 +68,82 @@ async def test_handle_request(hass, caplog):
         }
 
 
+async def test_handle_request_admission(hass, caplog):
+    r = Registry()
+    release = asyncio.Event()
+
+    @r.register("slow")
+    async def slow(*_, **__):
+        await release.wait()
+        return None
+
+    entry_data = MockConfigEntryData(
+        hass,
+        yaml_config={
+            const.CONF_SETTINGS: {
+                const.CONF_REQUEST_LIMITS: {
+                    "slow": {
+                        const.CONF_REQUEST_LIMIT: 1,
+                        const.CONF_REQUEST_QUEUE_SIZE: 1,
+                        const.CONF_REQUEST_QUEUE_TIMEOUT: 0.05,
+                    }
+                }
+            }
+        },
+    )
+    data = RequestData(entry_data, Context(), "foo", REQ_ID)
+
+    with patch("custom_components.yandex_smart_home.handlers.HANDLERS", r):
+        first = asyncio.create_task(handlers.async_handle_request(hass, data, "slow", ""))
+        second = asyncio.create_task(handlers.async_handle_request(hass, data, "slow", ""))
+        await asyncio.sleep(0)
+
+        assert (await handlers.async_handle_request(hass, data, "slow", "")).as_dict() == {
+            "request_id": REQ_ID,
+            "payload": {"error_code": "DEVICE_BUSY"},
+        }
+        assert caplog.messages[-1] == "Too many slow requests in queue, request rejected (DEVICE_BUSY)"
+
+        assert (await second).as_dict() == {"request_id": REQ_ID, "payload": {"error_code": "DEVICE_BUSY"}}
+        assert caplog.messages[-1] == "Request slow was not started in time, request rejected (DEVICE_BUSY)"
+
+        third = asyncio.create_task(handlers.async_handle_request(hass, data, "slow", ""))
+        await asyncio.sleep(0)
+        release.set()
+        assert (await first).as_dict() == {"request_id": REQ_ID}
+        assert (await third).as_dict() == {"request_id": REQ_ID}
+
+    assert entry_data.admission.get_diagnostics() == {"admitted": {"slow": 2}, "shed": {"slow": 2}}
+
+
+async def test_handle_request_admission_defaults(hass):
+    r = Registry()
+    release = asyncio.Event()
+
+    @r.register("/user/devices")
+    async def discovery(*_, **__):
+        await release.wait()
+        return None
+
+    entry_data = MockConfigEntryData(hass)
+    data = RequestData(entry_data, Context(), "foo", REQ_ID)
+
+    with patch("custom_components.yandex_smart_home.handlers.HANDLERS", r), patch(
+        "custom_components.yandex_smart_home.helpers.ADMISSION_QUEUE_TIMEOUT", 0.01
+    ):
+        first = asyncio.create_task(handlers.async_handle_request(hass, data, "/user/devices", ""))
+        second = asyncio.create_task(handlers.async_handle_request(hass, data, "/user/devices", ""))
+        await asyncio.sleep(0.05)
+
+        # discovery waits longer than other actions
+        assert not second.done()
+        release.set()
+        assert (await first).as_dict() == {"request_id": REQ_ID}
+        assert (await second).as_dict() == {"request_id": REQ_ID}
+
+    assert entry_data.admission.get_diagnostics() == {"admitted": {"/user/devices": 2}, "shed": {}}
+
+
 async def test_handler_devices_query(hass, caplog):
     switch_1 = State("switch.test_1", STATE_OFF)
     switch_not_expose = State("switch.not_expose", STATE_ON)
@@ -1,3 +1,8 @@
+import logging
+from unittest.mock import patch
+
+from custom_components.yandex_smart_home.helpers import should_log_debug, truncate_log_body
+
 from . import MockCacheStore, MockStore
 
 
@@ -27,3 +32,26 @@ async def test_cache():
     cache.save_attr_value("foo", "bar", [1, 2, 3])
     cache._store.async_delay_save.assert_called_once()
     assert cache.get_attr_value("foo", "bar") == [1, 2, 3]
+
+
+def test_should_log_debug():
+    logger = logging.getLogger("custom_components.yandex_smart_home.test")
+    logger.setLevel(logging.INFO)
+    assert should_log_debug(logger) is False
+
+    logger.setLevel(logging.DEBUG)
+    assert should_log_debug(logger) is True
+
+    with patch("random.random", side_effect=[0.05, 0.5]):
+        assert should_log_debug(logger, 0.1) is True
+        assert should_log_debug(logger, 0.1) is False
+
+
+def test_truncate_log_body():
+    assert truncate_log_body("foo") == "foo"
+    assert truncate_log_body(b"foo") == "foo"
+    assert truncate_log_body({"foo": "bar"}) == "{'foo': 'bar'}"
+
+    with patch("custom_components.yandex_smart_home.helpers.LOG_BODY_MAX_LENGTH", 5):
+        assert truncate_log_body("foobar") == "fooba... (1 more characters)"
+        assert truncate_log_body("fooba") == "fooba"
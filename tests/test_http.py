@@ -1,5 +1,6 @@
+import gzip
 from http import HTTPStatus
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
 from homeassistant import core
 from homeassistant.components import demo
@@ -12,7 +13,10 @@ from custom_components.yandex_smart_home.http import (
     YandexSmartHomeAPIView,
     YandexSmartHomePingView,
     YandexSmartHomeUnauthorizedView,
+    _deflate,
+    _gzip_with_prefix,
 )
+from custom_components.yandex_smart_home.tracing import RequestTracer
 
 from . import REQ_ID, test_cloud
 
@@ -51,6 +55,28 @@ async def test_http_ping_view(hass_platform_direct, aiohttp_client, config_entry
     assert response.status == HTTPStatus.OK
     assert await response.text() == "OK: 3"
 
+    hass_platform_direct.states.async_set("switch.new", "on")
+    response = await http_client.get(YandexSmartHomePingView.url)
+    assert await response.text() == "OK: 4"
+
+    with patch("custom_components.yandex_smart_home.entry_data.Device") as mock_device:
+        hass_platform_direct.states.async_set("switch.new", "off")
+        mock_device.assert_not_called()
+
+    hass_platform_direct.states.async_set("switch.new", "unavailable")
+    response = await http_client.get(YandexSmartHomePingView.url)
+    assert await response.text() == "OK: 3"
+
+    hass_platform_direct.states.async_set("switch.new", "on")
+    hass_platform_direct.states.async_remove("switch.new")
+    response = await http_client.get(YandexSmartHomePingView.url + "?health")
+    assert response.status == HTTPStatus.OK
+    assert await response.json() == {
+        "devices": 3,
+        "notifiers": [],
+        "cloud_connections": {"connected": 0, "total": 0},
+    }
+
     await hass_platform_direct.config_entries.async_unload(config_entry_direct.entry_id)
     response = await http_client.get(YandexSmartHomePingView.url)
     assert response.status == HTTPStatus.SERVICE_UNAVAILABLE
@@ -157,6 +183,110 @@ async def test_http_user_devices(hass_platform_direct, hass_client, hass_admin_u
     }
 
 
+async def test_http_user_devices_conditional(hass_platform_direct, hass_client):
+    http_client = await hass_client()
+    url = YandexSmartHomeAPIView.url + "/user/devices"
+
+    response = await http_client.get(url, headers={"X-Request-Id": REQ_ID, "Accept-Encoding": "identity"})
+    assert response.status == HTTPStatus.OK
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    etag = response.headers["ETag"]
+    body = await response.json()
+    assert body["request_id"] == REQ_ID
+
+    response = await http_client.get(url, headers={"X-Request-Id": "other", "Accept-Encoding": "gzip"})
+    assert response.status == HTTPStatus.OK
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == etag
+    assert await response.json() == body | {"request_id": "other"}
+
+    for accept_encoding in ["gzip;q=0", "deflate, gzip; q=0.0", "*;q=0", "gzip;q=0, *", "br"]:
+        response = await http_client.get(url, headers={"X-Request-Id": REQ_ID, "Accept-Encoding": accept_encoding})
+        assert response.status == HTTPStatus.OK
+        assert "Content-Encoding" not in response.headers, accept_encoding
+
+    for accept_encoding in ["deflate, GZIP;q=0.5", "*", "br, *;q=0.1", "x-gzip"]:
+        response = await http_client.get(url, headers={"X-Request-Id": REQ_ID, "Accept-Encoding": accept_encoding})
+        assert response.status == HTTPStatus.OK
+        assert response.headers["Content-Encoding"] == "gzip", accept_encoding
+
+    for if_none_match in [etag, f"W/{etag}", f'"foo", {etag}', "*"]:
+        response = await http_client.get(url, headers={"X-Request-Id": REQ_ID, "If-None-Match": if_none_match})
+        assert response.status == HTTPStatus.NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert await response.read() == b""
+
+    hass_platform_direct.states.async_set("switch.new", "on", {"friendly_name": "New"})
+    response = await http_client.get(url, headers={"If-None-Match": etag})
+    assert response.status == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+    body = await response.json()
+    assert "request_id" not in body
+    assert [d["name"] for d in body["payload"]["devices"] if d["id"] == "switch.new"] == ["New"]
+
+
+async def test_http_request_tracing(hass_platform_direct, hass_client, config_entry_direct):
+    http_client = await hass_client()
+    entry_data = hass_platform_direct.data[DOMAIN].get_entry_data(config_entry_direct)
+    assert entry_data.tracer is None
+    entry_data.tracer = RequestTracer()
+
+    response = await http_client.post(
+        YandexSmartHomeAPIView.url + "/user/devices/query",
+        json={"devices": [{"id": "sensor.outside_temp"}]},
+        headers={"X-Request-Id": REQ_ID},
+    )
+    assert response.status == HTTPStatus.OK
+
+    response = await http_client.get(YandexSmartHomeAPIView.url + "/user/devices")
+    assert response.status == HTTPStatus.OK
+
+    response = await http_client.get(YandexSmartHomePingView.url)
+    assert response.status == HTTPStatus.OK
+    response = await http_client.head(YandexSmartHomeUnauthorizedView.url)
+    assert response.status == HTTPStatus.OK
+
+    traces = entry_data.tracer.get_diagnostics()["slowest"]
+    assert sorted((t["action"], t["request_id"]) for t in traces) == [
+        ("/user/devices", None),
+        ("/user/devices/query", REQ_ID),
+    ]
+    for trace in traces:
+        if trace["action"] == "/user/devices/query":
+            assert [s["name"] for s in trace["spans"]] == ["read_body", "parse", "resolve", "values", "serialize"]
+        else:
+            assert [s["name"] for s in trace["spans"]][:2] == ["read_body", "get_devices"]
+            assert [s["name"] for s in trace["spans"]][-1] == "serialize"
+            assert {s["device_id"] for s in trace["spans"] if s["name"] == "describe"} == {
+                "sensor.outside_temp",
+                "binary_sensor.front_door",
+                "light.kitchen",
+            }
+
+
+def test_http_gzip_with_prefix():
+    body = b'{"foo": "bar"}' * 100 + b"}"
+    assert gzip.decompress(_gzip_with_prefix(b'{"payload": ', body, _deflate(body, final=True))) == (
+        b'{"payload": ' + body
+    )
+
+
+async def test_http_log_sample_rate(hass_platform_direct, hass_client, caplog):
+    http_client = await hass_client()
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData.log_sample_rate",
+        new_callable=PropertyMock(return_value=0),
+    ):
+        response = await http_client.get(YandexSmartHomeAPIView.url + "/user/devices")
+        assert response.status == HTTPStatus.OK
+    assert not [m for m in caplog.messages if m.startswith(("Request:", "Response:"))]
+
+    response = await http_client.get(YandexSmartHomeAPIView.url + "/user/devices")
+    assert response.status == HTTPStatus.OK
+    assert [m for m in caplog.messages if m.startswith("Request:")]
+
+
 async def test_http_user_devices_query(hass_platform_direct, hass_client):
     http_client = await hass_client()
     response = await http_client.post(
@@ -13,6 +13,7 @@ from pytest_homeassistant_custom_component.common import MockConfigEntry, load_f
 
 from custom_components.yandex_smart_home import DOMAIN, ConnectionType, YandexSmartHome, cloud, const
 from custom_components.yandex_smart_home.config_flow import ConfigFlowHandler
+from custom_components.yandex_smart_home.notifier import NotifierConfig
 
 from . import test_cloud
 
@@ -35,7 +36,15 @@ async def test_valid_config(hass):
             "user_id": "e8701ad48ba05a91604e480dd60899a3",
         }
     ]
-    assert config[DOMAIN]["settings"] == {"beta": True}
+    assert config[DOMAIN]["settings"] == {
+        "beta": True,
+        "cloud_compression_min_size": 4096,
+        "cloud_stream_max_lag": 5.0,
+        "cloud_stream_max_buffer_size": 1048576,
+        "cloud_concurrent_requests": 4,
+        "log_sample_rate": 0.5,
+        "request_limits": {"/user/devices": {"limit": 2, "queue_timeout": 60.0}},
+    }
     assert config[DOMAIN]["color_profile"] == {"test": {"red": 16711680, "green": 65280, "warm_white": 3000}}
     assert config[DOMAIN]["filter"] == {
         "include_domains": ["switch", "light", "climate"],
@@ -367,14 +376,21 @@ async def test_unload_entry(hass, config_entry_direct):
     assert entry_data.entry.state == ConfigEntryState.NOT_LOADED
 
 
-async def test_remove_entry_direct(hass, config_entry_direct):
+async def test_remove_entry_direct(hass, config_entry_direct, hass_storage):
+    storage_key = "yandex_smart_home.reported_states.skill_id_user_id"
+    hass_storage[storage_key] = {"version": 1, "key": storage_key, "data": {"switch.foo": {"on_off.on": True}}}
     config_entry_direct.add_to_hass(hass)
     await hass.config_entries.async_setup(config_entry_direct.entry_id)
 
     component: YandexSmartHome = hass.data[DOMAIN]
     assert len(component._entry_datas) == 1
-    await hass.config_entries.async_remove(config_entry_direct.entry_id)
+    with patch(
+        "custom_components.yandex_smart_home.entry_data.ConfigEntryData._build_notifier_configs",
+        return_value=[NotifierConfig(user_id="user_id", token="token", skill_id="skill_id")],
+    ):
+        await hass.config_entries.async_remove(config_entry_direct.entry_id)
     assert len(component._entry_datas) == 0
+    assert storage_key not in hass_storage
 
 
 async def test_remove_entry_cloud(hass, config_entry_cloud, aioclient_mock, caplog):
@@ -405,11 +421,15 @@ async def test_remove_entry_direct_unloaded(hass, config_entry_direct):
     await hass.config_entries.async_remove(config_entry_direct.entry_id)
 
 
-async def test_remove_entry_cloud_unloaded(hass, config_entry_cloud, aioclient_mock):
+async def test_remove_entry_cloud_unloaded(hass, config_entry_cloud, aioclient_mock, hass_storage):
+    await async_setup_component(hass, DOMAIN, {DOMAIN: {}})
+    storage_key = "yandex_smart_home.reported_states.i_test"
+    hass_storage[storage_key] = {"version": 1, "key": storage_key, "data": {"switch.foo": {"on_off.on": True}}}
     config_entry_cloud.add_to_hass(hass)
 
     aioclient_mock.delete(f"{cloud.BASE_API_URL}/instance/i-test", status=200)
     await hass.config_entries.async_remove(config_entry_cloud.entry_id)
+    assert storage_key not in hass_storage
     (method, url, data, headers) = aioclient_mock.mock_calls[0]
     assert headers == {"Authorization": "Bearer token-foo"}
 
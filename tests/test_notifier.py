@@ -1,4 +1,5 @@
 import asyncio
+from datetime import timedelta
 import json
 import logging
 import time
@@ -11,8 +12,9 @@ from homeassistant.const import ATTR_DEVICE_CLASS, EVENT_HOMEASSISTANT_STARTED,
 from homeassistant.core import CoreState, State
 from homeassistant.helpers.template import Template
 from homeassistant.setup import async_setup_component
+from homeassistant.util.dt import utcnow
 import pytest
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed
 
 from custom_components.yandex_smart_home import DOMAIN, ConnectionType, YandexSmartHome, const
 from custom_components.yandex_smart_home.capability_custom import get_custom_capability
@@ -28,9 +30,13 @@ from custom_components.yandex_smart_home.notifier import (
 from custom_components.yandex_smart_home.property_custom import ButtonPressCustomEventProperty, get_custom_property
 from custom_components.yandex_smart_home.property_float import HumiditySensor, TemperatureSensor
 from custom_components.yandex_smart_home.schema import (
+    CapabilityInstanceState,
     CapabilityType,
+    DeviceState,
     EventPropertyInstance,
     FloatPropertyInstance,
+    OnOffCapabilityInstance,
+    OnOffCapabilityInstanceActionState,
     RangeCapabilityInstance,
     ResponseCode,
 )
@@ -313,6 +319,7 @@ async def test_notifier_track_templates(hass_platform, mock_call_later, caplog):
     # float
     mock_call_later.reset_mock()
     await _async_set_state(hass, "sensor.float", "50")
+    assert notifier.pending_states == 3
     pending = await notifier._pending.async_get_all()
     assert list(pending.keys()) == ["light.kitchen", "sensor.outside_temp"]
     assert pending["light.kitchen"][0].get_value() == 50
@@ -574,6 +581,103 @@ async def test_notifier_initial_report(hass_platform, mock_call_later, caplog):
     assert caplog.messages[-1:] == ["Unsupported entity binary_sensor.foo for temperature property of light.kitchen"]
 
 
+async def test_notifier_initial_report_skip_reported(hass_platform, mock_call_later, aioclient_mock, hass_storage):
+    hass = hass_platform
+    storage_key = "yandex_smart_home.reported_states.a_b_c_bread"
+    hass_storage[storage_key] = {
+        "version": 1,
+        "key": storage_key,
+        "data": {"sensor.outside_temp": {"float.temperature": 15.6}, "light.kitchen": {"on_off.on": False}},
+    }
+    entry_data = MockConfigEntryData(hass=hass, entity_filter=generate_entity_filter(include_entity_globs=["*"]))
+    notifier = YandexDirectNotifier(hass, entry_data, BASIC_CONFIG, {})
+    await notifier.async_setup()
+
+    await notifier._async_initial_report()
+    devices = await notifier._pending.async_get_all()
+    assert list(devices.keys()) == ["light.kitchen"]
+    assert [s.instance for s in devices["light.kitchen"]] == ["temperature_k", "brightness", "on"]
+
+    class MockCapabilityFail(OnOffCapabilityBasic):
+        def get_value(self) -> bool | None:
+            raise APIError(ResponseCode.INTERNAL_ERROR, "api error cap")
+
+    assert notifier._reported_states.check_value_change(
+        MockCapabilityFail(hass, BASIC_ENTRY_DATA, State("switch.fail", "on"))
+    )
+
+    aioclient_mock.post(
+        f"https://dialogs.yandex.net/api/v1/skills/{BASIC_CONFIG.skill_id}/callback/state",
+        status=500,
+        content=b"ERROR",
+    )
+    await notifier._async_initial_report()
+    await notifier._async_report_states()
+    await hass.async_block_till_done()
+    assert aioclient_mock.call_count == 1
+
+    await notifier._async_initial_report()
+    assert notifier._pending.empty is False
+
+    aioclient_mock.clear_requests()
+    aioclient_mock.post(
+        f"https://dialogs.yandex.net/api/v1/skills/{BASIC_CONFIG.skill_id}/callback/state",
+        status=202,
+        json={"request_id": REQ_ID, "status": "ok"},
+    )
+    await notifier._async_report_states()
+    await hass.async_block_till_done()
+    assert aioclient_mock.call_count == 1
+
+    await notifier._async_initial_report()
+    assert notifier._pending.empty is True
+
+    async_fire_time_changed(hass, utcnow() + timedelta(seconds=15))
+    await hass.async_block_till_done()
+    assert hass_storage[storage_key]["data"] == {
+        "light.kitchen": {"color_setting.temperature_k": 4200, "on_off.on": True, "range.brightness": 70},
+        "sensor.outside_temp": {"float.temperature": 15.6},
+    }
+
+    hass.states.async_set("sensor.outside_temp", "16.2", hass.states.get("sensor.outside_temp").attributes)
+    await notifier._async_initial_report()
+    devices = await notifier._pending.async_get_all()
+    assert list(devices.keys()) == ["sensor.outside_temp"]
+
+    await notifier.async_unload()
+
+
+async def test_notifier_reported_states_prune(hass, hass_storage):
+    storage_key = "yandex_smart_home.reported_states.a_b_c_bread"
+    hass.states.async_set("switch.exposed", "on")
+    hass.states.async_set("switch.not_exposed", "on")
+    entry_data = MockConfigEntryData(
+        hass=hass, entity_filter=generate_entity_filter(include_entity_globs=["switch.exposed", "switch.removed"])
+    )
+    notifier = YandexDirectNotifier(hass, entry_data, BASIC_CONFIG, {})
+    await notifier.async_setup()
+
+    notifier._reported_states.async_update(
+        [
+            DeviceState(
+                id=device_id,
+                capabilities=[
+                    CapabilityInstanceState(
+                        type=CapabilityType.ON_OFF,
+                        state=OnOffCapabilityInstanceActionState(instance=OnOffCapabilityInstance.ON, value=True),
+                    )
+                ],
+            )
+            for device_id in ("switch.exposed", "switch.not_exposed", "switch.removed")
+        ]
+    )
+    async_fire_time_changed(hass, utcnow() + timedelta(seconds=15))
+    await hass.async_block_till_done()
+    assert hass_storage[storage_key]["data"] == {"switch.exposed": {"on_off.on": True}}
+
+    await notifier.async_unload()
+
+
 async def test_notifier_send_callback_exception(hass, caplog):
     notifier = YandexDirectNotifier(hass, BASIC_ENTRY_DATA, BASIC_CONFIG, {})
 
@@ -0,0 +1,274 @@
+"""Throughput simulator for the notifiers.
+
+Runs a local aiohttp server impersonating the Yandex callback API and drives storms of state changes
+through a notifier. Skipped by default, the reports are logged.
+Use `pytest tests/test_notifier_simulator.py --benchmark --log-cli-level=INFO` to see them.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from http import HTTPStatus
+import json
+import logging
+import random
+import statistics
+import time
+from typing import Any
+from unittest.mock import patch
+
+from aiohttp import web
+from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.const import ATTR_DEVICE_CLASS, ATTR_UNIT_OF_MEASUREMENT, UnitOfTemperature
+from homeassistant.core import HomeAssistant
+import pytest
+
+from custom_components.yandex_smart_home.notifier import (
+    NotifierConfig,
+    YandexCloudNotifier,
+    YandexDirectNotifier,
+    YandexNotifier,
+)
+
+from . import MockConfigEntryData, generate_entity_filter
+
+pytestmark = pytest.mark.benchmark
+
+_LOGGER = logging.getLogger(__name__)
+
+SIMULATOR_CONFIG = NotifierConfig(user_id="simulator", token="token", skill_id="skill")
+
+
+@dataclass
+class CallbackServerConfig:
+    """Behaviour of the callback API stand-in."""
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    error_status: HTTPStatus = HTTPStatus.INTERNAL_SERVER_ERROR
+    seed: int = 0
+
+
+@dataclass
+class CallbackRequestRecord:
+    """Request received by the callback API stand-in."""
+
+    path: str
+    received_at: float
+    size: int
+    body: dict[str, Any]
+    accepted: bool
+
+
+class CallbackServer:
+    """Local stand-in for the Yandex callback API."""
+
+    def __init__(self, config: CallbackServerConfig):
+        """Initialize the server."""
+        self.config = config
+        self.requests: list[CallbackRequestRecord] = []
+        self.in_flight = 0
+        self._random = random.Random(config.seed)
+
+    def create_app(self) -> web.Application:
+        """Return the web application to serve."""
+        app = web.Application()
+        app.router.add_post("/callback/state", self._async_handle)
+        app.router.add_post("/callback/discovery", self._async_handle)
+        return app
+
+    async def _async_handle(self, request: web.Request) -> web.Response:
+        """Handle a callback request."""
+        received_at = time.monotonic()
+        self.in_flight += 1
+        try:
+            raw = await request.read()
+            if self.config.latency:
+                await asyncio.sleep(self.config.latency)
+
+            accepted = self._random.random() >= self.config.error_rate
+            self.requests.append(CallbackRequestRecord(request.path, received_at, len(raw), json.loads(raw), accepted))
+        finally:
+            self.in_flight -= 1
+
+        if accepted:
+            return web.json_response({"request_id": "simulated", "status": "ok"}, status=HTTPStatus.ACCEPTED)
+
+        if self.config.error_status < HTTPStatus.INTERNAL_SERVER_ERROR:
+            return web.json_response(
+                {"request_id": "simulated", "status": "error", "error_code": "SIMULATED_ERROR"},
+                status=self.config.error_status,
+            )
+
+        return web.Response(text="Simulated error", status=self.config.error_status)
+
+
+@dataclass
+class SimulationReport:
+    """Result of a simulation run."""
+
+    updates: int = 0
+    requests: int = 0
+    accepted_requests: int = 0
+    bytes_sent: int = 0
+    delivered_updates: int = 0
+    coalesced_updates: int = 0
+    dropped_updates: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def latency(self, quantile: int) -> float:
+        """Return end-to-end report latency percentile (seconds)."""
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[quantile - 1]
+
+    def __str__(self) -> str:
+        """Return human-readable summary."""
+        return (
+            f"updates={self.updates} requests={self.requests} (accepted={self.accepted_requests}) "
+            f"bytes={self.bytes_sent} delivered={self.delivered_updates} coalesced={self.coalesced_updates} "
+            f"dropped={self.dropped_updates} latency p50={self.latency(50):.3f}s p95={self.latency(95):.3f}s "
+            f"max={max(self.latencies, default=0.0):.3f}s"
+        )
+
+
+class NotifierSimulator:
+    """Drive state change storms through a notifier connected to the callback API stand-in."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        notifier_cls: type[YandexNotifier],
+        server: CallbackServer,
+        base_url: str,
+    ):
+        """Initialize the simulator."""
+        self._hass = hass
+        self._server = server
+        self._fired: dict[tuple[str, float], float] = {}
+        self._last_values: dict[str, float] = {}
+
+        entry_data = MockConfigEntryData(
+            hass=hass, entity_filter=generate_entity_filter(include_entity_globs=["sensor.simulated_*"])
+        )
+        local_notifier_cls = type(notifier_cls.__name__, (notifier_cls,), {"_base_url": base_url})
+        self.notifier: YandexNotifier = local_notifier_cls(hass, entry_data, SIMULATOR_CONFIG, {})
+
+    async def async_run(self, entities: int, updates_per_entity: int, interval: float) -> SimulationReport:
+        """Fire state changes for the entities and collect the report."""
+        with patch("custom_components.yandex_smart_home.notifier.INITIAL_REPORT_DELAY", 3600), patch(
+            "custom_components.yandex_smart_home.notifier.DISCOVERY_REQUEST_DELAY", 3600
+        ):
+            await self.notifier.async_setup()
+
+        try:
+            for seq in range(1, updates_per_entity + 1):
+                for idx in range(entities):
+                    self._fire(f"sensor.simulated_{idx}", seq / 100)
+                await asyncio.sleep(interval)
+
+            await self._async_wait_idle()
+        finally:
+            await self.notifier.async_unload()
+
+        return self._build_report()
+
+    def _fire(self, entity_id: str, value: float) -> None:
+        """Change state of the entity."""
+        self._fired[(entity_id, value)] = time.monotonic()
+        self._last_values[entity_id] = value
+        self._hass.states.async_set(
+            entity_id,
+            str(value),
+            {ATTR_DEVICE_CLASS: SensorDeviceClass.TEMPERATURE, ATTR_UNIT_OF_MEASUREMENT: UnitOfTemperature.CELSIUS},
+        )
+
+    async def _async_wait_idle(self, timeout: float = 30) -> None:
+        """Wait until all pending states are reported."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await self._hass.async_block_till_done()
+            if self.notifier._pending.empty and self.notifier._unsub_report_states is None:
+                if self._server.in_flight == 0:
+                    await asyncio.sleep(0.05)
+                    if self._server.in_flight == 0:
+                        return
+
+            await asyncio.sleep(0.05)
+
+        raise TimeoutError("Notifier did not become idle")
+
+    def _build_report(self) -> SimulationReport:
+        """Match received requests with fired updates."""
+        report = SimulationReport(updates=len(self._fired))
+        seen: set[tuple[str, float]] = set()
+        delivered: set[tuple[str, float]] = set()
+
+        for request in self._server.requests:
+            report.requests += 1
+            report.bytes_sent += request.size
+            if request.accepted:
+                report.accepted_requests += 1
+
+            for device in request.body.get("payload", {}).get("devices", []):
+                for p in device.get("properties", []):
+                    key = (device["id"], p["state"]["value"])
+                    seen.add(key)
+                    if request.accepted and key not in delivered and key in self._fired:
+                        delivered.add(key)
+                        report.latencies.append(request.received_at - self._fired[key])
+
+        report.delivered_updates = len(delivered)
+        report.coalesced_updates = len(set(self._fired) - seen)
+        report.dropped_updates = len(
+            [entity_id for entity_id, value in self._last_values.items() if (entity_id, value) not in delivered]
+        )
+
+        return report
+
+
+@pytest.fixture
+async def callback_server(aiohttp_server, socket_enabled, request):
+    server = CallbackServer(getattr(request, "param", CallbackServerConfig()))
+    test_server = await aiohttp_server(server.create_app())
+    return server, str(test_server.make_url("/callback"))
+
+
+@pytest.mark.parametrize("notifier_cls", [YandexDirectNotifier, YandexCloudNotifier])
+async def test_simulator_storm(hass, callback_server, notifier_cls):
+    server, base_url = callback_server
+    simulator = NotifierSimulator(hass, notifier_cls, server, base_url)
+
+    with patch("custom_components.yandex_smart_home.notifier.REPORT_STATE_WINDOW", 0.1):
+        report = await simulator.async_run(entities=20, updates_per_entity=5, interval=0.02)
+
+    _LOGGER.info(f"{notifier_cls.__name__}: {report}")
+    assert report.updates == 100
+    assert report.requests > 0
+    assert report.accepted_requests == report.requests
+    assert report.bytes_sent > 0
+    assert report.dropped_updates == 0
+    assert report.delivered_updates + report.coalesced_updates == report.updates
+    assert report.latency(95) >= report.latency(50) >= 0
+
+
+@pytest.mark.parametrize(
+    "callback_server",
+    [
+        CallbackServerConfig(error_rate=1, error_status=HTTPStatus.BAD_REQUEST),
+        CallbackServerConfig(error_rate=1, latency=0.05),
+    ],
+    indirect=True,
+)
+async def test_simulator_errors(hass, callback_server):
+    server, base_url = callback_server
+    simulator = NotifierSimulator(hass, YandexDirectNotifier, server, base_url)
+
+    with patch("custom_components.yandex_smart_home.notifier.REPORT_STATE_WINDOW", 0.1):
+        report = await simulator.async_run(entities=5, updates_per_entity=2, interval=0.02)
+
+    _LOGGER.info(f"{server.config}: {report}")
+    assert report.requests > 0
+    assert report.accepted_requests == 0
+    assert report.delivered_updates == 0
+    assert report.dropped_updates == 5
+    assert report.latencies == []
@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+from custom_components.yandex_smart_home.tracing import RequestTracer, span
+
+
+async def test_span_without_trace():
+    with span("foo"):
+        pass
+
+
+async def test_tracer():
+    tracer = RequestTracer(size=2)
+    clock = iter(range(100))
+
+    with patch("time.perf_counter", side_effect=lambda: float(next(clock))):
+        for request_id in ["1", "2", "3"]:
+            with tracer.activate(tracer.new_trace("/user/devices/query", request_id)) as trace:
+                with span("parse"):
+                    pass
+                with span("query", device_id="light.kitchen"):
+                    pass
+
+            with span("outside"):
+                pass
+
+            trace.end += int(request_id) % 2
+
+    assert [t.request_id for t in tracer.slowest()] == ["3", "2"]
+    assert [t.request_id for t in tracer.slowest(1)] == ["3"]
+    assert tracer.get_diagnostics()["slowest"][0] == {
+        "action": "/user/devices/query",
+        "request_id": "3",
+        "duration": 6000.0,
+        "spans": [
+            {"name": "parse", "start": 1000.0, "duration": 1000.0},
+            {"name": "query", "start": 3000.0, "duration": 1000.0, "device_id": "light.kitchen"},
+        ],
+    }
+    assert tracer.as_chrome_trace() == {
+        "displayTimeUnit": "ms",
+        "traceEvents": [
+            {
+                "name": "/user/devices/query",
+                "ph": "X",
+                "ts": 6000000,
+                "dur": 5000000,
+                "pid": 1,
+                "tid": 1,
+                "args": {"request_id": "2"},
+            },
+            {"name": "parse", "ph": "X", "ts": 7000000, "dur": 1000000, "pid": 1, "tid": 1, "args": {}},
+            {
+                "name": "query",
+                "ph": "X",
+                "ts": 9000000,
+                "dur": 1000000,
+                "pid": 1,
+                "tid": 1,
+                "args": {"device_id": "light.kitchen"},
+            },
+            {
+                "name": "/user/devices/query",
+                "ph": "X",
+                "ts": 12000000,
+                "dur": 6000000,
+                "pid": 1,
+                "tid": 2,
+                "args": {"request_id": "3"},
+            },
+            {"name": "parse", "ph": "X", "ts": 13000000, "dur": 1000000, "pid": 1, "tid": 2, "args": {}},
+            {
+                "name": "query",
+                "ph": "X",
+                "ts": 15000000,
+                "dur": 1000000,
+                "pid": 1,
+                "tid": 2,
+                "args": {"device_id": "light.kitchen"},
+            },
+        ],
+    }